@@ -5,16 +5,25 @@ import logging
 from datetime import datetime
 from typing import Dict, Any, Optional, Tuple
 
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, make_response
 from flask_cors import CORS
 from werkzeug.exceptions import BadRequest, InternalServerError
-import requests
 
 # Agregar el directorio actual al path para importaciones locales
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from services.co2_service import CO2Service
+from services.data_cache import DataCache
 from services.geocoding_service import GeocodingService
+from services.http_client import HttpClient
+from services.interpolation import INTERP_METHODS
+from services.job_service import JobManager
+from services.prefetch_service import PrefetchScheduler
+from services.response_codec import (
+    MEDIA_TYPES, NumpyJSONProvider, available_formats, compress, encode_arrow, encode_msgpack, negotiate_format
+)
+from services.tile_service import TileRenderer
+from services.weather_service import WeatherService
 from config.cities import CITIES_COORDINATES, get_city_coordinates, get_all_cities
 
 # Cargar variables desde .env si existe
@@ -44,13 +53,44 @@ app = Flask(__name__,
            template_folder='app/templates',
            static_folder='app/static')
 app.config['SECRET_KEY'] = 'co2-monitoring-app-secret-key'
+# Serialización JSON de los arreglos numpy de las respuestas de CO2
+app.json = NumpyJSONProvider(app)
 
 # Habilitar CORS para todas las rutas
 CORS(app)
 
 # Inicializar servicios
-co2_service = CO2Service()
-geocoding_service = GeocodingService()
+# Capa HTTP saliente compartida (pools keep-alive por host y métricas de latencia)
+http_client = HttpClient.from_env()
+co2_service = CO2Service(http=http_client)
+geocoding_service = GeocodingService(data_dir=co2_service.data_dir, http=http_client)
+# Caché de clima compartida en disco entre workers (opcional)
+weather_service = WeatherService(
+    cache_dir=os.path.join(co2_service.data_dir, 'weather_cache') if os.getenv('WEATHER_CACHE_SHARED', '0') == '1' else None,
+    http=http_client
+)
+job_manager = JobManager(
+    os.path.join(co2_service.data_dir, 'jobs'),
+    max_workers=int(os.getenv('CO2_JOB_WORKERS', '2')),
+    max_pending=int(os.getenv('CO2_JOB_MAX_PENDING', '32'))
+)
+
+# Teselas PNG del campo de CO2 (caché en disco propia, separada de las descargas CAMS)
+tile_renderer = TileRenderer(
+    co2_service.grid_cache,
+    DataCache(
+        os.path.join(co2_service.data_dir, 'tiles'),
+        max_bytes=int(float(os.getenv('CO2_TILE_CACHE_MAX_MB', '256')) * 1024 * 1024),
+        max_age_seconds=int(float(os.getenv('CO2_TILE_CACHE_MAX_AGE_HOURS', '336')) * 3600)
+    ),
+    alpha=int(os.getenv('CO2_TILE_ALPHA', '170')),
+    evict_every=int(os.getenv('CO2_TILE_EVICT_EVERY', '256'))
+)
+
+# Precarga periódica de datos CAMS (opcional)
+prefetch_scheduler = PrefetchScheduler.from_env(co2_service)
+if os.getenv('CO2_PREFETCH_ENABLED', '0') == '1':
+    prefetch_scheduler.start()
 
 @app.route('/')
 def index():
@@ -117,7 +157,7 @@ def search_cities():
         
         limit = min(int(request.args.get('limit', 5)), 10)  # Máximo 10 resultados
         
-        cities = geocoding_service.search_cities(query, limit)
+        cities = geocoding_service.search_cities(query, limit, client_id=request.remote_addr)
         
         return jsonify({
             'success': True,
@@ -130,6 +170,40 @@ def search_cities():
             'error': str(e)
         }), 500
 
+@app.route('/api/cities/nearest')
+def nearest_cities():
+    """API para obtener las ciudades conocidas más cercanas a un punto (geocodificación inversa local)"""
+    try:
+        lat = request.args.get('lat', type=float)
+        lon = request.args.get('lon', type=float)
+        k = min(max(request.args.get('k', 1, type=int), 1), 20)  # Máximo 20 resultados
+        max_km = request.args.get('max_km', type=float)
+
+        if lat is None or lon is None:
+            return jsonify({
+                'success': False,
+                'error': 'Se requieren parámetros lat y lon'
+            }), 400
+
+        if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+            return jsonify({
+                'success': False,
+                'error': 'Coordenadas fuera de rango válido'
+            }), 400
+
+        cities = geocoding_service.nearest_cities(lat, lon, k, max_km)
+
+        return jsonify({
+            'success': True,
+            'cities': cities,
+            'query': {'lat': lat, 'lon': lon, 'k': k, 'max_km': max_km}
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/health')
 def health():
     """Endpoint de verificación de salud y configuración (CDS, cfgrib, OWM)."""
@@ -183,15 +257,172 @@ def health():
                     'source': source
                 },
                 'cfgrib_available': cfgrib_available,
-                'openweathermap_key_present': owm_present
+                'openweathermap_key_present': owm_present,
+                'jobs': job_manager.stats(),
+                'weather_cache': weather_service.cache.snapshot(),
+                'geocoding': geocoding_service.stats(),
+                'upstreams': http_client.stats(),
+                'cds_async': co2_service.async_cds_stats(),
+                'co2_single_flight': co2_service.flight_stats(),
+                'response_formats': available_formats(),
+                'co2_cache': {
+                    'grid': co2_service.grid_cache.stats(),
+                    'stencils': co2_service.stencils.stats(),
+                    'tiles': tile_renderer.cache.stats(),
+                    'disk': co2_service.cache.stats()
+                }
             }
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def _describe_co2_error(co2_data: Dict[str, Any]) -> Tuple[str, Optional[str], int]:
+    """Traduce un error del servicio de CO2 a (mensaje para el usuario, tipo, código HTTP)"""
+    kind = co2_data.get('error_kind')
+    status = 500
+    user_msg = co2_data['error']
+    if kind in ('credentials_missing', 'auth_error', 'terms_error'):
+        status = 400
+        if kind == 'credentials_missing':
+            user_msg = 'Faltan credenciales de Copernicus/ADS (.cdsapirc)'
+        elif kind == 'auth_error':
+            user_msg = 'Token de Copernicus inválido o no autorizado'
+        elif kind == 'terms_error':
+            user_msg = 'Debes aceptar los términos del dataset en ADS antes de descargar'
+    elif kind == 'quota_error':
+        status = 429
+        user_msg = 'Cuota de descarga excedida, intenta más tarde'
+    elif kind in ('connection', 'timeout'):
+        status = 502
+        user_msg = 'Problema de conexión/timeout con la API de Copernicus'
+    elif kind in ('download_incomplete', 'processing_failed', 'cfgrib_missing'):
+        status = 500
+    elif kind == 'netcdf_engine_missing':
+        status = 500
+        user_msg = 'Faltan motores NetCDF (h5netcdf/h5py) en el entorno del servidor'
+    return user_msg, kind, status
+
+def _interp_arg(value: Optional[str]) -> Optional[str]:
+    """Valida el parámetro interp (nearest por defecto); None si no es válido"""
+    interp = str(value or 'nearest').strip().lower()
+    return interp if interp in INTERP_METHODS else None
+
+def _invalid_interp_response():
+    return jsonify({
+        'success': False,
+        'error': f"interp debe ser uno de: {', '.join(INTERP_METHODS)}"
+    }), 400
+
+def _wants_async() -> bool:
+    """Indica si el cliente pidió ejecución asíncrona (?async=1 o cabecera Prefer: respond-async)"""
+    flag = request.args.get('async', '').strip().lower() in ('1', 'true', 'yes')
+    return flag or 'respond-async' in request.headers.get('Prefer', '')
+
+# Respuestas menores que este tamaño se envían sin comprimir
+COMPRESS_MIN_BYTES = int(os.getenv('CO2_COMPRESS_MIN_BYTES', '1024'))
+
+def _response_format() -> Optional[str]:
+    """Formato negociado (?format= o Accept); None si no se reconoce o no está instalado"""
+    fmt = negotiate_format(request.args.get('format'), request.accept_mimetypes)
+    return fmt if fmt is not None and available_formats()[fmt] else None
+
+def _unsupported_format_response():
+    formats = available_formats()
+    return jsonify({
+        'success': False,
+        'error': 'Formato de respuesta no disponible',
+        'available_formats': [f for f in MEDIA_TYPES if formats[f]]
+    }), 406
+
+def _encode_response(body: Dict[str, Any], status: int, fmt: str = 'json'):
+    """
+    Serializa el cuerpo en el formato negociado (JSON, MessagePack o Arrow IPC) y lo
+    comprime con brotli/gzip si el cliente lo acepta
+    """
+    if fmt == 'msgpack':
+        payload = encode_msgpack(body)
+    elif fmt == 'arrow':
+        payload = encode_arrow(body)
+    else:
+        payload = app.json.dumps(body).encode('utf-8')
+    payload, encoding = compress(payload, request.accept_encodings, COMPRESS_MIN_BYTES)
+    response = make_response(payload, status)
+    response.headers['Content-Type'] = MEDIA_TYPES[fmt]
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    return response
+
+def _respond(run, job_key: str, cached=None):
+    """
+    Ejecuta `run` (que devuelve (cuerpo, código HTTP)) de forma síncrona o, si el
+    cliente lo pidió, lo encola como job y responde 202 con el id inmediatamente.
+    Si `cached()` indica que los datos ya están en caché se responde en línea
+    aunque se haya pedido ejecución asíncrona: no hay nada que esperar.
+    """
+    fmt = _response_format()
+    if fmt is None:
+        return _unsupported_format_response()
+
+    if not _wants_async() or (cached is not None and cached()):
+        body, status = run()
+        return _encode_response(body, status, fmt)
+
+    job, created = job_manager.submit(job_key, run)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Demasiadas peticiones en cola, intenta más tarde'
+        }), 503
+
+    status_url = f"/api/jobs/{job['id']}"
+    response = jsonify({
+        'success': True,
+        'job_id': job['id'],
+        'status': job['status'],
+        'deduplicated': not created,
+        'status_url': status_url
+    })
+    response.headers['Location'] = status_url
+    return response, 202
+
+def _co2_point_response(city_name: str, lat: float, lon: float, date: Optional[str], leadtime_hours,
+                        log_tag: str = '', interp: str = 'nearest'):
+    """Consulta el servicio de CO2 para un punto y devuelve (cuerpo, código HTTP)"""
+    try:
+        co2_data = co2_service.get_co2_data_for_city(
+            city_name=city_name,
+            lat=lat,
+            lon=lon,
+            date=date,
+            leadtime_hours=leadtime_hours,
+            interp=interp
+        )
+        
+        if 'error' in co2_data:
+            # Log del error para debugging
+            print(f"❌ Error en CO2 service{log_tag}: {co2_data['error']}")
+            user_msg, kind, status = _describe_co2_error(co2_data)
+            return {
+                'success': False,
+                'error': user_msg,
+                'error_kind': kind
+            }, status
+        
+        return {
+            'success': True,
+            'data': co2_data
+        }, 200
+        
+    except Exception as e:
+        return {
+            'success': False,
+            'error': f'Error interno del servidor: {str(e)}'
+        }, 500
+
 @app.route('/api/co2/<city_name>')
 def get_co2_data(city_name):
-    """API para obtener datos de CO2 de una ciudad"""
+    """API para obtener datos de CO2 de una ciudad (?async=1 para ejecución en segundo plano)"""
     try:
         # Obtener coordenadas de la ciudad
         city_info = get_city_coordinates(city_name)
@@ -204,52 +435,16 @@ def get_co2_data(city_name):
         # Parámetros opcionales
         date = request.args.get('date')  # formato YYYY-MM-DD
         leadtime_hours = request.args.getlist('hours') or ["0", "12", "24"]
+        interp = _interp_arg(request.args.get('interp'))  # nearest | bilinear | idw
+        if interp is None:
+            return _invalid_interp_response()
         
-        # Obtener datos de CO2
-        co2_data = co2_service.get_co2_data_for_city(
-            city_name=city_info['name'],
-            lat=city_info['lat'],
-            lon=city_info['lon'],
-            date=date,
-            leadtime_hours=leadtime_hours
+        return _respond(
+            lambda: _co2_point_response(city_info['name'], city_info['lat'], city_info['lon'], date, leadtime_hours, interp=interp),
+            f"city:{city_name.lower().strip()}:{date}:{','.join(leadtime_hours)}:{interp}",
+            cached=lambda: co2_service.has_cached_grid(city_info['lat'], city_info['lon'], date, leadtime_hours)
         )
         
-        if 'error' in co2_data:
-            # Log del error para debugging
-            print(f"❌ Error en CO2 service: {co2_data['error']}")
-            kind = co2_data.get('error_kind')
-            status = 500
-            user_msg = co2_data['error']
-            if kind in ('credentials_missing', 'auth_error', 'terms_error'):
-                status = 400
-                if kind == 'credentials_missing':
-                    user_msg = 'Faltan credenciales de Copernicus/ADS (.cdsapirc)'
-                elif kind == 'auth_error':
-                    user_msg = 'Token de Copernicus inválido o no autorizado'
-                elif kind == 'terms_error':
-                    user_msg = 'Debes aceptar los términos del dataset en ADS antes de descargar'
-            elif kind == 'quota_error':
-                status = 429
-                user_msg = 'Cuota de descarga excedida, intenta más tarde'
-            elif kind in ('connection', 'timeout'):
-                status = 502
-                user_msg = 'Problema de conexión/timeout con la API de Copernicus'
-            elif kind in ('download_incomplete', 'processing_failed', 'cfgrib_missing'):
-                status = 500
-            elif kind == 'netcdf_engine_missing':
-                status = 500
-                user_msg = 'Faltan motores NetCDF (h5netcdf/h5py) en el entorno del servidor'
-            return jsonify({
-                'success': False,
-                'error': user_msg,
-                'error_kind': kind
-            }), status
-        
-        return jsonify({
-            'success': True,
-            'data': co2_data
-        })
-        
     except Exception as e:
         return jsonify({
             'success': False,
@@ -258,7 +453,7 @@ def get_co2_data(city_name):
 
 @app.route('/api/co2/custom')
 def get_co2_custom():
-    """API para obtener datos de CO2 con coordenadas personalizadas"""
+    """API para obtener datos de CO2 con coordenadas personalizadas (?async=1 para ejecución en segundo plano)"""
     try:
         # Obtener parámetros
         lat = request.args.get('lat', type=float)
@@ -266,6 +461,9 @@ def get_co2_custom():
         city_name = request.args.get('city', 'Ubicación personalizada')
         date = request.args.get('date')
         leadtime_hours = request.args.getlist('hours') or ["0", "12", "24"]
+        interp = _interp_arg(request.args.get('interp'))
+        if interp is None:
+            return _invalid_interp_response()
         
         if lat is None or lon is None:
             return jsonify({
@@ -280,32 +478,271 @@ def get_co2_custom():
                 'error': 'Coordenadas fuera de rango válido'
             }), 400
         
-        # Obtener datos de CO2
-        co2_data = co2_service.get_co2_data_for_city(
-            city_name=city_name,
-            lat=lat,
-            lon=lon,
-            date=date,
-            leadtime_hours=leadtime_hours
+        return _respond(
+            lambda: _co2_point_response(city_name, lat, lon, date, leadtime_hours, ' (custom)', interp),
+            f"custom:{lat:.4f}:{lon:.4f}:{city_name}:{date}:{','.join(leadtime_hours)}:{interp}",
+            cached=lambda: co2_service.has_cached_grid(lat, lon, date, leadtime_hours)
         )
         
-        if 'error' in co2_data:
-            # Log del error para debugging
-            print(f"❌ Error en CO2 service (custom): {co2_data['error']}")
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Error interno del servidor: {str(e)}'
+        }), 500
+
+MAX_SERIES_DAYS = 366
+
+@app.route('/api/co2/<city_name>/series')
+def get_co2_series(city_name):
+    """
+    API para obtener una serie temporal de CO2 de una ciudad
+
+    Parámetros: start y end (YYYY-MM-DD, obligatorios), hours (por defecto 0),
+    interp (nearest, bilinear o idw)
+    """
+    try:
+        city_info = get_city_coordinates(city_name)
+        if not city_info:
             return jsonify({
                 'success': False,
-                'error': f"Error general: {co2_data['error']}"
-            }), 500
-        
+                'error': f'Ciudad "{city_name}" no encontrada'
+            }), 404
+
+        start = request.args.get('start', '')
+        end = request.args.get('end', '')
+        leadtime_hours = request.args.getlist('hours') or ["0"]
+        interp = _interp_arg(request.args.get('interp'))
+        if interp is None:
+            return _invalid_interp_response()
+        try:
+            start_date = datetime.strptime(start, '%Y-%m-%d')
+            end_date = datetime.strptime(end, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'Se requieren start y end en formato YYYY-MM-DD'
+            }), 400
+        if end_date < start_date or (end_date - start_date).days + 1 > MAX_SERIES_DAYS:
+            return jsonify({
+                'success': False,
+                'error': f'Rango inválido (máximo {MAX_SERIES_DAYS} días)'
+            }), 400
+
+        def run():
+            series = co2_service.get_co2_series(
+                city_info['name'], city_info['lat'], city_info['lon'],
+                start_date, end_date, leadtime_hours, interp
+            )
+            if 'error' in series:
+                print(f"❌ Error en CO2 service (series): {series['error']}")
+                user_msg, kind, status = _describe_co2_error(series)
+                return {'success': False, 'error': user_msg, 'error_kind': kind}, status
+            return {'success': True, 'data': series}, 200
+
+        return _respond(run, f"series:{city_name.lower().strip()}:{start}:{end}:{','.join(leadtime_hours)}:{interp}")
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Error interno del servidor: {str(e)}'
+        }), 500
+
+MAX_BATCH_POINTS = int(os.getenv('CO2_BATCH_MAX_POINTS', '1000'))
+
+def _co2_batch_response(points, errors, date: Optional[str], leadtime_hours, interp: str = 'nearest'):
+    """Consulta el servicio de CO2 para varios puntos y devuelve (cuerpo, código HTTP)"""
+    try:
+        results = co2_service.get_co2_data_for_points(points, date=date, leadtime_hours=leadtime_hours, interp=interp)
+
+        data = []
+        errors = list(errors)
+        for point, co2_data in zip(points, results):
+            if 'error' in co2_data:
+                print(f"❌ Error en CO2 service (batch): {co2_data['error']}")
+                user_msg, kind, _ = _describe_co2_error(co2_data)
+                errors.append({'city': point['name'], 'error': user_msg, 'error_kind': kind})
+                continue
+            if 'key' in point:
+                co2_data['city_key'] = point['key']
+            co2_data['city_coordinates'] = {'lat': point['lat'], 'lon': point['lon']}
+            data.append(co2_data)
+
+        return {
+            'success': bool(data) or not errors,
+            'data': data,
+            'errors': errors
+        }, 200
+
+    except Exception as e:
+        return {
+            'success': False,
+            'error': f'Error interno del servidor: {str(e)}'
+        }, 500
+
+@app.route('/api/co2/batch', methods=['GET', 'POST'])
+def get_co2_batch():
+    """
+    API para obtener datos de CO2 de varias ciudades y/o coordenadas en una sola respuesta.
+
+    POST (JSON): {"cities": ["lima", ...], "points": [{"lat": .., "lon": .., "name": ..}], "date": "YYYY-MM-DD", "hours": ["0", "12"], "interp": "bilinear"}
+    GET: ?cities=lima,cusco&date=YYYY-MM-DD&hours=0&hours=12&interp=bilinear
+    """
+    try:
+        if request.method == 'POST':
+            payload = request.get_json(silent=True) or {}
+            city_names = payload.get('cities') or []
+            raw_points = payload.get('points') or []
+            date = payload.get('date')
+            leadtime_hours = [str(h) for h in (payload.get('hours') or ["0", "12", "24"])]
+            interp = _interp_arg(payload.get('interp'))
+        else:
+            city_names = [c for c in request.args.get('cities', '').split(',') if c.strip()]
+            raw_points = []
+            date = request.args.get('date')
+            leadtime_hours = request.args.getlist('hours') or ["0", "12", "24"]
+            interp = _interp_arg(request.args.get('interp'))
+
+        if interp is None:
+            return _invalid_interp_response()
+
+        if not isinstance(city_names, list) or not isinstance(raw_points, list):
+            return jsonify({'success': False, 'error': 'cities y points deben ser listas'}), 400
+
+        if not city_names and not raw_points:
+            # Sin parámetros: todas las ciudades predefinidas
+            city_names = get_all_cities()
+
+        points = []
+        errors = []
+        for city_name in city_names:
+            city_info = get_city_coordinates(str(city_name))
+            if not city_info:
+                errors.append({'city': city_name, 'error': f'Ciudad "{city_name}" no encontrada'})
+                continue
+            points.append({'name': city_info['name'], 'key': str(city_name).lower().strip(), 'lat': city_info['lat'], 'lon': city_info['lon']})
+
+        for raw in raw_points:
+            try:
+                lat = float(raw['lat'])
+                lon = float(raw['lon'])
+            except (KeyError, TypeError, ValueError):
+                errors.append({'point': raw, 'error': 'Se requieren lat y lon numéricos'})
+                continue
+            if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+                errors.append({'point': raw, 'error': 'Coordenadas fuera de rango válido'})
+                continue
+            points.append({'name': raw.get('name') or 'Ubicación personalizada', 'lat': lat, 'lon': lon})
+
+        if len(points) > MAX_BATCH_POINTS:
+            return jsonify({
+                'success': False,
+                'error': f'Máximo {MAX_BATCH_POINTS} puntos por petición'
+            }), 400
+
+        point_keys = ';'.join(f"{p['lat']:.4f},{p['lon']:.4f},{p['name']}" for p in points)
+        return _respond(
+            lambda: _co2_batch_response(points, errors, date, leadtime_hours, interp),
+            f"batch:{point_keys}:{date}:{','.join(leadtime_hours)}:{interp}"
+        )
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Error interno del servidor: {str(e)}'
+        }), 500
+
+@app.route('/api/co2/tiles/<int:z>/<int:x>/<int:y>.png')
+def get_co2_tile(z, x, y):
+    """
+    Tesela PNG (256x256, Web Mercator) del campo regional de CO2 coloreado por umbrales.
+
+    Parámetros opcionales: date (YYYY-MM-DD) y hour (hora de pronóstico 0, 12 o 24;
+    promedio de las tres si se omite). Las teselas se cachean en disco y se validan
+    con ETag; si el campo de la fecha aún no está descargado se encola su precarga
+    y se responde 503 con Retry-After.
+    """
+    try:
+        if not (0 <= z <= 18 and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            return jsonify({'success': False, 'error': 'Coordenadas de tesela inválidas'}), 400
+        hour = request.args.get('hour')
+        if hour is not None and hour not in ('0', '12', '24'):
+            return jsonify({'success': False, 'error': 'hour debe ser 0, 12 o 24'}), 400
+        if not co2_service.region_area:
+            return jsonify({
+                'success': False,
+                'error': 'Las teselas requieren el modo regional (CO2_REGION)'
+            }), 404
+
+        grid_key, date = co2_service.regional_grid_key(request.args.get('date'))
+        if grid_key is None:
+            # Descarga en segundo plano (deduplicada por fecha) y reintento del cliente
+            job_manager.submit(f"prefetch:{date}", lambda: (co2_service.prefetch(date), 200))
+            response = jsonify({
+                'success': False,
+                'error': f'Datos de {date} aún no disponibles, descargando',
+                'error_kind': 'not_cached'
+            })
+            response.headers['Retry-After'] = '30'
+            return response, 503
+
+        # El ETag se deriva de la petición: la revalidación no toca el disco
+        etag = tile_renderer.etag(grid_key, z, x, y, hour)
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+        else:
+            rendered = tile_renderer.render(grid_key, z, x, y, hour)
+            if rendered is None:
+                return jsonify({'success': False, 'error': 'No se pudo leer el campo de CO2'}), 500
+            response = make_response(rendered[0])
+            response.headers['Content-Type'] = 'image/png'
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'public, max-age=3600'
+        return response
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Error interno del servidor: {str(e)}'
+        }), 500
+
+@app.route('/api/prefetch/status')
+def get_prefetch_status():
+    """API para consultar el estado de la precarga de datos CAMS"""
+    try:
         return jsonify({
             'success': True,
-            'data': co2_data
+            'prefetch': prefetch_scheduler.status()
         })
-        
     except Exception as e:
         return jsonify({
             'success': False,
-            'error': f'Error interno del servidor: {str(e)}'
+            'error': str(e)
+        }), 500
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """API para consultar el estado y el resultado de una petición asíncrona"""
+    try:
+        fmt = _response_format()
+        if fmt is None:
+            return _unsupported_format_response()
+        job = job_manager.get(job_id)
+        if not job:
+            return jsonify({
+                'success': False,
+                'error': 'Job no encontrado'
+            }), 404
+        if fmt == 'arrow' and job.get('result'):
+            # Arrow: el resultado es la tabla; el estado del job va en los metadatos
+            body = dict(job['result'], job={k: v for k, v in job.items() if k != 'result'})
+            return _encode_response(body, 200, fmt)
+        return _encode_response({
+            'success': True,
+            'job': job
+        }, 200, fmt)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
         }), 500
 
 # ----------------------------
@@ -326,7 +763,10 @@ def _aqi_label_and_color(aqi: int) -> Tuple[str, str]:
 
 @app.route('/api/weather')
 def get_weather():
-    """Obtiene clima actual, pronóstico y calidad del aire desde OpenWeatherMap por lat/lon."""
+    """
+    Obtiene clima actual, pronóstico y calidad del aire desde OpenWeatherMap por lat/lon.
+    Las tres consultas se hacen en paralelo; si alguna falla se devuelve el resto con partial=true.
+    """
     try:
         lat = request.args.get('lat', type=float)
         lon = request.args.get('lon', type=float)
@@ -337,32 +777,14 @@ def get_weather():
         if not api_key:
             return jsonify({'success': False, 'error': 'OPENWEATHERMAP_API_KEY no configurada en el entorno'}), 500
 
-        base_params = {
-            'lat': lat,
-            'lon': lon,
-            'appid': api_key
-        }
-
-        # Clima actual
-        weather_url = 'https://api.openweathermap.org/data/2.5/weather'
-        weather_params = {**base_params, 'units': 'metric', 'lang': 'es'}
-        weather_resp = requests.get(weather_url, params=weather_params, timeout=10)
-        weather_resp.raise_for_status()
-        weather = weather_resp.json()
-
-        # Pronóstico 5 días / 3 horas
-        forecast_url = 'https://api.openweathermap.org/data/2.5/forecast'
-        forecast_params = {**base_params, 'units': 'metric', 'lang': 'es'}
-        forecast_resp = requests.get(forecast_url, params=forecast_params, timeout=10)
-        forecast_resp.raise_for_status()
-        forecast = forecast_resp.json()
-
-        # Calidad del aire (AQI)
-        aqi_url = 'https://api.openweathermap.org/data/2.5/air_pollution'
-        aqi_resp = requests.get(aqi_url, params=base_params, timeout=10)
-        aqi_resp.raise_for_status()
-        aqi_data = aqi_resp.json()
+        parts, errors, cache_status = weather_service.get_weather(lat, lon, api_key)
 
+        if not parts:
+            # Todas las consultas fallaron: propagar el primer error
+            first = next(iter(errors.values()))
+            return jsonify({'success': False, 'error': first['error'], 'errors': errors}), first['status']
+
+        aqi_data = parts.get('air_pollution') or {}
         aqi_index = None
         components = {}
         if aqi_data.get('list'):
@@ -372,8 +794,11 @@ def get_weather():
 
         return jsonify({
             'success': True,
-            'weather': weather,
-            'forecast': forecast,
+            'partial': bool(errors),
+            'errors': errors,
+            'cache': cache_status,
+            'weather': parts.get('weather'),
+            'forecast': parts.get('forecast'),
             'air_quality': {
                 'aqi': aqi_index,
                 'label': label,
@@ -381,11 +806,6 @@ def get_weather():
                 'components': components
             }
         })
-    except requests.HTTPError as e:
-        try:
-            return jsonify({'success': False, 'error': e.response.json()}), e.response.status_code
-        except Exception:
-            return jsonify({'success': False, 'error': str(e)}), 502
     except Exception as e:
         return jsonify({'success': False, 'error': f'Error interno del servidor: {str(e)}'}), 500
 
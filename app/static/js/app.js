@@ -65,7 +65,17 @@ class CO2Monitor {
             "CartoDB Light": cartoLayer
         };
         
-        L.control.layers(baseMaps).addTo(this.map);
+        // Mapa de calor del campo regional de CO2 (teselas renderizadas por el servidor)
+        const co2Layer = L.tileLayer('/api/co2/tiles/{z}/{x}/{y}.png', {
+            attribution: 'CO2: Copernicus CAMS',
+            maxZoom: 18,
+            opacity: 0.7
+        });
+        const overlays = {
+            "Mapa de calor CO2": co2Layer
+        };
+        
+        L.control.layers(baseMaps, overlays).addTo(this.map);
         
         // Agregar control de escala
         L.control.scale().addTo(this.map);
@@ -243,6 +253,14 @@ class CO2Monitor {
             });
         });
 
+        // Botón para cargar todas las ciudades en una sola petición
+        const allCitiesBtn = document.getElementById('allCitiesBtn');
+        if (allCitiesBtn) {
+            allCitiesBtn.addEventListener('click', () => {
+                this.loadAllCitiesCO2();
+            });
+        }
+
         // Botón de detección de ubicación
         const detectLocationBtn = document.getElementById('detectLocationBtn');
         if (detectLocationBtn) {
@@ -647,6 +665,19 @@ class CO2Monitor {
 
     // Geocodificación inversa para obtener nombre de ciudad
     async reverseGeocode(lat, lon) {
+        // Primero buscar la ciudad conocida más cercana en el servidor (sin red externa)
+        try {
+            const localResponse = await fetch(`/api/cities/nearest?lat=${lat}&lon=${lon}&k=1&max_km=25`);
+            if (localResponse.ok) {
+                const localData = await localResponse.json();
+                if (localData.success && localData.cities.length > 0) {
+                    return localData.cities[0].name;
+                }
+            }
+        } catch (error) {
+            console.warn('Error en búsqueda local de ciudad cercana:', error);
+        }
+
         try {
             const response = await fetch(`https://nominatim.openstreetmap.org/reverse?format=json&lat=${lat}&lon=${lon}&zoom=10&addressdetails=1`);
             const data = await response.json();
@@ -847,8 +878,7 @@ class CO2Monitor {
             
             // Obtener datos de CO2 usando coordenadas personalizadas
             console.log('Solicitando datos de CO2...');
-            const co2Response = await fetch(`/api/co2/custom?lat=${lat}&lon=${lon}`);
-            const co2Data = await co2Response.json();
+            const co2Data = await this.fetchCO2Job(`/api/co2/custom?lat=${lat}&lon=${lon}`);
             
             console.log('Respuesta de CO2:', co2Data);
             
@@ -892,6 +922,120 @@ class CO2Monitor {
         }
     }
     
+    // Solicitar datos de CO2 como job asíncrono y consultar su estado hasta que termine.
+    // Si los datos ya están en caché el servidor responde en línea (200) sin crear job;
+    // si no, la primera consulta es casi inmediata y el intervalo crece hasta maxPollInterval.
+    async fetchCO2Job(url, pollInterval = 250, maxPollInterval = 2000, maxWaitMs = 15 * 60 * 1000) {
+        const separator = url.includes('?') ? '&' : '?';
+        const response = await fetch(`${url}${separator}async=1`);
+        const body = await response.json();
+        
+        // Respuesta inmediata (sin job) o error de validación
+        if (response.status !== 202) {
+            return body;
+        }
+        
+        const started = Date.now();
+        while (Date.now() - started < maxWaitMs) {
+            await new Promise(resolve => setTimeout(resolve, pollInterval));
+            pollInterval = Math.min(pollInterval * 1.5, maxPollInterval);
+            const statusResponse = await fetch(body.status_url);
+            const statusBody = await statusResponse.json();
+            
+            if (!statusBody.success) {
+                return statusBody;
+            }
+            const job = statusBody.job;
+            if (job.status === 'done' || job.status === 'failed') {
+                return job.result;
+            }
+        }
+        
+        return { success: false, error: 'Tiempo de espera agotado obteniendo datos de CO2' };
+    }
+    
+    // Cargar CO2 de todas las ciudades predefinidas con una sola petición batch
+    async loadAllCitiesCO2() {
+        this.showLoading(true);
+        
+        try {
+            const response = await fetch('/api/co2/batch', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ cities: this.cities })
+            });
+            const batch = await response.json();
+            
+            if (!batch.success) {
+                throw new Error(batch.error || (batch.errors && batch.errors[0] && batch.errors[0].error));
+            }
+            
+            const bounds = [];
+            batch.data.forEach(data => {
+                this.addCityOverviewMarker(data);
+                bounds.push([data.city_coordinates.lat, data.city_coordinates.lon]);
+            });
+            
+            if (bounds.length > 0) {
+                this.map.fitBounds(bounds, { padding: [40, 40] });
+            }
+            if (batch.errors && batch.errors.length > 0) {
+                this.showAlert(`No se pudieron cargar ${batch.errors.length} ciudades`, 'warning');
+            }
+        } catch (error) {
+            console.error('Error cargando datos de CO2 de todas las ciudades:', error);
+            this.showAlert(`Error: ${error.message || 'No se pudieron cargar las ciudades'}`, 'error');
+        } finally {
+            this.showLoading(false);
+        }
+    }
+    
+    // Marcador compacto por ciudad para la vista general (no reemplaza al marcador principal)
+    addCityOverviewMarker(data) {
+        const key = data.city_key || data.city;
+        if (this.markers[key]) {
+            this.map.removeLayer(this.markers[key]);
+        }
+        if (this.circles[key]) {
+            this.map.removeLayer(this.circles[key]);
+        }
+        
+        const lat = data.city_coordinates.lat;
+        const lon = data.city_coordinates.lon;
+        const avgCO2 = data.co2_data.average_ppm;
+        const { label, color } = getCO2HazardLabelAndColor(avgCO2);
+        
+        this.circles[key] = L.circle([lat, lon], {
+            color: color,
+            fillColor: color,
+            fillOpacity: 0.15,
+            radius: data.co2_status.buffer_radius,
+            weight: 2
+        }).addTo(this.map);
+        
+        this.markers[key] = L.marker([lat, lon], {
+            icon: L.divIcon({
+                className: 'co2-marker',
+                html: `
+                    <div class="marker-content" style="background-color: ${color}; border-color: ${color}; color:${getContrastingTextColor(color)};">
+                        <div class="co2-value">${avgCO2.toFixed(0)}</div>
+                        <div class="co2-unit">ppm</div>
+                    </div>
+                `,
+                iconSize: [60, 60],
+                iconAnchor: [30, 30]
+            })
+        }).addTo(this.map).bindPopup(`
+            <div class="popup-container">
+                <div class="popup-title">${data.city}</div>
+                <div class="popup-co2">
+                    <i class="fas fa-cloud me-1"></i>
+                    CO2: ${avgCO2.toFixed(2)} ppm (${label})
+                </div>
+            </div>
+        `);
+    }
+    
     async selectCity(cityName) {
         this.currentCity = cityName;
         this.showLoading(true);
@@ -914,8 +1058,7 @@ class CO2Monitor {
             fetchAndDisplayWeather(cityInfo.lat, cityInfo.lon, cityInfo.name || cityName);
             
             // Obtener datos de CO2
-            const co2Response = await fetch(`/api/co2/${cityName}`);
-            const co2Data = await co2Response.json();
+            const co2Data = await this.fetchCO2Job(`/api/co2/${cityName}`);
             
             if (!co2Data.success) {
                 throw new Error(co2Data.error);
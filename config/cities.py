@@ -61,4 +61,33 @@ def get_all_cities():
     """
     Obtiene todas las ciudades disponibles
     """
-    return list(CITIES_COORDINATES.keys())
\ No newline at end of file
+    return list(CITIES_COORDINATES.keys())
+
+# Caja envolvente aproximada del territorio peruano [norte, oeste, sur, este]
+PERU_BBOX = [0.5, -81.5, -18.5, -68.5]
+
+def get_cities_bbox(margin=1.0):
+    """
+    Calcula la caja envolvente de las ciudades predefinidas con un margen en grados
+    
+    Args:
+        margin (float): Margen en grados a añadir en cada dirección
+        
+    Returns:
+        list: Área en formato CAMS [norte, oeste, sur, este]
+    """
+    lats = [c['lat'] for c in CITIES_COORDINATES.values()]
+    lons = [c['lon'] for c in CITIES_COORDINATES.values()]
+    return [
+        round(max(lats) + margin, 2),
+        round(min(lons) - margin, 2),
+        round(min(lats) - margin, 2),
+        round(max(lons) + margin, 2)
+    ]
+
+def is_point_in_area(lat, lon, area):
+    """
+    Indica si un punto cae dentro de un área [norte, oeste, sur, este]
+    """
+    north, west, south, east = area
+    return south <= lat <= north and west <= lon <= east
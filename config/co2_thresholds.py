@@ -1,5 +1,7 @@
 # Configuración de umbrales de CO2 y colores para visualización en el mapa
 
+import numpy as np
+
 # Umbrales de concentración de CO2 (en ppm - partes por millón)
 CO2_THRESHOLDS = {
     'good': {
@@ -50,12 +52,24 @@ def get_buffer_radius(concentration):
     Returns:
         int: Radio en metros para el círculo en el mapa
     """
+    return int(get_buffer_radii([concentration])[0])
+
+def get_buffer_radii(concentrations):
+    """
+    Versión vectorizada de get_buffer_radius para muchas concentraciones a la vez
+    
+    Args:
+        concentrations (array-like): Concentraciones de CO2 en ppm
+        
+    Returns:
+        numpy.ndarray: Radios en metros (int)
+    """
+    concentrations = np.asarray(concentrations, dtype=float)
     # Radio base de 5km, aumenta con la concentración
     base_radius = 5000  # 5 km
-    
-    if concentration <= CO2_THRESHOLDS['good']['max']:
-        return base_radius
-    elif concentration <= CO2_THRESHOLDS['acceptable']['max']:
-        return base_radius + 2000  # 7 km
-    else:
-        return base_radius + 5000  # 10 km
\ No newline at end of file
+    return np.select(
+        [concentrations <= CO2_THRESHOLDS['good']['max'],
+         concentrations <= CO2_THRESHOLDS['acceptable']['max']],
+        [base_radius, base_radius + 2000],  # 5 km / 7 km
+        default=base_radius + 5000  # 10 km
+    ).astype(int)
\ No newline at end of file
@@ -0,0 +1,384 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+
+from services.http_client import HttpClient, backoff_delay
+
+try:
+    import aiohttp  # Opcional: E/S totalmente asíncrona
+except ImportError:  # pragma: no cover - dependencia opcional
+    aiohttp = None
+
+# Estados de un job en la API de procesos de CDS/ADS
+JOB_PENDING_STATES = ('accepted', 'running')
+JOB_FAILED_STATES = ('failed', 'dismissed', 'deleted', 'rejected')
+
+
+class CDSRequestError(Exception):
+    """Fallo de la API de CDS/ADS con su tipo (mismos error_kind que CO2Service)"""
+
+    def __init__(self, kind: str, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.kind = kind
+        self.status = status
+        self.retry_after = retry_after
+
+
+def _retry_after(headers: Dict[str, str]) -> Optional[float]:
+    value = headers.get('Retry-After') or headers.get('retry-after')
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _error_from_response(status: int, headers: Dict[str, str], text: str) -> CDSRequestError:
+    """Clasifica una respuesta de error (cuerpo problem+json de la API de procesos)"""
+    try:
+        body = json.loads(text)
+        detail = ' - '.join(str(body[k]) for k in ('title', 'detail') if body.get(k)) or text
+    except (ValueError, TypeError, AttributeError):
+        detail = text
+    detail = (detail or '').strip()[:500]
+    lower = detail.lower()
+    if status == 401:
+        kind = 'auth_error'
+    elif status == 403 or 'licence' in lower or 'terms of use' in lower:
+        kind = 'terms_error'
+    elif status == 429 or 'quota' in lower:
+        kind = 'quota_error'
+    elif status in (408, 504):
+        kind = 'timeout'
+    else:
+        kind = 'api_error'
+    return CDSRequestError(kind, f"HTTP {status}: {detail}", status=status, retry_after=_retry_after(headers))
+
+
+class _AiohttpTransport:
+    """Transporte con aiohttp: ninguna petición ocupa un hilo"""
+
+    def __init__(self, timeout: float, limit: int):
+        self.timeout = timeout
+        self.limit = limit
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=self.timeout, sock_read=self.timeout),
+                connector=aiohttp.TCPConnector(limit=self.limit)
+            )
+        return self._session
+
+    async def request(self, method: str, url: str, headers: Dict[str, str],
+                      body: Optional[Dict[str, Any]] = None) -> Tuple[int, Dict[str, str], str]:
+        try:
+            async with self._get_session().request(method, url, headers=headers, json=body) as response:
+                return response.status, dict(response.headers), await response.text()
+        except asyncio.TimeoutError as e:
+            raise CDSRequestError('timeout', f"Timeout en {method} {url}: {e}")
+        except aiohttp.ClientError as e:
+            raise CDSRequestError('connection', f"Error de conexión en {method} {url}: {e}")
+
+    async def download(self, url: str, headers: Dict[str, str], path: str,
+                       chunk_size: int) -> Tuple[int, Dict[str, str], int]:
+        try:
+            async with self._get_session().get(url, headers=headers) as response:
+                if response.status >= 400:
+                    return response.status, dict(response.headers), 0
+                written = 0
+                with open(path, 'wb') as f:
+                    async for chunk in response.content.iter_chunked(chunk_size):
+                        f.write(chunk)
+                        written += len(chunk)
+                return response.status, dict(response.headers), written
+        except asyncio.TimeoutError as e:
+            raise CDSRequestError('timeout', f"Timeout descargando {url}: {e}")
+        except aiohttp.ClientError as e:
+            raise CDSRequestError('connection', f"Error de conexión descargando {url}: {e}")
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+class _RequestsTransport:
+    """
+    Transporte sin aiohttp: cada petición HTTP (breve) se ejecuta en un pool pequeño
+    de hilos sobre la sesión compartida; las esperas entre consultas son
+    asyncio.sleep, así que un job en cola no retiene ningún hilo
+    """
+
+    def __init__(self, session: requests.Session, timeout: float, max_workers: int):
+        self.session = session
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='cds-io')
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _request_sync(self, method, url, headers, body):
+        try:
+            response = self.session.request(method, url, headers=headers, json=body, timeout=self.timeout)
+        except requests.Timeout as e:
+            raise CDSRequestError('timeout', f"Timeout en {method} {url}: {e}")
+        except requests.RequestException as e:
+            raise CDSRequestError('connection', f"Error de conexión en {method} {url}: {e}")
+        return response.status_code, dict(response.headers), response.text
+
+    def _download_sync(self, url, headers, path, chunk_size):
+        try:
+            with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                if response.status_code >= 400:
+                    return response.status_code, dict(response.headers), 0
+                written = 0
+                with open(path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size):
+                        f.write(chunk)
+                        written += len(chunk)
+                return response.status_code, dict(response.headers), written
+        except requests.Timeout as e:
+            raise CDSRequestError('timeout', f"Timeout descargando {url}: {e}")
+        except requests.RequestException as e:
+            raise CDSRequestError('connection', f"Error de conexión descargando {url}: {e}")
+
+    async def request(self, method, url, headers, body=None):
+        return await self._run(self._request_sync, method, url, headers, body)
+
+    async def download(self, url, headers, path, chunk_size):
+        return await self._run(self._download_sync, url, headers, path, chunk_size)
+
+    async def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+class AsyncCDSClient:
+    """
+    Cliente asyncio de la API de procesos de CDS/ADS (submit → poll → download).
+
+    Copernicus encola las peticiones en el servidor; `cdsapi.Client.retrieve`
+    bloquea un hilo durante toda la espera. Aquí cada petición es una corrutina:
+    se envía el job, su estado se consulta con intervalos crecientes (con jitter)
+    y el resultado se descarga en streaming a un archivo
+    `.part` que se publica con os.replace. Dentro del bucle, las esperas de
+    decenas de jobs en cola son corrutinas; las descargas de archivos se
+    limitan con un semáforo. Un llamador síncrono (AsyncLoopRunner.run) sigue
+    esperando en su propio hilo.
+
+    Usa aiohttp si está instalado; si no, las peticiones HTTP breves se ejecutan
+    en un pool pequeño sobre la sesión compartida de `HttpClient`.
+    """
+
+    def __init__(self, url: str, key: str, http: Optional[HttpClient] = None, timeout: float = 60.0,
+                 poll_interval: float = 1.0, max_poll_interval: float = 30.0, max_downloads: int = 4,
+                 chunk_size: int = 1024 * 1024):
+        self.url = url.rstrip('/')
+        self.headers = {'PRIVATE-TOKEN': key, 'User-Agent': 'CO2-Monitor-App/1.0'}
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.max_downloads = max_downloads
+        self.chunk_size = chunk_size
+        if aiohttp is not None:
+            self.transport = _AiohttpTransport(timeout, limit=max(10, max_downloads * 2))
+        else:
+            session = (http or HttpClient.from_env()).session_for(self.url)
+            self.transport = _RequestsTransport(session, timeout, max_workers=max(4, max_downloads))
+        self._download_slots: Optional[asyncio.Semaphore] = None
+        self._stats_lock = threading.Lock()
+        self.pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.polls = 0
+        self.bytes_downloaded = 0
+
+    def _api(self, path: str) -> str:
+        return f"{self.url}/retrieve/v1/{path}"
+
+    async def _json(self, method: str, url: str, body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        status, headers, text = await self.transport.request(method, url, self.headers, body)
+        if status >= 400:
+            raise _error_from_response(status, headers, text)
+        try:
+            return json.loads(text) if text else {}
+        except ValueError:
+            raise CDSRequestError('api_error', f"Respuesta no válida de {url}: {text[:200]}", status=status)
+
+    async def submit(self, dataset: str, request: Dict[str, Any]) -> str:
+        """Envía la petición y devuelve el id del job"""
+        reply = await self._json('POST', self._api(f"processes/{dataset}/execution"), {'inputs': request})
+        job_id = reply.get('jobID') or reply.get('id')
+        if not job_id:
+            raise CDSRequestError('api_error', f"La API no devolvió el id del job: {reply}")
+        return job_id
+
+    async def status(self, job_id: str) -> Dict[str, Any]:
+        """Estado actual del job"""
+        return await self._json('GET', self._api(f"jobs/{job_id}"))
+
+    async def wait(self, job_id: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Consulta el job hasta que termina (intervalo creciente con jitter)
+
+        Args:
+            job_id: Id del job
+            deadline: Instante límite (time.monotonic()) o None
+
+        Returns:
+            Los resultados del job (con `asset.value.href`)
+        """
+        attempt = 0
+        while True:
+            state = await self.status(job_id)
+            with self._stats_lock:
+                self.polls += 1
+            status = state.get('status')
+            if status == 'successful':
+                return await self._json('GET', self._api(f"jobs/{job_id}/results"))
+            if status in JOB_FAILED_STATES:
+                raise await self._job_error(job_id, status)
+            if status not in JOB_PENDING_STATES:
+                raise CDSRequestError('api_error', f"Estado de job desconocido: {status}")
+
+            delay = max(self.poll_interval, backoff_delay(attempt, self.poll_interval, self.max_poll_interval))
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CDSRequestError('timeout', f"El job {job_id} sigue en estado '{status}' al agotarse el plazo")
+                delay = min(delay, remaining)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _job_error(self, job_id: str, status: str) -> CDSRequestError:
+        """Error de un job fallido (el detalle lo devuelve el endpoint de resultados)"""
+        url = self._api(f"jobs/{job_id}/results")
+        code, headers, text = await self.transport.request('GET', url, self.headers)
+        error = _error_from_response(code if code >= 400 else 500, headers, text)
+        return CDSRequestError(error.kind, f"Job {job_id} {status}: {error}", error.status, error.retry_after)
+
+    async def download(self, href: str, target: str, expected_size: Optional[int] = None) -> int:
+        """Descarga el resultado en streaming a `target` (vía `target.part` + os.replace)"""
+        if self._download_slots is None:
+            self._download_slots = asyncio.Semaphore(self.max_downloads)
+        part = f"{target}.part"
+        async with self._download_slots:
+            try:
+                status, headers, written = await self.transport.download(href, self.headers, part, self.chunk_size)
+                if status >= 400:
+                    raise _error_from_response(status, headers, '')
+                if expected_size is not None and written != int(expected_size):
+                    raise CDSRequestError('download_incomplete',
+                                          f"Archivo incompleto: {written} de {expected_size} bytes")
+                os.replace(part, target)
+            finally:
+                if os.path.exists(part):
+                    try:
+                        os.remove(part)
+                    except OSError:
+                        pass
+        with self._stats_lock:
+            self.bytes_downloaded += written
+        return written
+
+    async def delete(self, job_id: str) -> None:
+        """Libera el job en el servidor (sin fallar si no es posible)"""
+        try:
+            await self.transport.request('DELETE', self._api(f"jobs/{job_id}"), self.headers)
+        except CDSRequestError:
+            pass
+
+    async def retrieve(self, dataset: str, request: Dict[str, Any], target: str,
+                       deadline_seconds: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Ciclo completo: envía, espera en cola y descarga el resultado en `target`
+
+        Returns:
+            Dict con 'job_id', 'target', 'size' y tiempos en cola y total (segundos)
+
+        Raises:
+            CDSRequestError: con el tipo de error clasificado
+        """
+        started = time.monotonic()
+        deadline = started + deadline_seconds if deadline_seconds else None
+        with self._stats_lock:
+            self.pending += 1
+            self.submitted += 1
+        try:
+            job_id = await self.submit(dataset, request)
+            results = await self.wait(job_id, deadline)
+            queued = time.monotonic() - started
+            asset = (results.get('asset') or {}).get('value') or {}
+            if not asset.get('href'):
+                raise CDSRequestError('api_error', f"El job {job_id} no devolvió un archivo: {results}")
+            size = await self.download(asset['href'], target, asset.get('file:size'))
+            await self.delete(job_id)
+            with self._stats_lock:
+                self.completed += 1
+            return {
+                'job_id': job_id,
+                'target': target,
+                'size': size,
+                'queued_seconds': round(queued, 3),
+                'elapsed_seconds': round(time.monotonic() - started, 3)
+            }
+        except Exception:
+            with self._stats_lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._stats_lock:
+                self.pending -= 1
+
+    async def close(self) -> None:
+        await self.transport.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de peticiones del cliente"""
+        with self._stats_lock:
+            return {
+                'transport': 'aiohttp' if aiohttp is not None else 'requests',
+                'pending': self.pending,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'polls': self.polls,
+                'bytes_downloaded': self.bytes_downloaded
+            }
+
+
+class AsyncLoopRunner:
+    """
+    Bucle asyncio en un hilo de fondo para usar corrutinas desde código síncrono
+    (Flask, jobs, precarga): todas las descargas en curso del proceso comparten
+    el mismo bucle. `run` bloquea al hilo que llama hasta el resultado.
+    """
+
+    def __init__(self, name: str = 'cds-async'):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name=self.name, daemon=True)
+                thread.start()
+                self._loop = loop
+            return self._loop
+
+    def run(self, coro, timeout: Optional[float] = None) -> Any:
+        """Ejecuta la corrutina en el bucle de fondo y espera su resultado"""
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        try:
+            return future.result(timeout)
+        except BaseException:
+            # Sin esperador (timeout o interrupción) la corrutina no debe seguir en el bucle
+            future.cancel()
+            raise
@@ -0,0 +1,170 @@
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+from itertools import repeat
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from services.geo_utils import normalize_place_name
+
+# Prioridad por tipo de lugar (city > town > village), compartida con GeocodingService
+TYPE_PRIORITY = {'city': 3, 'town': 2, 'village': 1}
+
+
+def city_score(place_type: str, importance: float) -> float:
+    """Puntuación base de un lugar: tipo de asentamiento e importancia"""
+    return TYPE_PRIORITY.get((place_type or '').lower(), 0) * 10 + (importance or 0) * 5
+
+
+class AutocompleteIndex:
+    """
+    Índice en memoria para autocompletar nombres de ciudades.
+
+    - Prefijos: arreglo ordenado de (nombre normalizado, id) con búsqueda binaria.
+      Se indexa el nombre completo y cada sufijo que empieza en una palabra, así
+      "maldonado" encuentra "Puerto Maldonado".
+    - Errores tipográficos: índice de trigramas con similitud de Jaccard, usado
+      cuando los prefijos no bastan para llenar el límite.
+
+    Los resultados se ordenan con las mismas señales que `_find_best_city_match`
+    (tipo de lugar e importancia) más una bonificación por coincidencia exacta.
+    """
+
+    FUZZY_MIN_SIMILARITY = 0.35
+
+    def __init__(self):
+        self._entries: List[Dict[str, Any]] = []
+        self._names: List[str] = []
+        self._scores: List[float] = []
+        self._keys: List[Tuple[str, int]] = []
+        self._trigrams: Dict[str, Set[int]] = {}
+        self._trigram_counts: List[int] = []
+        self._seen: Set[Tuple[str, float, float]] = set()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _trigrams_of(text: str) -> Set[str]:
+        padded = f"  {text} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def add(self, city: Dict[str, Any], aliases: Iterable[str] = ()) -> bool:
+        """
+        Añade una ciudad (mismo formato que GeocodingService) si no estaba ya
+
+        Args:
+            city: Ciudad a indexar
+            aliases: Nombres alternativos que también deben encontrarla
+
+        Returns:
+            True si se añadió
+        """
+        with self._lock:
+            keys = self._insert(city, aliases)
+            for key in keys or ():
+                insort(self._keys, key)
+        return keys is not None
+
+    def add_many(self, cities: Iterable[Dict[str, Any]], aliases: Optional[Iterable[Iterable[str]]] = None) -> int:
+        """
+        Añade varias ciudades (con sus nombres alternativos en paralelo, si se dan)
+        ordenando el arreglo de prefijos una sola vez
+
+        Returns:
+            Cuántas ciudades eran nuevas
+        """
+        added = 0
+        with self._lock:
+            new_keys = []
+            for city, city_aliases in zip(cities, aliases if aliases is not None else repeat(())):
+                keys = self._insert(city, city_aliases)
+                if keys is not None:
+                    new_keys.extend(keys)
+                    added += 1
+            if new_keys:
+                self._keys.extend(new_keys)
+                self._keys.sort()
+        return added
+
+    def _insert(self, city: Dict[str, Any], aliases: Iterable[str]) -> Optional[List[Tuple[str, int]]]:
+        """Registra la ciudad y devuelve sus claves de prefijo (None si ya existía)"""
+        name = normalize_place_name(city.get('name', ''))
+        if not name:
+            return None
+        # Dos resultados con el mismo nombre a menos de ~10 km se consideran el mismo lugar
+        identity = (name, round(float(city['lat']), 1), round(float(city['lon']), 1))
+        if identity in self._seen:
+            return None
+        self._seen.add(identity)
+        entry_id = len(self._entries)
+        self._entries.append(city)
+        self._names.append(name)
+        self._scores.append(city_score(city.get('place_type'), city.get('importance', 0)))
+
+        keys = []
+        grams = set()
+        for indexed_name in {name} | {normalize_place_name(alias) for alias in aliases} - {''}:
+            words = indexed_name.split(' ')
+            for i in range(len(words)):
+                keys.append((' '.join(words[i:]), entry_id))
+            grams |= self._trigrams_of(indexed_name)
+        self._trigram_counts.append(len(grams))
+        for gram in grams:
+            self._trigrams.setdefault(gram, set()).add(entry_id)
+        return keys
+
+    def search(self, query: str, limit: int = 5, fuzzy: bool = True) -> List[Dict[str, Any]]:
+        """
+        Devuelve hasta `limit` ciudades cuyo nombre empieza por la consulta
+        (o se le parece, si no hay suficientes por prefijo y `fuzzy` es True)
+
+        Acepta consultas como "Lima, Perú": cada parte tras una coma debe
+        coincidir (o ser prefijo) con la región o el país de la ciudad.
+        """
+        parts = [normalize_place_name(p) for p in query.split(',')]
+        text = parts[0]
+        qualifiers = [p for p in parts[1:] if p]
+        if not text:
+            return []
+
+        with self._lock:
+            ranked: Dict[int, float] = {}
+            pos = bisect_left(self._keys, (text, -1))
+            while pos < len(self._keys) and self._keys[pos][0].startswith(text):
+                key, entry_id = self._keys[pos]
+                pos += 1
+                if qualifiers and not self._matches_qualifiers(entry_id, qualifiers):
+                    continue
+                bonus = 20 if key == text else 10
+                # Coincidencia al inicio del nombre completo frente a una palabra interior
+                if self._names[entry_id].startswith(text):
+                    bonus += 5
+                ranked[entry_id] = max(ranked.get(entry_id, 0), self._scores[entry_id] + bonus)
+
+            if fuzzy and len(ranked) < limit and len(text) >= 3:
+                for entry_id, similarity in self._fuzzy(text):
+                    if entry_id not in ranked and self._matches_qualifiers(entry_id, qualifiers):
+                        ranked[entry_id] = self._scores[entry_id] + similarity * 10
+
+            best = sorted(ranked.items(), key=lambda item: item[1], reverse=True)[:limit]
+            return [self._entries[entry_id] for entry_id, _ in best]
+
+    def _matches_qualifiers(self, entry_id: int, qualifiers: List[str]) -> bool:
+        """Cada calificador coincide con el inicio de la región o del país de la ciudad"""
+        city = self._entries[entry_id]
+        fields = [normalize_place_name(str(city.get(f) or '')) for f in ('region', 'country')]
+        return all(any(field.startswith(q) for field in fields if field) for q in qualifiers)
+
+    def _fuzzy(self, text: str) -> List[Tuple[int, float]]:
+        """Candidatos por trigramas compartidos con su similitud de Jaccard"""
+        grams = self._trigrams_of(text)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._trigrams.get(gram, ()))
+        matches = []
+        for entry_id, count in shared.items():
+            similarity = count / (len(grams) + self._trigram_counts[entry_id] - count)
+            if similarity >= self.FUZZY_MIN_SIMILARITY:
+                matches.append((entry_id, similarity))
+        return matches
@@ -1,28 +1,108 @@
 from datetime import datetime, timedelta
 import cdsapi
+import requests
 import xarray as xr
 import numpy as np
 import os
 import sys
 import warnings
 import json
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Dict, Optional
 
 # Importar desde el paquete config
-from config.cities import CITIES_COORDINATES
-from config.co2_thresholds import get_co2_status, get_buffer_radius
+from config.cities import CITIES_COORDINATES, PERU_BBOX, get_cities_bbox, is_point_in_area
+from config.co2_thresholds import get_co2_status, get_buffer_radius, get_buffer_radii
+from services.data_cache import DataCache
+from services.single_flight import SingleFlight
+from services.grid_store import GridStore
+from services.grid_cache import GridCache
+from services.http_client import HttpClient, backoff_delay, retry_after_seconds
+from services.async_cds_client import AsyncCDSClient, AsyncLoopRunner, CDSRequestError
+from services.geo_utils import haversine_km
+from services.interpolation import StencilCache, apply_stencils
 
 # Suprimir warnings específicos
 warnings.filterwarnings('ignore', category=FutureWarning)
 warnings.filterwarnings('ignore', category=DeprecationWarning)
 
+# Dataset CAMS de gases de efecto invernadero en ADS
+CAMS_DATASET = 'cams-global-greenhouse-gas-forecasts'
+
+# Errores que no se resuelven reintentando la misma petición
+NON_RETRYABLE_KINDS = {
+    'credentials_missing', 'auth_error', 'terms_error', 'cfgrib_missing', 'netcdf_engine_missing'
+}
+
+class CO2DataError(Exception):
+    """
+    Fallo al obtener o leer un campo de CO2, con su tipo (error_kind).
+
+    El error viaja con cada llamada (excepción o dict de respuesta) en lugar de
+    guardarse en el servicio, así que peticiones concurrentes en hilos distintos
+    no se pisan el tipo de error.
+    """
+
+    def __init__(self, kind: str, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.kind = kind
+        # Segundos indicados por el servidor (Retry-After) antes de reintentar
+        self.retry_after = retry_after
+
+    def to_dict(self) -> Dict[str, str]:
+        """Error en el formato de respuesta del servicio"""
+        return {"error": str(self), "error_kind": self.kind}
+
 class CO2Service:
-    def __init__(self):
+    def __init__(self, http: Optional[HttpClient] = None):
         # Cliente CDS API: inicialización perezosa para evitar fallos al iniciar si faltan credenciales
         url = os.getenv("CDSAPI_URL")
         key = os.getenv("CDSAPI_KEY")
         self._cfgrib_available = None
         self.client = None
-        self._last_error = None
+        self._client_credentials = None
+        self._client_lock = threading.Lock()
+        # Cliente de descarga: 'cdsapi' (bloqueante) o 'async' (submit/poll/download en un bucle asyncio compartido)
+        self.cds_client_mode = os.getenv("CO2_CDS_CLIENT", "cdsapi").strip().lower()
+        self._async_cds = None
+        self._async_runner = AsyncLoopRunner()
+        # Sesiones HTTP compartidas (keep-alive y métricas por host)
+        self.http = http or HttpClient.from_env()
+        # Directorio de datos y caché persistente de descargas CAMS
+        project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.data_dir = os.getenv("CO2_DATA_DIR", os.path.join(project_dir, "data"))
+        self.cache = DataCache(
+            os.path.join(self.data_dir, "cache"),
+            max_bytes=int(float(os.getenv("CO2_CACHE_MAX_MB", "2048")) * 1024 * 1024),
+            max_age_seconds=int(float(os.getenv("CO2_CACHE_MAX_AGE_HOURS", "336")) * 3600)
+        )
+        # Modo regional: una sola descarga por fecha para toda la región configurada
+        self.region_area = self._get_region_area()
+        # Campos ya procesados (.npy + metadatos) dentro de la misma caché
+        self.grid_store = GridStore(self.cache)
+        # Directorios de trabajo de las descargas en curso (uno por descarga)
+        self.tmp_dir = os.getenv("CO2_TMP_DIR", os.path.join(self.data_dir, "tmp"))
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self._purge_stale_work_dirs()
+        # Reintentos de descarga: backoff exponencial con jitter dentro de un plazo total
+        self.download_max_attempts = max(1, int(os.getenv("CO2_DOWNLOAD_MAX_ATTEMPTS", "3")))
+        self.download_deadline = float(os.getenv("CO2_DOWNLOAD_DEADLINE_SECONDS", "600"))
+        self.download_backoff_base = float(os.getenv("CO2_DOWNLOAD_BACKOFF_BASE_SECONDS", "2"))
+        self.download_backoff_cap = float(os.getenv("CO2_DOWNLOAD_BACKOFF_MAX_SECONDS", "60"))
+        # Campos calientes memory-mapped en proceso (páginas compartidas entre workers)
+        self.grid_cache = GridCache(
+            self.grid_store,
+            max_bytes=int(float(os.getenv("CO2_GRID_CACHE_MAX_MB", "512")) * 1024 * 1024),
+            max_age_seconds=int(float(os.getenv("CO2_GRID_CACHE_MAX_AGE_MINUTES", "60")) * 60)
+        )
+        # Plantillas de interpolación (bilinear/idw) por malla y punto
+        self.stencils = StencilCache(int(os.getenv("CO2_STENCIL_CACHE_MAX_ENTRIES", "100000")))
+        # Coalescencia de descargas/lecturas idénticas entre hilos y procesos
+        self._flight = SingleFlight(os.path.join(self.data_dir, "locks"))
         if not (url and key):
             print("⚠️ CDSAPI_URL/CDSAPI_KEY no están configuradas. La descarga de CO2 no estará disponible hasta que las definas en las variables de entorno o proveas un archivo .cdsapirc válido en el proyecto.")
 
@@ -53,11 +133,47 @@ class CO2Service:
                 print("💡 Instala cfgrib con: pip install cfgrib")
         return self._cfgrib_available
 
+    def _get_cds_client(self, url: str, key: str):
+        """
+        Cliente CDS/ADS reutilizado entre descargas e intentos (mientras no cambien
+        las credenciales), sobre la sesión HTTP compartida del host
+        """
+        with self._client_lock:
+            if self.client is None or self._client_credentials != (url, key):
+                self.client = cdsapi.Client(
+                    url=url, key=key, timeout=300, retry_max=1,
+                    session=self.http.session_for(url)
+                )
+                self._client_credentials = (url, key)
+            return self.client
+
+    def _get_async_cds_client(self, url: str, key: str) -> AsyncCDSClient:
+        """Cliente asyncio de CDS/ADS, reutilizado mientras no cambien las credenciales"""
+        with self._client_lock:
+            if self._async_cds is None or self._async_cds[0] != (url, key):
+                client = AsyncCDSClient(
+                    url, key, http=self.http,
+                    poll_interval=float(os.getenv("CO2_CDS_POLL_SECONDS", "1")),
+                    max_poll_interval=float(os.getenv("CO2_CDS_POLL_MAX_SECONDS", "30")),
+                    max_downloads=int(os.getenv("CO2_CDS_MAX_DOWNLOADS", "4"))
+                )
+                self._async_cds = ((url, key), client)
+            return self._async_cds[1]
+
+    def async_cds_stats(self):
+        """Contadores del cliente asyncio de CDS/ADS (None si no se usa)"""
+        return self._async_cds[1].stats() if self._async_cds is not None else None
+
+    def flight_stats(self):
+        """Contadores de la coalescencia de peticiones idénticas (single-flight)"""
+        return self._flight.stats()
+
     def _get_cds_credentials(self):
         """Obtiene (url, key) para CDS/ADS desde variables de entorno o archivo .cdsapirc en proyecto/cwd/HOME."""
         # Para Railway: usar exclusivamente .cdsapirc, ignorando variables de entorno
-        # Buscar .cdsapirc en ubicaciones comunes
-        candidate_paths = [
+        # Buscar .cdsapirc en ubicaciones comunes (CDSAPI_RC, como en cdsapi, tiene prioridad)
+        candidate_paths = [os.environ["CDSAPI_RC"]] if os.getenv("CDSAPI_RC") else []
+        candidate_paths += [
             os.path.join(os.path.dirname(os.path.dirname(__file__)), ".cdsapirc"),
             os.path.join(os.getcwd(), ".cdsapirc"),
             os.path.expanduser("~/.cdsapirc"),
@@ -84,320 +200,698 @@ class CO2Service:
             except Exception as e:
                 print(f"⚠️ No se pudieron leer credenciales desde {p}: {e}")
                 continue
-        self._last_error = 'credentials_missing'
         return None, None
         
-    def get_co2_data_for_city(self, city_name, lat, lon, date=None, leadtime_hours=["0", "12", "24"]):
+    def _parse_date(self, date):
+        """Normaliza la fecha solicitada (por defecto, 7 días atrás por el retraso de CAMS)"""
+        if date is None:
+            # CAMS data has a 4-day delay, use a date that should have available data
+            return datetime.now() - timedelta(days=7)  # Use data from 7 days ago to ensure availability
+        if isinstance(date, str):
+            # Convertir string a datetime si es necesario
+            try:
+                return datetime.strptime(date, "%Y-%m-%d")
+            except ValueError:
+                return datetime.now() - timedelta(days=7)
+        return date
+
+    def get_co2_data_for_city(self, city_name, lat, lon, date=None, leadtime_hours=["0", "12", "24"], interp="nearest"):
         """
         Obtiene datos de CO2 para una ciudad específica
         """
         # Lectura basada en GRIB (cfgrib requerido).
         # cfgrib solo será necesario si el archivo descargado es GRIB
-            
-        if date is None:
-            # CAMS data has a 4-day delay, use a date that should have available data
-            date = datetime.now() - timedelta(days=7)  # Use data from 7 days ago to ensure availability
-        elif isinstance(date, str):
-            # Convertir string a datetime si es necesario
+        date = self._parse_date(date)
+
+        # Peticiones idénticas en curso comparten una sola descarga y un solo procesamiento
+        data_format, _ = self._get_data_format()
+        request_key = DataCache.make_key(self._build_request(lat, lon, date, leadtime_hours, data_format))
+        flight_key = f"city-{request_key}-{lat:.4f}-{lon:.4f}-{city_name}-{interp}"
+        return self._flight.do(
+            flight_key,
+            lambda: self._compute_co2_data(city_name, lat, lon, date, leadtime_hours, interp)
+        )
+
+    def get_co2_data_for_points(self, points, date=None, leadtime_hours=["0", "12", "24"], interp="nearest"):
+        """
+        Obtiene datos de CO2 para varios puntos en una sola pasada
+
+        Los puntos que comparten archivo (p. ej. todos los de la región) se resuelven
+        abriendo el dataset una sola vez y extrayendo todas las celdas con una
+        selección vectorizada punto a punto.
+
+        Args:
+            points: Lista de dicts con 'name', 'lat' y 'lon'
+            date: Fecha (YYYY-MM-DD o datetime)
+            leadtime_hours: Horas de pronóstico
+            interp: 'nearest', 'bilinear' o 'idw'
+
+        Returns:
+            Lista de resultados en el mismo orden que `points` (cada uno puede contener 'error')
+        """
+        date = self._parse_date(date)
+        data_format, _ = self._get_data_format()
+
+        # Agrupar puntos por archivo CAMS (misma petición)
+        groups = {}
+        for idx, point in enumerate(points):
+            request = self._build_request(point['lat'], point['lon'], date, leadtime_hours, data_format)
+            groups.setdefault(DataCache.make_key(request), []).append(idx)
+
+        results = [None] * len(points)
+        for indices in groups.values():
+            first = points[indices[0]]
             try:
-                date = datetime.strptime(date, "%Y-%m-%d")
-            except ValueError:
-                date = datetime.now() - timedelta(days=7)
-            
+                grid_key = self._get_co2_grid(first['lat'], first['lon'], date, leadtime_hours)
+                lats = np.array([points[i]['lat'] for i in indices], dtype=float)
+                lons = np.array([points[i]['lon'] for i in indices], dtype=float)
+                data = self._read_co2_points(grid_key, lats, lons, interp)
+
+                # Promedios y radios de todos los puntos en una sola pasada
+                averages = data['co2_ppm'].reshape(-1, len(indices)).mean(axis=0)
+                radii = get_buffer_radii(averages)
+                for j, i in enumerate(indices):
+                    point = points[i]
+                    results[i] = self._format_result(
+                        point['name'], point['lat'], point['lon'],
+                        data['co2_ppm'][..., j],
+                        float(data['actual_lat'][j]), float(data['actual_lon'][j]),
+                        data['time_info'], float(data['distance_km'][j]),
+                        avg_co2=float(averages[j]), buffer_radius=int(radii[j]),
+                        interpolation=self._interpolation_info(data, j)
+                    )
+            except CO2DataError as e:
+                for i in indices:
+                    results[i] = dict(e.to_dict(), city=points[i]['name'])
+            except Exception as e:
+                for i in indices:
+                    results[i] = {"error": f"Error general: {str(e)}", "error_kind": "general_error", "city": points[i]['name']}
+
+        return results
+
+    def _split_date_range(self, start, end):
+        """
+        Divide [start, end] en rangos que se piden a CAMS en una sola petición:
+        uno por mes calendario (CO2_SERIES_CHUNK=month) o el rango completo (range)
+        """
+        if os.getenv("CO2_SERIES_CHUNK", "month").strip().lower() == "range":
+            return [(start, end)]
+        chunks = []
+        chunk_start = start
+        while chunk_start <= end:
+            if chunk_start.month == 12:
+                next_month = chunk_start.replace(year=chunk_start.year + 1, month=1, day=1)
+            else:
+                next_month = chunk_start.replace(month=chunk_start.month + 1, day=1)
+            chunk_end = min(end, next_month - timedelta(days=1))
+            chunks.append((chunk_start, chunk_end))
+            chunk_start = next_month
+        return chunks
+
+    def get_co2_series(self, city_name, lat, lon, start, end, leadtime_hours=["0"], interp="nearest"):
+        """
+        Obtiene una serie temporal de CO2 para un punto entre dos fechas
+
+        El rango se divide en una petición CAMS por mes; los meses que no están en
+        caché se descargan en paralelo con un pool acotado y la serie se arma desde
+        los campos ingeridos.
+
+        Returns:
+            Dict con la serie en formato columnar ('timestamps' + 'ppm') o con 'error'
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        start = datetime.strptime(start, "%Y-%m-%d") if isinstance(start, str) else start
+        end = datetime.strptime(end, "%Y-%m-%d") if isinstance(end, str) else end
+        if end < start:
+            return {"error": "La fecha final es anterior a la inicial", "error_kind": "invalid_range"}
+
+        chunks = self._split_date_range(start, end)
+        max_parallel = max(1, int(os.getenv("CO2_SERIES_MAX_PARALLEL", "3")))
+
+        def fetch(chunk):
+            try:
+                return self._get_co2_grid(lat, lon, chunk[0], leadtime_hours, end_date=chunk[1]), None
+            except CO2DataError as e:
+                return None, e
+            except Exception as e:
+                return None, CO2DataError("download_failed", str(e))
+
+        with ThreadPoolExecutor(max_workers=min(max_parallel, len(chunks))) as pool:
+            fetched = list(pool.map(fetch, chunks))
+
+        timestamps = []
+        values = []
+        chunk_info = []
+        actual_lat = actual_lon = None
+        for (chunk_start, chunk_end), (grid_key, error) in zip(chunks, fetched):
+            info = {"start": chunk_start.strftime('%Y-%m-%d'), "end": chunk_end.strftime('%Y-%m-%d')}
+            if error is not None:
+                info.update(error.to_dict())
+                chunk_info.append(info)
+                continue
+
+            entry = self.grid_cache.get(grid_key)
+            valid_times = entry.meta.get('valid_times') if entry is not None else None
+            if valid_times is None:
+                info["error"] = "No se pudieron procesar los datos"
+                info["error_kind"] = "processing_failed"
+                chunk_info.append(info)
+                continue
+
+            try:
+                data = self._read_co2_points(grid_key, np.array([lat], dtype=float), np.array([lon], dtype=float), interp)
+            except CO2DataError as e:
+                info.update(e.to_dict())
+                chunk_info.append(info)
+                continue
+            timestamps.append(np.asarray(valid_times, dtype=np.int64).ravel())
+            values.append(data['co2_ppm'][..., 0].ravel())
+            if interp == 'nearest':
+                actual_lat, actual_lon = float(data['actual_lat'][0]), float(data['actual_lon'][0])
+            else:
+                actual_lat, actual_lon = lat, lon
+            chunk_info.append(info)
+
+        if not values:
+            failed = chunk_info[0] if chunk_info else {}
+            return {"error": failed.get("error", "Sin datos"), "error_kind": failed.get("error_kind", "download_failed")}
+
+        timestamps = np.concatenate(timestamps)
+        ppm = np.concatenate(values)
+        order = np.argsort(timestamps, kind='stable')
+        timestamps = timestamps[order]
+        ppm = ppm[order]
+
+        return {
+            "city": city_name,
+            "coordinates": {
+                "target_lat": lat,
+                "target_lon": lon,
+                "actual_lat": actual_lat,
+                "actual_lon": actual_lon
+            },
+            "range": {"start": start.strftime('%Y-%m-%d'), "end": end.strftime('%Y-%m-%d')},
+            "leadtime_hours": [str(h) for h in leadtime_hours],
+            "series": {
+                # Arreglos numpy: cada formato de respuesta los serializa desde el buffer
+                "timestamps": timestamps.astype('datetime64[s]'),
+                "ppm": ppm
+            },
+            "summary": {
+                "average_ppm": float(np.mean(ppm)),
+                "min_ppm": float(np.min(ppm)),
+                "max_ppm": float(np.max(ppm)),
+                "points": int(ppm.size)
+            },
+            "interpolation": interp,
+            "chunks": chunk_info,
+            "partial": any('error' in c for c in chunk_info)
+        }
+
+    def prefetch(self, date=None, leadtime_hours=["0", "12", "24"]):
+        """
+        Descarga a la caché los archivos necesarios para las ciudades configuradas en una fecha
+
+        Con el modo regional activo basta un único archivo para todas las ciudades.
+
+        Returns:
+            Dict con la fecha y el estado de cada archivo ('cached', 'downloaded' o 'failed')
+        """
+        date = self._parse_date(date)
+        data_format, _ = self._get_data_format()
+
+        # Una entrada por archivo CAMS distinto
+        targets = {}
+        for city in CITIES_COORDINATES.values():
+            key = DataCache.make_key(self._build_request(city['lat'], city['lon'], date, leadtime_hours, data_format))
+            targets.setdefault(key, city)
+
+        files = []
+        for key, city in targets.items():
+            was_cached = self.grid_store.exists(key)
+            entry = {'key': key, 'city': city['name']}
+            try:
+                self._get_co2_grid(city['lat'], city['lon'], date, leadtime_hours)
+                entry['status'] = 'cached' if was_cached else 'downloaded'
+            except CO2DataError as e:
+                entry['status'] = 'failed'
+                entry.update(e.to_dict())
+            except Exception as e:
+                entry['status'] = 'failed'
+                entry['error'] = str(e)
+            files.append(entry)
+
+        return {'date': date.strftime('%Y-%m-%d'), 'files': files}
+
+    def has_cached_grid(self, lat, lon, date=None, leadtime_hours=["0", "12", "24"]):
+        """Indica si el campo CAMS de un punto y fecha ya está en la caché (no descarga)"""
+        data_format, _ = self._get_data_format()
+        request = self._build_request(lat, lon, self._parse_date(date), leadtime_hours, data_format)
+        return self.grid_store.exists(DataCache.make_key(request))
+
+    def regional_grid_key(self, date=None, leadtime_hours=["0", "12", "24"]):
+        """
+        Clave del campo regional de una fecha si ya está en la caché (no descarga)
+
+        Returns:
+            (clave o None, fecha normalizada 'YYYY-MM-DD'); la clave es None si el
+            modo regional está desactivado o la fecha aún no se ha descargado
+        """
+        date = self._parse_date(date)
+        if not self.region_area:
+            return None, date.strftime('%Y-%m-%d')
+        north, west, south, east = self.region_area
+        data_format, _ = self._get_data_format()
+        request = self._build_request((north + south) / 2, (west + east) / 2, date, leadtime_hours, data_format)
+        key = DataCache.make_key(request)
+        return (key if self.grid_store.exists(key) else None), date.strftime('%Y-%m-%d')
+
+    def _compute_co2_data(self, city_name, lat, lon, date, leadtime_hours, interp="nearest"):
+        """Obtiene el archivo (caché o descarga), lo procesa y arma la respuesta"""
         try:
-            # Descargar datos
-            filename = self._download_co2_data(lat, lon, date, leadtime_hours)
-            
-            if filename is None:
-                return {"error": "No se pudo descargar el archivo de datos", "error_kind": self._last_error or "download_failed"}
+            # Obtener el campo desde la caché o descargarlo
+            grid_key = self._get_co2_grid(lat, lon, date, leadtime_hours)
             
             # Leer y procesar datos
-            data = self._read_co2_data(filename, lat, lon)
-            
-            if data is None:
-                return {"error": "No se pudieron procesar los datos", "error_kind": self._last_error or "processing_failed"}
-            
-            # Limpiar archivo temporal
-            if os.path.exists(filename):
-                os.remove(filename)
-            
-            # Formatear para respuesta JSON
-            avg_co2 = float(np.mean(data['co2_ppm']))
-            
-            # Obtener información de estado basada en la concentración
-            co2_status = get_co2_status(avg_co2)
-            buffer_radius = get_buffer_radius(avg_co2)
+            data = self._read_co2_data(grid_key, lat, lon, interp)
             
-            result = {
-                "city": city_name,
-                "coordinates": {
-                    "target_lat": lat,
-                    "target_lon": lon,
-                    "actual_lat": data['actual_lat'],
-                    "actual_lon": data['actual_lon']
-                },
-                "co2_data": {
-                    "values_ppm": data['co2_ppm'].tolist() if hasattr(data['co2_ppm'], 'tolist') else [float(data['co2_ppm'])],
-                    "average_ppm": avg_co2,
-                    "min_ppm": float(np.min(data['co2_ppm'])),
-                    "max_ppm": float(np.max(data['co2_ppm']))
-                },
-                "co2_status": {
-                    "color": co2_status['color'],
-                    "label": co2_status['label'],
-                    "description": co2_status['description'],
-                    "buffer_radius": buffer_radius
-                },
-                "time_info": data['time_info'],
-                "distance_km": self._calculate_distance(lat, lon, data['actual_lat'], data['actual_lon'])
-            }
-            
-            return result
+            return self._format_result(
+                city_name, lat, lon, data['co2_ppm'],
+                data['actual_lat'], data['actual_lon'], data['time_info'], data['distance_km'],
+                interpolation=data.get('interpolation')
+            )
             
+        except CO2DataError as e:
+            return e.to_dict()
         except Exception as e:
-            self._last_error = 'general_error'
-            return {"error": f"Error general: {str(e)}", "error_kind": self._last_error}
+            return {"error": f"Error general: {str(e)}", "error_kind": "general_error"}
 
-    def _download_co2_data(self, lat, lon, date, leadtime_hours):
-        """Descarga datos de CO2 desde la API de Copernicus con reintentos mejorados"""
-        import time
-        import glob
-        import socket
+    def _format_result(self, city_name, lat, lon, co2_ppm, actual_lat, actual_lon, time_info, distance_km,
+                       avg_co2=None, buffer_radius=None, interpolation=None):
+        """
+        Formatea los valores de un punto para la respuesta
+
+        `values_ppm` se devuelve como arreglo numpy; la capa de respuesta lo
+        serializa según el formato negociado (JSON, MessagePack o Arrow).
+
+        `avg_co2` y `buffer_radius` pueden venir ya calculados (vectorizados) para un lote.
+        Con `interpolation` el valor corresponde al punto exacto: las coordenadas reales
+        son las del objetivo y la celda más cercana se informa dentro de `interpolation`.
+        """
+        if avg_co2 is None:
+            avg_co2 = float(np.mean(co2_ppm))
         
-        max_retries = 2  # Reducido a 2 intentos para evitar sobrecargar la API
-        retry_delay = 10   # Aumentado a 10 segundos para dar más tiempo
-        # Seleccionar formato según disponibilidad de cfgrib/ecCodes
-        use_grib = self._check_cfgrib_availability()
-        data_format = "grib" if use_grib else "netcdf"
-        ext = ".grib" if data_format == "grib" else ".nc"
-        filename = f"co2_data_{date.strftime('%Y_%m_%d')}{ext}"
+        # Obtener información de estado basada en la concentración
+        co2_status = get_co2_status(avg_co2)
+        if buffer_radius is None:
+            buffer_radius = get_buffer_radius(avg_co2)
+        
+        if interpolation is not None:
+            interpolation = dict(interpolation, nearest_cell={
+                "lat": actual_lat, "lon": actual_lon, "distance_km": distance_km
+            })
+            actual_lat, actual_lon, distance_km = lat, lon, 0.0
+        
+        result = {
+            "city": city_name,
+            "coordinates": {
+                "target_lat": lat,
+                "target_lon": lon,
+                "actual_lat": actual_lat,
+                "actual_lon": actual_lon
+            },
+            "co2_data": {
+                "values_ppm": np.atleast_1d(np.asarray(co2_ppm, dtype=float)),
+                "average_ppm": avg_co2,
+                "min_ppm": float(np.min(co2_ppm)),
+                "max_ppm": float(np.max(co2_ppm))
+            },
+            "co2_status": {
+                "color": co2_status['color'],
+                "label": co2_status['label'],
+                "description": co2_status['description'],
+                "buffer_radius": buffer_radius
+            },
+            "time_info": time_info,
+            "distance_km": distance_km
+        }
+        if interpolation is not None:
+            result["interpolation"] = interpolation
+        return result
+
+    @staticmethod
+    def _interpolation_info(data, j):
+        """Descripción de la interpolación del punto j de un resultado de `_read_co2_points`"""
+        if data.get('interpolation') is None:
+            return None
+        return dict(data['interpolation'], weights=np.round(data['weights'][j], 4).tolist())
+
+    def _get_data_format(self):
+        """Devuelve (formato, extensión) según disponibilidad de cfgrib/ecCodes"""
+        if self._check_cfgrib_availability():
+            return "grib", ".grib"
+        return "netcdf", ".nc"
+
+    def _get_region_area(self):
+        """
+        Área regional [norte, oeste, sur, este] según CO2_REGION:
+        'cities' (caja de las ciudades predefinidas + margen), 'peru' u 'off'
+        """
+        mode = os.getenv("CO2_REGION", "cities").strip().lower()
+        if mode in ("off", "none", "0", ""):
+            return None
+        if mode == "peru":
+            return list(PERU_BBOX)
+        margin = float(os.getenv("CO2_REGION_MARGIN", "1.5"))
+        return get_cities_bbox(margin)
+
+    def _get_area(self, lat, lon):
+        """
+        Área de descarga para un punto: la región completa si el punto cae dentro
+        (todas las ciudades comparten el mismo archivo), o ±0.5° alrededor del punto
+        """
+        if self.region_area and is_point_in_area(lat, lon, self.region_area):
+            return list(self.region_area)
+        return [lat + 0.5, lon - 0.5, lat - 0.5, lon + 0.5]
+
+    def _build_request(self, lat, lon, date, leadtime_hours, data_format, end_date=None):
+        """
+        Construye la petición CAMS para un punto (región o área de ±0.5° alrededor)
+        y una fecha o un rango de fechas [date, end_date]
+        """
+        area = self._get_area(lat, lon)
+        end_date = end_date or date
+        return {
+            "variable": ["carbon_dioxide"],
+            "model_level": ["137"],  # Nivel de superficie
+            "date": [f"{date.strftime('%Y-%m-%d')}/{end_date.strftime('%Y-%m-%d')}"],
+            "leadtime_hour": leadtime_hours,
+            "area": area,
+            "format": data_format
+        }
+
+    def _get_co2_grid(self, lat, lon, date, leadtime_hours, end_date=None):
+        """
+        Devuelve la clave del campo CAMS ya ingerido para la petición, usando la
+        caché persistente y descargando solo en caso de fallo de caché
+
+        Raises:
+            CO2DataError: si la descarga o la ingesta fallan (compartido con las
+            llamadas concurrentes que esperaban la misma descarga)
+        """
+        data_format, _ = self._get_data_format()
+        request = self._build_request(lat, lon, date, leadtime_hours, data_format, end_date)
+        key = DataCache.make_key(request)
+
+        # Un acierto es un campo que se puede cargar: si expiró o está incompleto
+        # se trata como fallo de caché y se vuelve a descargar. La carga lo deja
+        # en la caché en proceso, donde lo leen a continuación los llamadores.
+        if self.grid_cache.get(key) is not None:
+            print(f"⚡ Datos CAMS servidos desde caché: {key[:12]}")
+            return key
+
+        def fetch():
+            # Otro proceso pudo completar la descarga mientras esperábamos el bloqueo
+            if self.grid_cache.get(key) is not None:
+                print(f"⚡ Descarga completada por otro proceso: {key[:12]}")
+                return key
+            return self._download_co2_data(lat, lon, date, leadtime_hours, grid_key=key, end_date=end_date)
+
+        return self._flight.do(f"file-{key}", fetch, file_lock=True)
+
+    def _purge_stale_work_dirs(self, max_age_seconds: int = 6 * 3600):
+        """
+        Elimina directorios de trabajo abandonados (proceso terminado a mitad de
+        una descarga); los recientes pueden pertenecer a descargas en curso de
+        otros workers y se conservan
+        """
+        cutoff = time.time() - max_age_seconds
+        try:
+            for name in os.listdir(self.tmp_dir):
+                path = os.path.join(self.tmp_dir, name)
+                if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+    def _download_co2_data(self, lat, lon, date, leadtime_hours, grid_key, end_date=None):
+        """
+        Descarga datos de CO2 desde la API de Copernicus con reintentos mejorados,
+        los valida e ingiere en el almacén local bajo `grid_key`
+
+        Cada descarga usa su propio directorio temporal bajo `tmp_dir`; el campo se
+        publica en la caché con escrituras atómicas y el directorio se elimina al
+        terminar, con éxito o no, sin tocar archivos de otras descargas.
+
+        Returns:
+            La clave del campo ingerido
+
+        Raises:
+            CO2DataError: con el tipo de error del último intento
+        """
+        work_dir = tempfile.mkdtemp(prefix=f"{grid_key[:12]}.", dir=self.tmp_dir)
+        try:
+            return self._retrieve_and_ingest(work_dir, lat, lon, date, leadtime_hours, grid_key, end_date)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _retrieve_and_ingest(self, work_dir, lat, lon, date, leadtime_hours, grid_key, end_date=None):
+        """
+        Descarga al directorio de trabajo e ingiere el archivo, con reintentos
+        según el tipo de error: sin reintento para errores de credenciales,
+        términos o dependencias; respetando Retry-After ante cuota excedida; y
+        backoff exponencial con jitter para el resto, sin superar el plazo total
+        """
+        data_format, ext = self._get_data_format()
+        filename = os.path.join(work_dir, f"co2_data_{date.strftime('%Y_%m_%d')}_{grid_key[:12]}{ext}")
+        request = self._build_request(lat, lon, date, leadtime_hours, data_format, end_date)
+        deadline = time.monotonic() + self.download_deadline
         
-        for attempt in range(max_retries):
+        attempt = 0
+        while True:
+            attempt += 1
             try:
-                # Configurar cliente con timeout más conservador y manejo de errores mejorado
-                url, key = self._get_cds_credentials()
-                if url and key:
-                    # Usar token personal de ADS/CDS (cdsapi>=0.7.7) sin UID
-                    c = cdsapi.Client(url=url, key=key, timeout=300, retry_max=1)
-                else:
-                    self._last_error = 'credentials_missing'
-                    raise Exception("Faltan credenciales de CDS/ADS. Define CDSAPI_URL y CDSAPI_KEY o proporciona un archivo .cdsapirc válido en proyecto/cwd/HOME.")
-                
-                # Configurar área de descarga (expandir un poco el área)
-                area = [lat + 0.5, lon - 0.5, lat - 0.5, lon + 0.5]
-                
-                # Limpiar archivos anteriores
-                if os.path.exists(filename):
-                    os.remove(filename)
-                    print(f"🗑️ Archivo anterior eliminado: {filename}")
-                
-                # Limpiar archivos temporales de descargas anteriores (GRIB y NetCDF)
-                temp_files = glob.glob("*.grib") + glob.glob("*.nc")
-                for temp_file in temp_files:
-                    try:
-                        file_size = os.path.getsize(temp_file)
-                        if file_size < 100000:  # Menos de 100KB (probablemente incompleto)
-                            os.remove(temp_file)
-                            print(f"🗑️ Archivo temporal eliminado: {temp_file} ({file_size} bytes)")
-                    except Exception:
-                        pass
-                
-                print(f"🌍 Descargando datos de CO2 para {date.strftime('%Y-%m-%d')} (intento {attempt + 1}/{max_retries})...")
+                print(f"🌍 Descargando datos de CO2 para {date.strftime('%Y-%m-%d')} (intento {attempt}/{self.download_max_attempts})...")
                 print(f"📍 Coordenadas: {lat}, {lon}")
-                print(f"⏱️ Timeout configurado: 10 minutos")
-                
-                request = {
-                    "variable": ["carbon_dioxide"],
-                    "model_level": ["137"],  # Nivel de superficie
-                    "date": [f"{date.strftime('%Y-%m-%d')}/{date.strftime('%Y-%m-%d')}"],
-                    "leadtime_hour": leadtime_hours,
-                    "area": area,
-                    "format": data_format
-                }
-                
-                # Realizar la descarga con manejo mejorado de errores de conexión
-                try:
-                    c.retrieve('cams-global-greenhouse-gas-forecasts', request, filename)
-                except (socket.error, ConnectionError, BrokenPipeError) as conn_error:
-                    print(f"🔌 Error de conexión: {str(conn_error)}")
-                    self._last_error = 'connection'
-                    raise Exception(f"Error de conexión con la API: {str(conn_error)}")
-                except Exception as api_error:
-                    print(f"🌐 Error de API: {str(api_error)}")
-                    err_txt = str(api_error)
-                    if '401' in err_txt or 'Invalid API key' in err_txt:
-                        self._last_error = 'auth_error'
-                    elif 'Terms of use' in err_txt or 'not authorised' in err_txt or 'permission' in err_txt.lower():
-                        self._last_error = 'terms_error'
-                    elif 'quota' in err_txt.lower():
-                        self._last_error = 'quota_error'
-                    elif 'timeout' in err_txt.lower():
-                        self._last_error = 'timeout'
-                    else:
-                        self._last_error = 'api_error'
-                    raise Exception(f"Error en la API de Copernicus: {err_txt}")
-                
-                # Esperar menos tiempo para que el archivo se complete
-                print("⏳ Esperando que la descarga se complete...")
-                time.sleep(3)  # Reducido de 5 a 3 segundos
-                
-                # Buscar el archivo descargado con mejor validación
-                downloaded_file = None
-                
-                # Primero verificar si el archivo con el nombre esperado existe
-                if os.path.exists(filename):
-                    downloaded_file = filename
-                else:
-                    # Buscar archivos .grib/.nc recientes que puedan ser nuestra descarga
-                    candidates = sorted(glob.glob("*.grib") + glob.glob("*.nc"), key=lambda x: os.path.getmtime(x), reverse=True)
-                    for cand in candidates:
-                        try:
-                            file_size = os.path.getsize(cand)
-                            if (cand.endswith('.grib') or cand.endswith('.nc')) and file_size > 4096:
-                                downloaded_file = cand
-                                break
-                        except Exception:
-                            continue
-                
-                if downloaded_file:
-                    file_size = os.path.getsize(downloaded_file)
-                    print(f"📁 Archivo encontrado: {downloaded_file} ({file_size} bytes)")
-                    
-                    # Verificar que el archivo no esté vacío o sea muy pequeño
-                    min_size = 4096
-                    if file_size > min_size:
-                        # Validar según formato
-                        try:
-                            if downloaded_file.endswith('.grib'):
-                                if self._check_cfgrib_availability():
-                                    import cfgrib
-                                    test_ds = xr.open_dataset(downloaded_file, engine='cfgrib')
-                                    test_ds.close()
-                                else:
-                                    print("⚠️ cfgrib/ecCodes no disponibles, se omitirá validación de GRIB por contenido")
-                            else:  # .nc
-                                # Validar con fallback de motores: netcdf4 -> h5netcdf
-                                try:
-                                    test_ds = xr.open_dataset(downloaded_file, engine='netcdf4')
-                                    test_ds.close()
-                                except Exception as e1:
-                                    try:
-                                        test_ds = xr.open_dataset(downloaded_file, engine='h5netcdf')
-                                        test_ds.close()
-                                    except ModuleNotFoundError as e2:
-                                        self._last_error = 'netcdf_engine_missing'
-                                        raise Exception(f"Motores NetCDF no disponibles (instala netCDF4 o h5netcdf): {str(e2)}")
-                                    except Exception as e2:
-                                        self._last_error = 'download_incomplete'
-                                        raise Exception(f"Archivo NetCDF inválido o no compatible: {str(e1)} | {str(e2)}")
-                            if downloaded_file != filename:
-                                os.rename(downloaded_file, filename)
-                                print(f"📝 Archivo renombrado de {downloaded_file} a {filename}")
-                            print(f"✅ Descarga completada exitosamente: {filename}")
-                            return filename
-                        except Exception as validation_error:
-                            msg = str(validation_error)
-                            print(f"⚠️ Validación de archivo fallida: {msg}")
-                            if os.path.exists(downloaded_file):
-                                try:
-                                    os.remove(downloaded_file)
-                                except Exception:
-                                    pass
-                            if 'ecCodes' in msg or 'cfgrib' in msg:
-                                self._last_error = 'cfgrib_missing'
-                                raise Exception(f"Dependencia cfgrib/ecCodes ausente: {msg}")
-                            elif downloaded_file.endswith('.nc') and 'NetCDF' in msg:
-                                self._last_error = 'netcdf_engine_missing'
-                                raise Exception(f"Dependencias NetCDF faltantes: {msg}")
-                            else:
-                                self._last_error = 'download_incomplete'
-                                raise Exception(f"Archivo inválido o incompleto: {msg}")
-                else:
-                    self._last_error = 'download_incomplete'
-                    raise Exception("No se encontró el archivo descargado")
-                
+                self._retrieve(request, filename, deadline)
+                self._ingest_downloaded_file(filename, grid_key, request)
+                print(f"✅ Descarga completada e ingerida: {grid_key[:12]}")
+                return grid_key
             except Exception as e:
-                error_msg = f"Error en descarga de datos (intento {attempt + 1}): {str(e)}"
-                print(f"❌ {error_msg}")
+                error = e if isinstance(e, CO2DataError) else CO2DataError('download_failed', str(e))
+                print(f"❌ Error en descarga de datos (intento {attempt}): {error}")
                 
-                # Limpiar archivos parciales más agresivamente
-                temp_files = glob.glob("*.grib")
-                for temp_file in temp_files:
+                # Eliminar el archivo parcial de este intento (solo el propio)
+                if os.path.exists(filename):
                     try:
-                        file_size = os.path.getsize(temp_file)
-                        if file_size < 100000:  # Menos de 100KB (probablemente incompleto)
-                            os.remove(temp_file)
-                            print(f"🗑️ Archivo parcial eliminado: {temp_file} ({file_size} bytes)")
-                    except Exception:
+                        os.remove(filename)
+                    except OSError:
                         pass
                 
-                # Si es el último intento, lanzar la excepción
-                if attempt == max_retries - 1:
-                    # Proporcionar información más específica sobre posibles problemas
-                    if "broken pipe" in str(e).lower() or "connectionerror" in str(e).lower():
-                        print("🔌 Error de conexión - la API de Copernicus puede estar sobrecargada")
-                        print("💡 Sugerencia: Intenta nuevamente en unos minutos")
-                    elif "cfgrib" in str(e).lower() or "eccodes" in str(e).lower():
-                        print("🔧 Problema con cfgrib/eccodes - instala en el entorno o usa formato NetCDF")
-                    elif "File size mismatch" in str(e) or "incompleto" in str(e):
-                        print("📊 Error de descarga incompleta - reintentando con parámetros diferentes")
-                        print("💡 Sugerencia: La API de Copernicus puede estar experimentando alta demanda")
-                    elif "Invalid API key" in str(e) or "401" in str(e):
-                        print("🔑 Verifica tu API key de Copernicus CDS")
-                    elif "quota" in str(e).lower():
-                        print("📊 Has excedido tu cuota de descarga")
-                    elif "network" in str(e).lower() or "connection" in str(e).lower():
-                        print("🌐 Problema de conexión a internet")
-                    elif "timeout" in str(e).lower():
-                        print("⏱️ Timeout de descarga - el servidor está lento")
-                    
-                    raise Exception(f"Error en descarga después de {max_retries} intentos: {str(e)}")
-                
-                # Esperar antes del siguiente intento con backoff más conservador
-                wait_time = retry_delay * (attempt + 1)  # Incremento lineal
-                wait_time = min(wait_time, 60)  # Máximo 60 segundos
-                print(f"⏳ Esperando {wait_time} segundos antes del siguiente intento...")
-                time.sleep(wait_time)
+                wait_time = self._retry_wait(error, attempt, deadline)
+                if wait_time is None:
+                    self._log_download_hint(error)
+                    raise CO2DataError(error.kind, f"Error en descarga después de {attempt} intentos: {error}")
+                if wait_time > 0:
+                    print(f"⏳ Reintentando en {wait_time:.1f} s ({error.kind})...")
+                    time.sleep(wait_time)
+
+    def _retrieve(self, request, filename, deadline=None):
+        """
+        Ejecuta la petición a Copernicus y comprueba la descarga al terminar
+
+        `retrieve` vuelve cuando el archivo está completo, así que la descarga se
+        valida en ese momento por tamaño (contra `content_length` si el cliente
+        lo informa), sin esperas fijas.
+
+        Con CO2_CDS_CLIENT=async la petición se sigue desde el bucle asyncio
+        compartido (consultas con backoff y descargas limitadas por semáforo),
+        con el tiempo que queda hasta `deadline` (time.monotonic()) como plazo.
+        El hilo que llama sigue bloqueado hasta que el job termina.
+
+        Raises:
+            CO2DataError: con el tipo de error clasificado
+        """
+        url, key = self._get_cds_credentials()
+        if not (url and key):
+            raise CO2DataError('credentials_missing', "Faltan credenciales de CDS/ADS. Define CDSAPI_URL y CDSAPI_KEY o proporciona un archivo .cdsapirc válido en proyecto/cwd/HOME.")
+        
+        if self.cds_client_mode == 'async':
+            result = None
+            client = self._get_async_cds_client(url, key)
+            remaining = self.download_deadline if deadline is None else deadline - time.monotonic()
+            if remaining <= 0:
+                raise CO2DataError('timeout', "Se agotó el plazo total de la descarga")
+            try:
+                # El plazo propio del cliente vence antes; el margen solo cubre la cancelación
+                info = self._async_runner.run(
+                    client.retrieve(CAMS_DATASET, request, filename, deadline_seconds=remaining),
+                    timeout=remaining + 5
+                )
+                print(f"📬 Job {info['job_id']} completado tras {info['queued_seconds']} s en cola")
+            except CDSRequestError as e:
+                print(f"🌐 Error de API: {e}")
+                raise CO2DataError(e.kind, f"Error en la API de Copernicus: {e}", retry_after=e.retry_after)
+            except FuturesTimeoutError:
+                raise CO2DataError('timeout', "La descarga asíncrona superó el plazo total")
+        else:
+            # Usar token personal de ADS/CDS (cdsapi>=0.7.7) sin UID
+            c = self._get_cds_client(url, key)
+            try:
+                result = c.retrieve(CAMS_DATASET, request, filename)
+            except Exception as api_error:
+                raise self._classify_api_error(api_error)
         
-        # Si salió del bucle sin retornar, establecemos un error genérico
-        self._last_error = self._last_error or 'download_failed'
-        return None
+        if not os.path.exists(filename):
+            raise CO2DataError('download_incomplete', "No se encontró el archivo descargado")
+        file_size = os.path.getsize(filename)
+        expected = getattr(result, 'content_length', None)
+        print(f"📁 Archivo descargado: {os.path.basename(filename)} ({file_size} bytes)")
+        if isinstance(expected, int) and expected > 0 and file_size != expected:
+            raise CO2DataError('download_incomplete', f"Archivo incompleto: {file_size} de {expected} bytes")
+        # Un archivo casi vacío suele ser una respuesta de error, no datos
+        if file_size <= 4096:
+            raise CO2DataError('download_incomplete', f"Archivo demasiado pequeño ({file_size} bytes)")
 
-    def _read_co2_data(self, filename, target_lat, target_lon):
+    @staticmethod
+    def _classify_api_error(api_error):
         """
-        Lee y procesa los datos de CO2 del archivo descargado (GRIB o NetCDF)
+        Traduce una excepción del cliente CDS/ADS a CO2DataError con su tipo; usa el
+        código HTTP y Retry-After de la respuesta cuando el cliente los expone
         """
-        ds = None
+        import socket
+        
+        response = getattr(api_error, 'response', None)
+        status = getattr(response, 'status_code', None)
+        err_txt = str(api_error)
+        # requests.HTTPError también es OSError: solo es de conexión si no hubo respuesta
+        http_error = isinstance(api_error, requests.HTTPError) or response is not None
+        if not http_error and isinstance(api_error, (socket.error, ConnectionError, BrokenPipeError)):
+            print(f"🔌 Error de conexión: {err_txt}")
+            return CO2DataError('connection', f"Error de conexión con la API: {err_txt}")
+        print(f"🌐 Error de API: {err_txt}")
+        
+        if status == 401 or '401' in err_txt or 'Invalid API key' in err_txt:
+            kind = 'auth_error'
+        elif status == 403 or 'Terms of use' in err_txt or 'not authorised' in err_txt or 'permission' in err_txt.lower():
+            kind = 'terms_error'
+        elif status == 429 or 'quota' in err_txt.lower():
+            kind = 'quota_error'
+        elif 'timeout' in err_txt.lower():
+            kind = 'timeout'
+        elif 'File size mismatch' in err_txt or 'Download failed' in err_txt:
+            kind = 'download_incomplete'
+        else:
+            kind = 'api_error'
+        return CO2DataError(kind, f"Error en la API de Copernicus: {err_txt}",
+                            retry_after=retry_after_seconds(response))
+
+    def _ingest_downloaded_file(self, filename, grid_key, request):
+        """Valida e ingiere el archivo en una sola apertura, clasificando los fallos"""
         try:
-            if filename.endswith('.grib'):
-                # GRIB requiere cfgrib + ecCodes
-                if not self._check_cfgrib_availability():
-                    print("❌ No se puede leer el archivo GRIB sin cfgrib/ecCodes")
-                    self._last_error = 'cfgrib_missing'
-                    return None
-                ds = xr.open_dataset(filename, engine='cfgrib')
-            else:  # .nc
+            self._ingest_co2_file(filename, grid_key, request)
+        except Exception as validation_error:
+            msg = str(validation_error)
+            print(f"⚠️ Validación de archivo fallida: {msg}")
+            if isinstance(validation_error, CO2DataError):
+                if validation_error.kind != 'processing_failed':
+                    raise
+                raise CO2DataError('download_incomplete', f"Archivo inválido o incompleto: {msg}")
+            if 'ecCodes' in msg or 'cfgrib' in msg:
+                raise CO2DataError('cfgrib_missing', f"Dependencia cfgrib/ecCodes ausente: {msg}")
+            elif filename.endswith('.nc') and 'NetCDF' in msg:
+                raise CO2DataError('netcdf_engine_missing', f"Dependencias NetCDF faltantes: {msg}")
+            else:
+                raise CO2DataError('download_incomplete', f"Archivo inválido o incompleto: {msg}")
+        finally:
+            # El archivo original ya no es necesario tras la ingesta
+            if os.path.exists(filename):
                 try:
-                    # Preferir el motor netcdf4 para mayor compatibilidad con libnetcdf/libhdf5
-                    ds = xr.open_dataset(filename, engine='netcdf4')
-                except Exception as e1:
-                    try:
-                        # Fallback a h5netcdf si netcdf4 falla o no está
-                        ds = xr.open_dataset(filename, engine='h5netcdf')
-                    except ModuleNotFoundError as e2:
-                        print(f"❌ Motores NetCDF faltantes: {e2}")
-                        self._last_error = 'netcdf_engine_missing'
-                        return None
-                    except Exception as e2:
-                        print(f"❌ Error leyendo NetCDF con motores disponibles: {e1} | {e2}")
-                        self._last_error = 'processing_failed'
-                        return None
-            
+                    os.remove(filename)
+                except OSError:
+                    pass
+
+    def _retry_wait(self, error, attempt, deadline):
+        """
+        Segundos a esperar antes del siguiente intento, o None si no se debe reintentar
+        (error no recuperable, intentos agotados o espera más allá del plazo total)
+        """
+        if error.kind in NON_RETRYABLE_KINDS or attempt >= self.download_max_attempts:
+            return None
+        if error.kind == 'quota_error' and error.retry_after is not None:
+            wait_time = error.retry_after
+        else:
+            wait_time = backoff_delay(attempt - 1, self.download_backoff_base, self.download_backoff_cap)
+        if time.monotonic() + wait_time >= deadline:
+            print(f"⏱️ Sin tiempo para otro intento dentro del plazo de {self.download_deadline:g} s")
+            return None
+        return wait_time
+
+    @staticmethod
+    def _log_download_hint(error):
+        """Sugerencia en el log según el tipo del error final de descarga"""
+        hints = {
+            'connection': "🔌 Error de conexión - la API de Copernicus puede estar sobrecargada; intenta nuevamente en unos minutos",
+            'cfgrib_missing': "🔧 Problema con cfgrib/eccodes - instala en el entorno o usa formato NetCDF",
+            'download_incomplete': "📊 Descarga incompleta - la API de Copernicus puede estar experimentando alta demanda",
+            'auth_error': "🔑 Verifica tu API key de Copernicus CDS",
+            'terms_error': "📜 Acepta los términos del dataset en ADS antes de descargar",
+            'quota_error': "📊 Has excedido tu cuota de descarga",
+            'timeout': "⏱️ Timeout de descarga - el servidor está lento",
+        }
+        if error.kind in hints:
+            print(hints[error.kind])
+
+    def _read_co2_data(self, grid_key, target_lat, target_lon, interp="nearest"):
+        """
+        Lee y procesa los datos de CO2 de un campo ingerido para un punto
+        """
+        data = self._read_co2_points(grid_key, np.array([target_lat], dtype=float), np.array([target_lon], dtype=float), interp)
+        return {
+            'interpolation': self._interpolation_info(data, 0),
+            'co2_ppm': data['co2_ppm'][..., 0],
+            'actual_lat': float(data['actual_lat'][0]),
+            'actual_lon': float(data['actual_lon'][0]),
+            'distance_km': float(data['distance_km'][0]),
+            'time_info': data['time_info']
+        }
+
+    def _open_dataset(self, filename):
+        """Abre un archivo GRIB o NetCDF con el motor disponible (CO2DataError si no es posible)"""
+        if filename.endswith('.grib'):
+            # GRIB requiere cfgrib + ecCodes
+            if not self._check_cfgrib_availability():
+                print("❌ No se puede leer el archivo GRIB sin cfgrib/ecCodes")
+                raise CO2DataError('cfgrib_missing', "No se puede leer el archivo GRIB sin cfgrib/ecCodes")
+            # indexpath vacío: no dejar archivos .idx junto al GRIB
+            return xr.open_dataset(filename, engine='cfgrib', backend_kwargs={'indexpath': ''})
+        # .nc
+        try:
+            # Preferir el motor netcdf4 para mayor compatibilidad con libnetcdf/libhdf5
+            return xr.open_dataset(filename, engine='netcdf4')
+        except Exception as e1:
+            try:
+                # Fallback a h5netcdf si netcdf4 falla o no está
+                return xr.open_dataset(filename, engine='h5netcdf')
+            except ModuleNotFoundError as e2:
+                print(f"❌ Motores NetCDF faltantes: {e2}")
+                raise CO2DataError('netcdf_engine_missing', "Motores NetCDF no disponibles (instala netCDF4 o h5netcdf)")
+            except Exception as e2:
+                print(f"❌ Error leyendo NetCDF con motores disponibles: {e1} | {e2}")
+                raise CO2DataError('processing_failed', "Archivo NetCDF inválido o no compatible")
+
+    def _ingest_co2_file(self, filename, key, request):
+        """
+        Valida el archivo descargado (GRIB o NetCDF) abriéndolo una sola vez y lo
+        convierte en un campo compacto del almacén local (ppm float32, lat/lon al final)
+        """
+        ds = self._open_dataset(filename)
+        try:
             # Variable de CO2
             co2_var = 'co2' if 'co2' in ds.data_vars else 'carbon_dioxide' if 'carbon_dioxide' in ds.data_vars else None
             if co2_var is None:
-                self._last_error = 'processing_failed'
-                return None
+                raise Exception(f"Variable de CO2 no encontrada en {list(ds.data_vars)}")
             
             # Nombres de coordenadas
             lat_name = 'latitude' if 'latitude' in ds.coords else ('lat' if 'lat' in ds.coords else None)
@@ -407,42 +901,108 @@ class CO2Service:
                 lat_name = lat_name or ('latitude' if 'latitude' in ds.dims else ('lat' if 'lat' in ds.dims else None))
                 lon_name = lon_name or ('longitude' if 'longitude' in ds.dims else ('lon' if 'lon' in ds.dims else None))
             if not lat_name or not lon_name:
-                self._last_error = 'processing_failed'
-                return None
-            
-            co2_data = ds.sel({lat_name: target_lat, lon_name: target_lon}, method='nearest')
-            
-            # Extraer los valores de CO2
-            co2_values = co2_data[co2_var].values
-            
-            # Procesar información temporal
-            time_info = self._process_time_info(ds)
+                raise Exception("Coordenadas de latitud/longitud no encontradas")
             
+            field = ds[co2_var].transpose(..., lat_name, lon_name)
             # Convertir de kg/kg a ppm
-            co2_ppm = co2_values * 1e6
+            values = np.asarray(field.values, dtype=np.float32) * np.float32(1e6)
             
-            # Información de coordenadas reales seleccionadas
-            actual_lat = float(co2_data[lat_name].values)
-            actual_lon = float(co2_data[lon_name].values)
+            meta = {
+                'key': key,
+                'date': request['date'][0].split('/')[0],
+                'end_date': request['date'][0].split('/')[-1],
+                'leadtime_hours': [str(h) for h in request['leadtime_hour']],
+                'area': request['area'],
+                'dims': [str(d) for d in field.dims],
+                'lat': np.asarray(ds[lat_name].values, dtype=float).tolist(),
+                'lon': np.asarray(ds[lon_name].values, dtype=float).tolist(),
+                'time_info': self._process_time_info(ds),
+                'valid_times': self._valid_times(ds, field.isel({lat_name: 0, lon_name: 0}, drop=True))
+            }
+        finally:
+            try:
+                ds.close()
+            except Exception:
+                pass
+        
+        self.grid_store.put(key, values, meta)
+
+    def _read_co2_points(self, grid_key, target_lats, target_lons, interp="nearest"):
+        """
+        Lee los valores de CO2 de varios puntos de un campo ingerido
+
+        El campo se toma de la caché en proceso; la celda más cercana se obtiene por
+        aritmética de índices sobre los ejes precalculados y solo se leen del arreglo
+        memory-mapped las celdas necesarias. Con interp='bilinear' o 'idw' el valor se
+        interpola de las 4 celdas vecinas con plantillas cacheadas por malla y punto.
+
+        Returns:
+            Dict con 'co2_ppm' (ndarray con la dimensión de puntos al final),
+            'actual_lat'/'actual_lon'/'distance_km' (celda más cercana, ndarray por
+            punto), 'time_info' y, si se interpola, 'interpolation' y 'weights' (N, 4)
+
+        Raises:
+            CO2DataError: si el campo no está disponible o no se puede leer
+        """
+        try:
+            entry = self.grid_cache.get(grid_key)
+            if entry is None:
+                raise CO2DataError('processing_failed', "No se pudieron procesar los datos")
             
+            # Selección vectorizada de la celda más cercana para todos los puntos
+            ilat, ilon = entry.nearest(target_lats, target_lons)
+            actual_lats = entry.lat_axis[ilat]
+            actual_lons = entry.lon_axis[ilon]
             result = {
-                'co2_ppm': co2_ppm,
-                'actual_lat': actual_lat,
-                'actual_lon': actual_lon,
-                'time_info': time_info
+                'actual_lat': actual_lats,
+                'actual_lon': actual_lons,
+                'distance_km': haversine_km(target_lats, target_lons, actual_lats, actual_lons),
+                'time_info': entry.meta['time_info'],
+                'interpolation': None
             }
             
+            if interp == 'nearest':
+                result['co2_ppm'] = np.asarray(entry.values[..., ilat, ilon], dtype=float)
+            else:
+                lat_idx, lon_idx, weights = self.stencils.get(
+                    entry.axes_key, entry.lat_axis, entry.lon_axis, target_lats, target_lons, interp
+                )
+                result['co2_ppm'] = apply_stencils(entry.values, lat_idx, lon_idx, weights)
+                result['weights'] = weights
+                result['interpolation'] = {'method': interp, 'cells': int(weights.shape[1])}
             return result
             
+        except CO2DataError:
+            raise
         except Exception as e:
-            print(f"Error leyendo archivo: {e}")
+            print(f"Error leyendo campo de CO2: {e}")
+            raise CO2DataError('processing_failed', f"No se pudieron procesar los datos: {e}")
+
+    def _valid_times(self, ds, template):
+        """
+        Instantes de validez (epoch en segundos) alineados con las dimensiones no
+        espaciales del campo: valid_time si existe, si no tiempo base + paso
+        """
+        try:
+            if 'valid_time' in ds.coords:
+                valid = ds['valid_time']
+            else:
+                base_name = 'time' if 'time' in ds.coords else ('forecast_reference_time' if 'forecast_reference_time' in ds.coords else None)
+                step_name = 'step' if 'step' in ds.coords else ('forecast_period' if 'forecast_period' in ds.coords else None)
+                if base_name is None:
+                    return None
+                valid = ds[base_name]
+                if step_name is not None:
+                    step = ds[step_name]
+                    if not np.issubdtype(step.dtype, np.timedelta64):
+                        step = step.astype('timedelta64[h]')
+                    valid = valid + step
+            valid = xr.broadcast(valid, template)[0].transpose(*template.dims)
+            seconds = valid.values.astype('datetime64[s]').astype(np.int64)
+            return seconds.tolist()
+        except Exception as e:
+            print(f"⚠️ No se pudieron calcular los instantes de validez: {e}")
             return None
-        finally:
-            if ds is not None:
-                try:
-                    ds.close()
-                except:
-                    pass
 
     def _process_time_info(self, ds):
         """Procesa información temporal del dataset"""
@@ -468,23 +1028,3 @@ class CO2Service:
             time_info['error'] = str(e)
         
         return time_info
-    
-    def _calculate_distance(self, lat1, lon1, lat2, lon2):
-        """Calcula distancia entre dos puntos en km"""
-        from math import radians, cos, sin, asin, sqrt
-        
-        # Radio de la Tierra en km
-        R = 6371.0
-        
-        # Convertir a radianes
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-        
-        # Diferencias
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        
-        # Fórmula haversine
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * asin(sqrt(a))
-        
-        return R * c
\ No newline at end of file
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Any, Optional, List
+
+
+class DataCache:
+    """
+    Caché persistente en disco para descargas de CAMS (GRIB/NetCDF).
+
+    Cada entrada se direcciona por el hash de la petición normalizada que se
+    envía a Copernicus, de modo que la misma combinación de fecha, área,
+    horas de pronóstico y formato se resuelve desde disco sin volver a
+    descargar. Aplica límites de tamaño total y antigüedad, con desalojo LRU
+    (por fecha de último acceso) y escrituras atómicas (archivo temporal en el
+    mismo directorio + os.replace).
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 2 * 1024 ** 3, max_age_seconds: int = 14 * 24 * 3600):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def normalize_request(request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Normaliza la petición para que peticiones equivalentes generen la misma clave
+        (horas ordenadas como texto, área redondeada, claves ordenadas)
+        """
+        normalized = {}
+        for key, value in request.items():
+            if key == 'area':
+                value = [round(float(v), 3) for v in value]
+            elif key == 'leadtime_hour':
+                value = sorted({str(int(float(v))) for v in value}, key=int)
+            elif isinstance(value, (list, tuple)):
+                value = [str(v) for v in value]
+            normalized[key] = value
+        return normalized
+
+    @classmethod
+    def make_key(cls, request: Dict[str, Any]) -> str:
+        """Calcula la clave de contenido (sha256) de una petición normalizada"""
+        payload = json.dumps(cls.normalize_request(request), sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path_for(self, key: str, ext: str) -> str:
+        """Ruta final de una entrada de la caché"""
+        return os.path.join(self.cache_dir, f"{key}{ext}")
+
+    def get(self, key: str, ext: str) -> Optional[str]:
+        """
+        Devuelve la ruta de la entrada si existe y no ha expirado, None en caso contrario.
+        Un acierto actualiza la fecha de acceso para el desalojo LRU.
+        """
+        path = self.path_for(key, ext)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        if self.max_age_seconds and time.time() - stat.st_mtime > self.max_age_seconds:
+            self._remove_entry(key)
+            self.misses += 1
+            return None
+
+        try:
+            now = time.time()
+            os.utime(path, (now, stat.st_mtime))
+        except OSError:
+            pass
+        self.hits += 1
+        return path
+
+    def is_fresh(self, key: str, ext: str) -> bool:
+        """
+        Indica si la entrada existe y no ha expirado, sin contar como acceso ni
+        desalojarla (la comprobación de antigüedad es la misma que en get)
+        """
+        try:
+            mtime = os.stat(self.path_for(key, ext)).st_mtime
+        except FileNotFoundError:
+            return False
+        return not (self.max_age_seconds and time.time() - mtime > self.max_age_seconds)
+
+    def write_atomic(self, key: str, ext: str, writer, evict: bool = True) -> str:
+        """
+        Escribe una entrada con `writer(archivo_binario)` sobre un temporal en el
+        directorio de la caché y la publica con os.replace
+        """
+        final_path = self.path_for(key, ext)
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{key}.", suffix='.tmp', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                writer(f)
+            os.replace(tmp_path, final_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            raise
+        if evict:
+            self.evict()
+        return final_path
+
+    def evict(self) -> List[str]:
+        """
+        Aplica los límites de antigüedad y tamaño total.
+        Elimina primero las entradas expiradas y luego las menos usadas recientemente.
+        """
+        removed = []
+        with self._lock:
+            entries = self._scan()
+            now = time.time()
+            total = 0
+            alive = []
+            for key, info in entries.items():
+                if self.max_age_seconds and now - info['mtime'] > self.max_age_seconds:
+                    self._remove_entry(key, info['names'])
+                    removed.append(key)
+                else:
+                    alive.append((info['atime'], key, info['size'], info['names']))
+                    total += info['size']
+
+            if self.max_bytes and total > self.max_bytes:
+                alive.sort()
+                for _, key, size, names in alive:
+                    if total <= self.max_bytes:
+                        break
+                    self._remove_entry(key, names)
+                    removed.append(key)
+                    total -= size
+
+        if removed:
+            print(f"🧹 Caché CAMS: {len(removed)} entradas desalojadas")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Resumen del estado de la caché"""
+        entries = self._scan()
+        return {
+            'entries': len(entries),
+            'bytes': sum(info['size'] for info in entries.values()),
+            'max_bytes': self.max_bytes,
+            'max_age_seconds': self.max_age_seconds,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+    def _scan(self) -> Dict[str, Dict[str, float]]:
+        """Agrupa los archivos de la caché por clave (todas las extensiones de una misma clave)"""
+        entries = {}
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return entries
+        for name in names:
+            if name.startswith('.'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if not os.path.isfile(path):
+                continue
+            key = name.split('.', 1)[0]
+            info = entries.setdefault(key, {'size': 0, 'atime': 0.0, 'mtime': 0.0, 'names': []})
+            info['names'].append(name)
+            info['size'] += stat.st_size
+            info['atime'] = max(info['atime'], stat.st_atime)
+            info['mtime'] = max(info['mtime'], stat.st_mtime)
+        return entries
+
+    def _remove_entry(self, key: str, names: Optional[List[str]] = None) -> None:
+        """Elimina todos los archivos asociados a una clave (`names`: ya listados por _scan)"""
+        if names is None:
+            try:
+                names = os.listdir(self.cache_dir)
+            except FileNotFoundError:
+                return
+        for name in names:
+            if name.split('.', 1)[0] == key:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
@@ -0,0 +1,151 @@
+import math
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from services.geo_utils import normalize_place_name
+
+DEFAULT_GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'gazetteer_pe.tsv')
+
+COUNTRY_NAMES = {'PE': 'Perú'}
+
+
+class Gazetteer:
+    """
+    Nomenclátor offline de ciudades en una tabla compacta de arreglos numpy.
+
+    Acepta dos formatos TSV:
+      - el extracto propio del repositorio (name, lat, lon, country_code, region,
+        population, place_type, alternate_names), p. ej. config/gazetteer_pe.tsv
+      - un volcado de GeoNames (cities15000.txt, PE.txt, ...), de 19 columnas
+
+    Las coordenadas, poblaciones y tipos se guardan en arreglos; los nombres
+    normalizados (incluidos los alternativos) apuntan a las filas ordenadas por
+    población, de modo que una consulta exacta se resuelve sin red.
+    """
+
+    PLACE_TYPES = ('city', 'town', 'village')
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.names = [r['name'] for r in rows]
+        self.regions = [r['region'] for r in rows]
+        self.countries = [r['country'] for r in rows]
+        self.alternate_names = [r['alternate_names'] for r in rows]
+        self.lat = np.array([r['lat'] for r in rows], dtype=np.float32)
+        self.lon = np.array([r['lon'] for r in rows], dtype=np.float32)
+        self.population = np.array([r['population'] for r in rows], dtype=np.int64)
+        self.place_type = np.array([self.PLACE_TYPES.index(r['place_type']) for r in rows], dtype=np.int8)
+
+        index: Dict[str, List[int]] = {}
+        for i, r in enumerate(rows):
+            for name in {normalize_place_name(n) for n in [r['name']] + r['alternate_names'] if n}:
+                index.setdefault(name, []).append(i)
+        self._index = {
+            name: np.array(sorted(ids, key=lambda i: -self.population[i]), dtype=np.int32)
+            for name, ids in index.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_GAZETTEER_PATH) -> 'Gazetteer':
+        """Carga un TSV propio o de GeoNames (detectado por el número de columnas)"""
+        rows = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip() or line.startswith('#'):
+                    continue
+                cols = line.rstrip('\n').split('\t')
+                row = cls._parse_geonames(cols) if len(cols) >= 19 else cls._parse_compact(cols)
+                if row is not None:
+                    rows.append(row)
+        return cls(rows)
+
+    @staticmethod
+    def _parse_compact(cols: List[str]) -> Optional[Dict[str, Any]]:
+        if len(cols) < 7:
+            return None
+        return {
+            'name': cols[0],
+            'lat': float(cols[1]),
+            'lon': float(cols[2]),
+            'country': cols[3],
+            'region': cols[4] or 'Unknown',
+            'population': int(cols[5] or 0),
+            'place_type': cols[6] if cols[6] in Gazetteer.PLACE_TYPES else 'village',
+            'alternate_names': [n for n in (cols[7] if len(cols) > 7 else '').split(',') if n]
+        }
+
+    @staticmethod
+    def _parse_geonames(cols: List[str]) -> Optional[Dict[str, Any]]:
+        # Solo lugares poblados (clase de entidad P)
+        if cols[6] != 'P':
+            return None
+        population = int(cols[14] or 0)
+        feature_code = cols[7]
+        if feature_code in ('PPLC', 'PPLA') or population >= 100000:
+            place_type = 'city'
+        elif population >= 10000 or feature_code.startswith('PPLA'):
+            place_type = 'town'
+        else:
+            place_type = 'village'
+        return {
+            'name': cols[1],
+            'lat': float(cols[4]),
+            'lon': float(cols[5]),
+            'country': cols[8],
+            'region': cols[10] or 'Unknown',
+            'population': population,
+            'place_type': place_type,
+            'alternate_names': [cols[2]] + [n for n in cols[3].split(',') if n][:20]
+        }
+
+    def lookup(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Busca coincidencias exactas del nombre (sin tildes ni mayúsculas)
+
+        Acepta consultas como "Cusco" o "Cusco, Perú": la parte tras la coma se
+        usa para filtrar por región o país.
+        """
+        parts = [normalize_place_name(p) for p in query.split(',')]
+        ids = self._index.get(parts[0]) if parts and parts[0] else None
+        if ids is None:
+            return []
+        qualifiers = [p for p in parts[1:] if p]
+        results = []
+        for i in ids:
+            if qualifiers and not all(self._matches_qualifier(i, q) for q in qualifiers):
+                continue
+            results.append(self.record(int(i)))
+            if len(results) >= limit:
+                break
+        return results
+
+    def _matches_qualifier(self, i: int, qualifier: str) -> bool:
+        country = self.countries[i]
+        candidates = (self.regions[i], country, COUNTRY_NAMES.get(country, ''))
+        return any(qualifier == normalize_place_name(c) for c in candidates if c)
+
+    def record(self, i: int) -> Dict[str, Any]:
+        """Fila en el mismo formato que devuelve GeocodingService"""
+        country = COUNTRY_NAMES.get(self.countries[i], self.countries[i])
+        population = int(self.population[i])
+        return {
+            'name': self.names[i],
+            'display_name': f"{self.names[i]}, {self.regions[i]}, {country}",
+            'lat': round(float(self.lat[i]), 4),
+            'lon': round(float(self.lon[i]), 4),
+            'country': country,
+            'region': self.regions[i],
+            # Escala de importancia similar a la de Nominatim (0-1) a partir de la población
+            'importance': round(min(1.0, math.log10(population + 1) / 7), 4),
+            'place_type': self.PLACE_TYPES[int(self.place_type[i])],
+            'source': 'gazetteer'
+        }
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """Itera sobre todas las filas"""
+        for i in range(len(self.names)):
+            yield self.record(i)
@@ -0,0 +1,121 @@
+import unicodedata
+from typing import Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+_GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash_encode(lat: float, lon: float, precision: int = 6) -> str:
+    """
+    Codifica un punto como geohash
+
+    Args:
+        lat: Latitud
+        lon: Longitud
+        precision: Número de caracteres (6 ≈ celda de 1.2 km x 0.6 km)
+
+    Returns:
+        Cadena geohash
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits = bits << 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def geohash_decode(geohash: str) -> Tuple[float, float]:
+    """
+    Devuelve el centro (lat, lon) de la celda de un geohash
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _GEOHASH_BASE32.index(char)
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if bit:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+
+def normalize_place_name(text: str) -> str:
+    """
+    Normaliza un nombre de lugar para búsquedas: minúsculas, sin tildes,
+    sin signos de puntuación y con espacios simples
+    """
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    without_accents = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    cleaned = ''.join(c if c.isalnum() else ' ' for c in without_accents.lower())
+    return ' '.join(cleaned.split())
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Distancia de círculo máximo en km entre puntos (fórmula haversine vectorizada)
+
+    Acepta escalares o arreglos con broadcasting de numpy: un punto contra muchos,
+    N puntos contra N puntos, etc.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def to_unit_vectors(lats, lons) -> np.ndarray:
+    """Convierte latitudes/longitudes (grados) en vectores unitarios 3D (... x 3)"""
+    lat = np.radians(np.asarray(lats, dtype=float))
+    lon = np.radians(np.asarray(lons, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def chord_to_km(chords) -> np.ndarray:
+    """Convierte distancias de cuerda entre vectores unitarios en km sobre la superficie"""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chords, dtype=float) / 2, 0, 1))
+
+
+def nearest_axis_indices(axis, targets) -> np.ndarray:
+    """
+    Índice de la coordenada más cercana de un eje monótono (ascendente o
+    descendente) para cada objetivo, por búsqueda binaria: O(N log M)
+    """
+    axis = np.asarray(axis, dtype=float)
+    targets = np.asarray(targets, dtype=float)
+    if axis.size == 1:
+        return np.zeros(targets.shape, dtype=np.intp)
+    descending = axis[0] > axis[-1]
+    ordered = axis[::-1] if descending else axis
+    if np.any(np.diff(ordered) < 0):
+        # Eje no monótono: búsqueda exhaustiva
+        return np.abs(axis[np.newaxis, :] - targets.reshape(-1)[:, np.newaxis]).argmin(axis=1).reshape(targets.shape)
+    right = np.clip(np.searchsorted(ordered, targets), 1, ordered.size - 1)
+    left = right - 1
+    idx = np.where(np.abs(targets - ordered[left]) <= np.abs(ordered[right] - targets), left, right)
+    return (ordered.size - 1 - idx) if descending else idx
@@ -0,0 +1,123 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from services.geo_utils import normalize_place_name
+
+
+class GeocodingCache:
+    """
+    Caché persistente de resultados de geocodificación en SQLite.
+
+    Las consultas se normalizan (minúsculas, sin tildes, espacios simples) para
+    que variantes de la misma búsqueda compartan entrada. Cada entrada tiene TTL
+    y se registra su último uso para desalojar las menos usadas (LRU) al superar
+    el máximo de entradas. La base usa WAL para poder compartirse entre workers.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: int = 30 * 24 * 3600, max_entries: int = 20000):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=5)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS geocoding ('
+                ' key TEXT PRIMARY KEY,'
+                ' kind TEXT NOT NULL,'
+                ' query TEXT NOT NULL,'
+                ' value TEXT NOT NULL,'
+                ' created_at REAL NOT NULL,'
+                ' last_used REAL NOT NULL)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS geocoding_last_used ON geocoding (last_used)')
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(kind: str, query: str, limit: Optional[int] = None) -> str:
+        """Clave de la entrada: tipo de búsqueda, límite y consulta normalizada"""
+        return f"{kind}:{limit or ''}:{normalize_place_name(query)}"
+
+    def get(self, kind: str, query: str, limit: Optional[int] = None) -> Optional[Any]:
+        """Devuelve el resultado guardado o None si no existe o expiró"""
+        key = self.make_key(kind, query, limit)
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute('SELECT value, created_at FROM geocoding WHERE key = ?', (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                value, created_at = row
+                if now - created_at > self.ttl_seconds:
+                    self._conn.execute('DELETE FROM geocoding WHERE key = ?', (key,))
+                    self._conn.commit()
+                    self.misses += 1
+                    return None
+                self._conn.execute('UPDATE geocoding SET last_used = ? WHERE key = ?', (now, key))
+                self._conn.commit()
+                self.hits += 1
+            return json.loads(value)
+        except sqlite3.Error as e:
+            print(f"⚠️ Error leyendo caché de geocodificación: {e}")
+            return None
+
+    def set(self, kind: str, query: str, value: Any, limit: Optional[int] = None) -> None:
+        """Guarda un resultado y, cada cierto número de escrituras, aplica el límite LRU"""
+        key = self.make_key(kind, query, limit)
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO geocoding (key, kind, query, value, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?)',
+                    (key, kind, normalize_place_name(query), json.dumps(value), now, now)
+                )
+                self._writes += 1
+                if self._writes % 100 == 0:
+                    self._prune()
+                self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️ Error escribiendo caché de geocodificación: {e}")
+
+    def entries(self, kind: Optional[str] = None):
+        """Itera sobre los valores guardados (opcionalmente de un tipo)"""
+        with self._lock:
+            if kind:
+                rows = self._conn.execute('SELECT value FROM geocoding WHERE kind = ?', (kind,)).fetchall()
+            else:
+                rows = self._conn.execute('SELECT value FROM geocoding').fetchall()
+        for (value,) in rows:
+            try:
+                yield json.loads(value)
+            except ValueError:
+                continue
+
+    def stats(self) -> dict:
+        """Resumen de la caché"""
+        with self._lock:
+            count = self._conn.execute('SELECT COUNT(*) FROM geocoding').fetchone()[0]
+        return {
+            'entries': count,
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+    def _prune(self) -> None:
+        """Elimina entradas expiradas y las menos usadas por encima del máximo"""
+        self._conn.execute('DELETE FROM geocoding WHERE created_at < ?', (time.time() - self.ttl_seconds,))
+        self._conn.execute(
+            'DELETE FROM geocoding WHERE key IN ('
+            ' SELECT key FROM geocoding ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        )
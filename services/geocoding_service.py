@@ -1,18 +1,81 @@
-import requests
+import os
 import json
 from typing import Dict, Any, Optional, List
 
+from config.cities import CITIES_COORDINATES
+from services.autocomplete_index import AutocompleteIndex, city_score
+from services.gazetteer import DEFAULT_GAZETTEER_PATH, Gazetteer
+from services.geocoding_cache import GeocodingCache
+from services.http_client import HttpClient
+from services.spatial_index import SpatialIndex
+from services.rate_limiter import PRIORITY_AUTOCOMPLETE, PRIORITY_EXACT, RateLimiter
+
 class GeocodingService:
     """
     Servicio para geocodificación de ciudades usando Nominatim (OpenStreetMap)
     API gratuita sin necesidad de API key
+
+    Antes de consultar Nominatim (≈1 petición/s) se busca en un nomenclátor
+    offline y en una caché persistente (SQLite) de consultas normalizadas.
     """
     
-    def __init__(self):
+    def __init__(self, data_dir: Optional[str] = None, http: Optional[HttpClient] = None):
         self.base_url = "https://nominatim.openstreetmap.org/search"
         self.headers = {
             'User-Agent': 'CO2Monitor/1.0 (Flask Application)'
         }
+        self.http = http or HttpClient.from_env()
+
+        # Política de uso de Nominatim: como máximo 1 petición por segundo
+        self.rate_limiter = RateLimiter(
+            rate_per_second=float(os.getenv('NOMINATIM_RATE_PER_SEC', '1')),
+            burst=int(os.getenv('NOMINATIM_BURST', '1')),
+            state_path=os.path.join(data_dir, 'locks', 'nominatim.bucket')
+            if data_dir and os.getenv('NOMINATIM_RATE_LIMIT_SHARED', '1') == '1' else None
+        )
+        self.max_wait = {
+            PRIORITY_EXACT: float(os.getenv('NOMINATIM_MAX_WAIT_SECONDS', '10')),
+            PRIORITY_AUTOCOMPLETE: float(os.getenv('NOMINATIM_AUTOCOMPLETE_MAX_WAIT_SECONDS', '3'))
+        }
+
+        # Caché persistente de resultados de Nominatim
+        self.cache = None
+        if data_dir and os.getenv('GEOCODING_CACHE_ENABLED', '1') == '1':
+            try:
+                self.cache = GeocodingCache(
+                    os.path.join(data_dir, 'geocoding.sqlite3'),
+                    ttl_seconds=int(float(os.getenv('GEOCODING_CACHE_TTL_DAYS', '30')) * 24 * 3600),
+                    max_entries=int(os.getenv('GEOCODING_CACHE_MAX_ENTRIES', '20000'))
+                )
+            except Exception as e:
+                print(f"⚠️ Caché de geocodificación deshabilitada: {e}")
+
+        # Nomenclátor offline (extracto incluido o volcado de GeoNames)
+        self.gazetteer = None
+        if os.getenv('GAZETTEER_ENABLED', '1') == '1':
+            path = os.getenv('GAZETTEER_PATH', DEFAULT_GAZETTEER_PATH)
+            try:
+                self.gazetteer = Gazetteer.load(path)
+                print(f"📍 Nomenclátor offline cargado: {len(self.gazetteer)} lugares ({path})")
+            except Exception as e:
+                print(f"⚠️ No se pudo cargar el nomenclátor {path}: {e}")
+
+        # Índice de autocompletado: nomenclátor, ciudades predefinidas y búsquedas previas
+        self.autocomplete = AutocompleteIndex()
+        if self.gazetteer is not None:
+            self.autocomplete.add_many(self.gazetteer.records(), self.gazetteer.alternate_names)
+        self.autocomplete.add_many(self._predefined_cities())
+        if self.cache is not None:
+            for cached in self.cache.entries('cities'):
+                self.autocomplete.add_many(cached)
+            self.autocomplete.add_many(self.cache.entries('city'))
+
+        # Índice espacial para "ciudad conocida más cercana" y geocodificación inversa local
+        self.spatial = SpatialIndex(self._predefined_cities())
+        if self.gazetteer is not None:
+            self.spatial.add_many(self.gazetteer.records())
+        if self.cache is not None:
+            self.spatial.add_many(self.cache.entries('city'))
     
     def search_city(self, city_name: str) -> Optional[Dict[str, Any]]:
         """
@@ -24,105 +87,189 @@ class GeocodingService:
         Returns:
             Dict con información de la ciudad o None si no se encuentra
         """
-        try:
-            # Primero intentar búsqueda específica para ciudades
-            params = {
-                'q': city_name,
-                'format': 'json',
-                'limit': 5,  # Aumentar límite para tener más opciones
-                'addressdetails': 1,
-                'class': 'place',  # Especificar clase de lugar
-                'type': 'city,town,village',  # Tipos específicos de asentamientos
-                'countrycodes': '',  # Permitir todos los países
-                'dedupe': 1  # Eliminar duplicados
-            }
-            
-            response = requests.get(
-                self.base_url, 
-                params=params, 
-                headers=self.headers,
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data and len(data) > 0:
-                    # Filtrar y priorizar resultados más precisos
-                    best_result = self._find_best_city_match(data, city_name)
-                    
-                    if best_result:
-                        # Extraer información relevante
-                        city_info = {
-                            'name': self._extract_city_name(best_result),
-                            'display_name': best_result.get('display_name', city_name),
-                            'lat': float(best_result.get('lat', 0)),
-                            'lon': float(best_result.get('lon', 0)),
-                            'country': self._extract_country(best_result.get('address', {})),
-                            'region': self._extract_region(best_result.get('address', {})),
-                            'importance': best_result.get('importance', 0),
-                            'place_type': best_result.get('type', 'unknown')
-                        }
-                        
-                        return city_info
-                    
-        except Exception as e:
-            print(f"Error en búsqueda de ciudad: {e}")
-            
+        if self.gazetteer is not None:
+            offline = self.gazetteer.lookup(city_name, limit=1)
+            if offline:
+                return offline[0]
+
+        if self.cache is not None:
+            cached = self.cache.get('city', city_name)
+            if cached is not None:
+                return cached
+
+        # Primero intentar búsqueda específica para ciudades
+        params = {
+            'q': city_name,
+            'format': 'json',
+            'limit': 5,  # Aumentar límite para tener más opciones
+            'addressdetails': 1,
+            'class': 'place',  # Especificar clase de lugar
+            'type': 'city,town,village',  # Tipos específicos de asentamientos
+            'countrycodes': '',  # Permitir todos los países
+            'dedupe': 1  # Eliminar duplicados
+        }
+        data = self._query_nominatim(params, 'búsqueda de ciudad', PRIORITY_EXACT)
+        if data:
+            # Filtrar y priorizar resultados más precisos
+            best_result = self._find_best_city_match(data, city_name)
+
+            if best_result:
+                city_info = self._to_city_info(best_result, city_name)
+                if self.cache is not None:
+                    self.cache.set('city', city_name, city_info)
+                self.autocomplete.add(city_info)
+                self.spatial.add_many([city_info])
+                return city_info
+
         return None
     
-    def search_cities(self, city_name: str, limit: int = 5) -> List[Dict[str, Any]]:
+    def search_cities(self, city_name: str, limit: int = 5, client_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Busca múltiples ciudades que coincidan con el nombre
         
         Args:
             city_name: Nombre de la ciudad a buscar
             limit: Número máximo de resultados
+            client_id: Identificador del cliente; una búsqueda nueva cancela la
+                que ese cliente tuviera esperando turno para Nominatim
             
         Returns:
             Lista de ciudades encontradas
         """
+        # Solo los prefijos (que además cumplen el calificador tras la coma) responden
+        # sin red; las coincidencias aproximadas completan la respuesta de Nominatim
+        suggestions = self.autocomplete.search(city_name, limit, fuzzy=False)
+        if suggestions:
+            return suggestions
+        similar = self.autocomplete.search(city_name, limit)
+
+        if self.cache is not None:
+            cached = self.cache.get('cities', city_name, limit)
+            if cached is not None:
+                return self._merge_cities(cached, similar, limit)
+
+        params = {
+            'q': city_name,
+            'format': 'json',
+            'limit': limit,
+            'addressdetails': 1,
+            'class': 'place',
+            'type': 'city,town,village'
+        }
+        data = self._query_nominatim(
+            params, 'búsqueda múltiple', PRIORITY_AUTOCOMPLETE,
+            group=f"autocomplete:{client_id}" if client_id else None
+        )
+        if data is None:
+            return similar
+
+        cities = [self._to_city_info(result, city_name) for result in data]
+
+        # Ordenar por importancia (relevancia)
+        cities.sort(key=lambda x: x['importance'], reverse=True)
+        if self.cache is not None:
+            self.cache.set('cities', city_name, cities, limit)
+        self.autocomplete.add_many(cities)
+        return self._merge_cities(cities, similar, limit)
+
+    @staticmethod
+    def _merge_cities(primary: List[Dict[str, Any]], extra: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+        """Une dos listas de ciudades sin repetir lugares (mismo nombre a menos de ~10 km)"""
+        merged, seen = [], set()
+        for city in primary + extra:
+            identity = (city.get('name', '').lower(), round(float(city['lat']), 1), round(float(city['lon']), 1))
+            if identity in seen:
+                continue
+            seen.add(identity)
+            merged.append(city)
+        return merged[:limit]
+
+    def nearest_cities(self, lat: float, lon: float, k: int = 1, max_km: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Ciudades conocidas (predefinidas, nomenclátor y búsquedas previas) más
+        cercanas a un punto, sin consultar servicios externos
+
+        Args:
+            lat: Latitud
+            lon: Longitud
+            k: Número de ciudades
+            max_km: Distancia máxima en km (opcional)
+
+        Returns:
+            Lista de ciudades con `distance_km`, de la más cercana a la más lejana
+        """
+        return self.spatial.nearest(lat, lon, k, max_km)
+
+    def _query_nominatim(self, params: Dict[str, Any], context: str, priority: int,
+                         group: Optional[str] = None) -> Optional[List[Dict]]:
+        """
+        Consulta Nominatim (respetando el limitador de tasa) y devuelve la lista de
+        resultados, o None si la petición falló o se descartó en la cola (para no
+        guardar errores en la caché)
+        """
+        if not self.rate_limiter.acquire(priority, group, self.max_wait[priority]):
+            print(f"⏳ {context} descartada en la cola de Nominatim: {params.get('q')}")
+            return None
+
         try:
-            params = {
-                'q': city_name,
-                'format': 'json',
-                'limit': limit,
-                'addressdetails': 1,
-                'class': 'place',
-                'type': 'city,town,village'
-            }
-            
-            response = requests.get(
+            # Sin reintentos automáticos: cada intento debe pasar por el limitador
+            response = self.http.get(
                 self.base_url, 
                 params=params, 
                 headers=self.headers,
-                timeout=10
+                timeout=10,
+                retries=0
             )
             
             if response.status_code == 200:
-                data = response.json()
-                cities = []
-                
-                for result in data:
-                    city_info = {
-                        'name': self._extract_city_name(result),
-                        'display_name': result.get('display_name', city_name),
-                        'lat': float(result.get('lat', 0)),
-                        'lon': float(result.get('lon', 0)),
-                        'country': self._extract_country(result.get('address', {})),
-                        'region': self._extract_region(result.get('address', {})),
-                        'importance': result.get('importance', 0),
-                        'place_type': result.get('type', 'unknown')
-                    }
-                    cities.append(city_info)
-                
-                # Ordenar por importancia (relevancia)
-                cities.sort(key=lambda x: x['importance'], reverse=True)
-                return cities
+                return response.json()
+            print(f"Error en {context}: Nominatim respondió {response.status_code}")
                     
         except Exception as e:
-            print(f"Error en búsqueda múltiple: {e}")
+            print(f"Error en {context}: {e}")
             
-        return []
+        return None
+
+    def _to_city_info(self, result: Dict, city_name: str) -> Dict[str, Any]:
+        """Extrae la información relevante de un resultado de Nominatim"""
+        return {
+            'name': self._extract_city_name(result),
+            'display_name': result.get('display_name', city_name),
+            'lat': float(result.get('lat', 0)),
+            'lon': float(result.get('lon', 0)),
+            'country': self._extract_country(result.get('address', {})),
+            'region': self._extract_region(result.get('address', {})),
+            'importance': result.get('importance', 0),
+            'place_type': result.get('type', 'unknown')
+        }
+
+    def _predefined_cities(self) -> List[Dict[str, Any]]:
+        """Ciudades de CITIES_COORDINATES en el formato de los resultados"""
+        return [
+            {
+                'name': city['name'],
+                'display_name': f"{city['name']}, {city['region']}, Perú",
+                'lat': city['lat'],
+                'lon': city['lon'],
+                'country': 'Perú',
+                'region': city['region'],
+                'importance': 0.7,
+                'place_type': 'city',
+                'source': 'predefined',
+                'key': key
+            }
+            for key, city in CITIES_COORDINATES.items()
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado de la caché, del nomenclátor offline y del índice de autocompletado"""
+        return {
+            'cache': self.cache.stats() if self.cache is not None else None,
+            'gazetteer_places': len(self.gazetteer) if self.gazetteer is not None else 0,
+            'autocomplete_entries': len(self.autocomplete),
+            'spatial_entries': len(self.spatial),
+            'rate_limiter': self.rate_limiter.stats()
+        }
     
     def _find_best_city_match(self, results: List[Dict], city_name: str) -> Optional[Dict]:
         """
@@ -131,20 +278,11 @@ class GeocodingService:
         if not results:
             return None
         
-        # Priorizar por tipo de lugar (city > town > village)
-        type_priority = {'city': 3, 'town': 2, 'village': 1}
-        
         # Calcular puntuación para cada resultado
         scored_results = []
         for result in results:
-            score = 0
-            place_type = result.get('type', '').lower()
-            
-            # Puntuación por tipo de lugar
-            score += type_priority.get(place_type, 0) * 10
-            
-            # Puntuación por importancia
-            score += result.get('importance', 0) * 5
+            # Puntuación por tipo de lugar (city > town > village) e importancia
+            score = city_score(result.get('type', ''), result.get('importance', 0))
             
             # Puntuación por coincidencia exacta en el nombre
             display_name = result.get('display_name', '').lower()
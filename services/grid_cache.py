@@ -0,0 +1,134 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from services.grid_store import GridStore
+
+
+class GridEntry:
+    """
+    Campo de CO2 listo para consultas: arreglo memory-mapped y ejes precalculados.
+
+    Si los ejes son regulares (caso de CAMS), la celda más cercana se obtiene con
+    aritmética de índices O(1) por punto en lugar de buscar sobre el eje.
+    """
+
+    __slots__ = ('key', 'values', 'meta', 'lat_axis', 'lon_axis', 'lat0', 'dlat', 'lon0', 'dlon',
+                 'regular', 'axes_key', 'nbytes', 'loaded_at')
+
+    def __init__(self, key: str, values: np.ndarray, meta: Dict[str, Any]):
+        self.key = key
+        self.values = values
+        self.meta = meta
+        self.lat_axis = np.asarray(meta['lat'], dtype=float)
+        self.lon_axis = np.asarray(meta['lon'], dtype=float)
+        self.lat0, self.dlat = self._regular_step(self.lat_axis)
+        self.lon0, self.dlon = self._regular_step(self.lon_axis)
+        self.regular = self.dlat is not None and self.dlon is not None
+        # Firma de la malla: campos de distintas fechas con la misma área la comparten
+        self.axes_key = hashlib.sha1(self.lat_axis.tobytes() + b'|' + self.lon_axis.tobytes()).hexdigest()[:16]
+        self.nbytes = int(values.nbytes)
+        self.loaded_at = time.time()
+
+    @staticmethod
+    def _regular_step(axis: np.ndarray) -> Tuple[float, Optional[float]]:
+        """Devuelve (origen, paso) si el eje es equiespaciado, (origen, None) si no"""
+        if axis.size < 2:
+            return (float(axis[0]) if axis.size else 0.0), None
+        steps = np.diff(axis)
+        step = float(steps.mean())
+        if step == 0 or not np.allclose(steps, step, rtol=1e-4, atol=1e-6):
+            return float(axis[0]), None
+        return float(axis[0]), step
+
+    def nearest(self, lats: np.ndarray, lons: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Índices (ilat, ilon) de la celda más cercana para cada punto"""
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        if self.regular:
+            ilat = np.clip(np.rint((lats - self.lat0) / self.dlat), 0, self.lat_axis.size - 1).astype(np.intp)
+            ilon = np.clip(np.rint((lons - self.lon0) / self.dlon), 0, self.lon_axis.size - 1).astype(np.intp)
+            return ilat, ilon
+        return GridStore.nearest_indices(self.lat_axis, lats), GridStore.nearest_indices(self.lon_axis, lons)
+
+
+class GridCache:
+    """
+    Caché en proceso de campos de CO2 memory-mapped.
+
+    Los arreglos se abren con `mmap_mode='r'`, por lo que sus páginas viven en la
+    caché de páginas del sistema operativo y se comparten entre todos los workers
+    de gunicorn; cada proceso solo guarda el mapeo y los ejes precalculados.
+    Desaloja por tamaño total mapeado (LRU) y por antigüedad, y expone contadores
+    de aciertos/fallos.
+    """
+
+    def __init__(self, grid_store: GridStore, max_bytes: int = 512 * 1024 ** 2, max_age_seconds: int = 3600):
+        self.grid_store = grid_store
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._entries: 'OrderedDict[str, GridEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[GridEntry]:
+        """Devuelve el campo de la clave, cargándolo del almacén si no está en memoria"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.loaded_at <= self.max_age_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+
+        loaded = self.grid_store.get(key)
+        if loaded is None:
+            return None
+        entry = GridEntry(key, *loaded)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.nbytes
+            self._evict()
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores y ocupación de la caché"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else None,
+                'evictions': self.evictions
+            }
+
+    def _evict(self) -> None:
+        now = time.time()
+        for key in [k for k, e in self._entries.items() if now - e.loaded_at > self.max_age_seconds]:
+            self._remove(key)
+            self.evictions += 1
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
@@ -0,0 +1,63 @@
+import json
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from services.data_cache import DataCache
+from services.geo_utils import nearest_axis_indices
+
+
+class GridStore:
+    """
+    Almacén local compacto de campos de CO2 ya procesados.
+
+    Cada descarga CAMS se valida una sola vez y se convierte en un arreglo `.npy`
+    (float32, ppm, con latitud y longitud como últimas dimensiones) más un archivo
+    `.json` con los ejes de coordenadas, la fecha, las horas de pronóstico y la
+    información temporal. Ambos viven en la caché de datos bajo la misma clave de
+    la petición, por lo que comparten los límites de tamaño/antigüedad y el
+    desalojo LRU. Las lecturas usan `np.load(mmap_mode='r')`, de modo que una
+    consulta puntual solo lee del disco las celdas que necesita.
+    """
+
+    VALUES_EXT = '.npy'
+    META_EXT = '.json'
+
+    def __init__(self, cache: DataCache):
+        self.cache = cache
+
+    def exists(self, key: str) -> bool:
+        """Indica si la clave está ingerida y no ha expirado (sin contar como acceso)"""
+        return self.cache.is_fresh(key, self.META_EXT)
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, Dict[str, Any]]]:
+        """
+        Devuelve (valores memory-mapped, metadatos) o None si la clave no está en la caché
+        """
+        meta_path = self.cache.get(key, self.META_EXT)
+        if meta_path is None:
+            return None
+        values_path = self.cache.path_for(key, self.VALUES_EXT)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            values = np.load(values_path, mmap_mode='r')
+        except (FileNotFoundError, ValueError) as e:
+            print(f"⚠️ Entrada de almacén incompleta {key[:12]}: {e}")
+            return None
+        return values, meta
+
+    def put(self, key: str, values: np.ndarray, meta: Dict[str, Any]) -> None:
+        """
+        Guarda un campo de forma atómica. Los metadatos se publican al final: su
+        presencia marca la entrada como completa.
+        """
+        values = np.ascontiguousarray(values, dtype=np.float32)
+        meta = dict(meta, shape=list(values.shape), dtype='float32')
+        self.cache.write_atomic(key, self.VALUES_EXT, lambda f: np.save(f, values, allow_pickle=False), evict=False)
+        self.cache.write_atomic(key, self.META_EXT, lambda f: f.write(json.dumps(meta).encode('utf-8')))
+
+    @staticmethod
+    def nearest_indices(axis: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        """Índice de la coordenada más cercana del eje para cada objetivo (vectorizado)"""
+        return nearest_axis_indices(axis, targets)
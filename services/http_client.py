@@ -0,0 +1,163 @@
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Límites superiores (ms) de los cubos del histograma de latencia
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# Códigos que merecen reintento (sobrecarga o fallo transitorio del servidor)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """
+    Espera antes del reintento `attempt` (0 = primer reintento) con backoff
+    exponencial y jitter completo: aleatoria entre 0 y min(cap, base * 2^attempt)
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def retry_after_seconds(response: Optional[requests.Response]) -> Optional[float]:
+    """Segundos indicados en la cabecera Retry-After (solo formato numérico)"""
+    if response is None:
+        return None
+    value = response.headers.get('Retry-After')
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class _HostStats:
+    """Contadores e histograma de latencia de un host"""
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.errors: Dict[str, int] = {}
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+
+    def observe(self, elapsed_ms: float, outcome: Optional[str]) -> None:
+        self.requests += 1
+        self.total_ms += elapsed_ms
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        if outcome is not None:
+            self.errors[outcome] = self.errors.get(outcome, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"le_{b}ms" for b in LATENCY_BUCKETS_MS] + ['inf']
+        return {
+            'requests': self.requests,
+            'retries': self.retries,
+            'errors': dict(self.errors),
+            'avg_ms': round(self.total_ms / self.requests, 1) if self.requests else None,
+            'latency_histogram': dict(zip(labels, self.buckets))
+        }
+
+
+class HttpClient:
+    """
+    Capa compartida de HTTP saliente.
+
+    Mantiene una sesión de requests por host (pool de conexiones keep-alive, sin
+    repetir el handshake TLS), reintenta errores de conexión y respuestas 429/5xx
+    con backoff exponencial y jitter (respetando Retry-After) y registra por host
+    un histograma de latencias y los errores por tipo.
+    """
+
+    def __init__(self, pool_maxsize: int = 10, retries: int = 2, backoff_base: float = 0.5,
+                 backoff_cap: float = 10.0):
+        self.pool_maxsize = pool_maxsize
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._sessions: Dict[str, requests.Session] = {}
+        self._stats: Dict[str, _HostStats] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'HttpClient':
+        """Crea el cliente con la configuración de HTTP_POOL_MAXSIZE, HTTP_RETRIES y HTTP_BACKOFF_*"""
+        return cls(
+            pool_maxsize=int(os.getenv('HTTP_POOL_MAXSIZE', '10')),
+            retries=int(os.getenv('HTTP_RETRIES', '2')),
+            backoff_base=float(os.getenv('HTTP_BACKOFF_BASE_SECONDS', '0.5')),
+            backoff_cap=float(os.getenv('HTTP_BACKOFF_MAX_SECONDS', '10'))
+        )
+
+    def session_for(self, url: str) -> requests.Session:
+        """Sesión (con su pool de conexiones) del host de la URL"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                # Las respuestas se registran con un hook, así también se miden los
+                # clientes que usan la sesión directamente (p. ej. cdsapi)
+                session.hooks['response'].append(self._response_hook)
+                self._sessions[host] = session
+                self._stats[host] = _HostStats()
+            return session
+
+    def _response_hook(self, response: requests.Response, *args, **kwargs) -> None:
+        stats = self._stats.get(urlsplit(response.url).netloc)
+        if stats is not None:
+            outcome = None if response.status_code < 400 else str(response.status_code)
+            with self._lock:
+                stats.observe(response.elapsed.total_seconds() * 1000, outcome)
+
+    def request(self, method: str, url: str, retries: Optional[int] = None, **kwargs) -> requests.Response:
+        """
+        Hace la petición por la sesión del host, con reintentos
+
+        Los errores de conexión/timeout se relanzan tras el último intento; las
+        respuestas HTTP (también las de error) se devuelven al llamador.
+        """
+        session = self.session_for(url)
+        host = urlsplit(url).netloc
+        stats = self._stats[host]
+        retries = self.retries if retries is None else retries
+
+        for attempt in range(retries + 1):
+            started = time.perf_counter()
+            response = None
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                self._observe(stats, started, 'timeout' if isinstance(e, requests.Timeout) else 'connection')
+                if attempt >= retries:
+                    raise
+
+            retryable = response is None or response.status_code in RETRY_STATUSES
+            if not retryable or attempt >= retries:
+                return response
+            delay = retry_after_seconds(response)
+            if delay is None:
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+            with self._lock:
+                stats.retries += 1
+            time.sleep(min(delay, self.backoff_cap))
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def _observe(self, stats: _HostStats, started: float, outcome: Optional[str]) -> None:
+        with self._lock:
+            stats.observe((time.perf_counter() - started) * 1000, outcome)
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas por host"""
+        with self._lock:
+            return {host: s.snapshot() for host, s in self._stats.items()}
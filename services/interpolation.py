@@ -0,0 +1,135 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+from services.geo_utils import haversine_km
+
+# Métodos admitidos en el parámetro `interp` de los endpoints de CO2
+INTERP_METHODS = ('nearest', 'bilinear', 'idw')
+
+# Exponente de la ponderación por distancia inversa
+IDW_POWER = 2.0
+
+
+def _bracket(axis: np.ndarray, targets: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Índices de las dos coordenadas del eje que rodean cada objetivo y la fracción
+    de distancia desde la primera (0-1, recortada fuera del eje). Admite ejes
+    ascendentes o descendentes.
+    """
+    n = axis.size
+    if n == 1:
+        zeros = np.zeros(targets.shape, dtype=np.intp)
+        return zeros, zeros, np.zeros(targets.shape)
+    descending = axis[0] > axis[-1]
+    ordered = axis[::-1] if descending else axis
+    hi = np.clip(np.searchsorted(ordered, targets), 1, n - 1)
+    lo = hi - 1
+    frac = np.clip((targets - ordered[lo]) / (ordered[hi] - ordered[lo]), 0.0, 1.0)
+    if descending:
+        lo, hi = n - 1 - lo, n - 1 - hi
+    return lo, hi, frac
+
+
+def compute_stencils(lat_axis, lon_axis, lats, lons, method: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Calcula de forma vectorizada las celdas y pesos de interpolación de cada punto
+
+    Cada punto usa las 4 celdas que lo rodean; los pesos son bilineales o por
+    distancia inversa (haversine) y suman 1.
+
+    Returns:
+        (índices de latitud, índices de longitud, pesos), cada uno de forma (N, 4)
+    """
+    lat_axis = np.asarray(lat_axis, dtype=float)
+    lon_axis = np.asarray(lon_axis, dtype=float)
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    lat_lo, lat_hi, fy = _bracket(lat_axis, lats)
+    lon_lo, lon_hi, fx = _bracket(lon_axis, lons)
+
+    lat_idx = np.stack([lat_lo, lat_lo, lat_hi, lat_hi], axis=-1)
+    lon_idx = np.stack([lon_lo, lon_hi, lon_lo, lon_hi], axis=-1)
+
+    if method == 'bilinear':
+        weights = np.stack([(1 - fy) * (1 - fx), (1 - fy) * fx, fy * (1 - fx), fy * fx], axis=-1)
+    elif method == 'idw':
+        distances = haversine_km(lats[:, np.newaxis], lons[:, np.newaxis], lat_axis[lat_idx], lon_axis[lon_idx])
+        exact = distances < 1e-6
+        with np.errstate(divide='ignore'):
+            weights = np.where(exact.any(axis=1, keepdims=True), exact.astype(float), 1.0 / distances ** IDW_POWER)
+        weights = weights / weights.sum(axis=1, keepdims=True)
+    else:
+        raise ValueError(f"Método de interpolación no soportado: {method}")
+    return lat_idx, lon_idx, weights
+
+
+def apply_stencils(values: np.ndarray, lat_idx: np.ndarray, lon_idx: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    Interpola un campo (..., lat, lon) en N puntos
+
+    Returns:
+        Arreglo (..., N) con las dimensiones no espaciales del campo
+    """
+    cells = np.asarray(values[..., lat_idx, lon_idx], dtype=float)
+    return np.sum(cells * weights, axis=-1)
+
+
+class StencilCache:
+    """
+    Caché LRU de celdas y pesos de interpolación por malla y punto.
+
+    La clave usa la firma de los ejes (`GridEntry.axes_key`), no la del campo:
+    todas las fechas descargadas con la misma área comparten malla, así que la
+    consulta repetida de una ciudad reutiliza su plantilla sin recalcularla.
+    """
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple, Tuple[np.ndarray, np.ndarray, np.ndarray]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, axes_key: str, lat_axis, lon_axis, lats, lons, method: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Plantillas (N, 4) de los puntos; calcula en un solo paso las que falten"""
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        keys = [(axes_key, method, round(float(la), 5), round(float(lo), 5)) for la, lo in zip(lats, lons)]
+        rows = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                row = self._entries.get(key)
+                if row is None:
+                    missing.append(i)
+                else:
+                    self._entries.move_to_end(key)
+                    rows[i] = row
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            lat_idx, lon_idx, weights = compute_stencils(lat_axis, lon_axis, lats[missing], lons[missing], method)
+            with self._lock:
+                for j, i in enumerate(missing):
+                    rows[i] = (lat_idx[j], lon_idx[j], weights[j])
+                    self._entries[keys[i]] = rows[i]
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        return (np.stack([r[0] for r in rows]), np.stack([r[1] for r in rows]), np.stack([r[2] for r in rows]))
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de la caché"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else None
+            }
@@ -0,0 +1,165 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from services.response_codec import json_default
+
+
+class JobManager:
+    """
+    Ejecución en segundo plano de peticiones lentas (descargas CAMS).
+
+    Las peticiones se encolan en un pool de hilos acotado y se identifican con un
+    job id. Las peticiones idénticas (misma clave) mientras están en cola o en
+    ejecución se deduplican y devuelven el mismo job. El estado de cada job se
+    persiste como JSON en `jobs_dir` para que cualquier worker de gunicorn pueda
+    responder a la consulta de estado.
+    """
+
+    def __init__(self, jobs_dir: str, max_workers: int = 2, max_pending: int = 32, ttl_seconds: int = 3600):
+        self.jobs_dir = jobs_dir
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='co2-job')
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._active_by_key: Dict[str, str] = {}
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+    def submit(self, key: str, fn: Callable[[], Tuple[Dict[str, Any], int]]) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """
+        Encola una petición
+
+        Args:
+            key: Clave de deduplicación de la petición
+            fn: Función sin argumentos que devuelve (cuerpo de respuesta, código HTTP)
+
+        Returns:
+            (job, creado) — job es None si la cola está llena
+        """
+        with self._lock:
+            job_id = self._active_by_key.get(key)
+            if job_id and job_id in self._jobs:
+                return self._public(self._jobs[job_id]), False
+
+            if len(self._active_by_key) >= self.max_pending:
+                return None, False
+
+            now = time.time()
+            job = {
+                'id': uuid.uuid4().hex,
+                'key': key,
+                'status': 'queued',
+                'created_at': now,
+                'updated_at': now,
+                'result': None,
+                'http_status': None
+            }
+            self._jobs[job['id']] = job
+            self._active_by_key[key] = job['id']
+            self._save(job)
+
+        self._executor.submit(self._run, job['id'], fn)
+        self._purge_expired()
+        return self._public(job), True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Devuelve el estado de un job (de memoria o, si lo creó otro worker, de disco)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return self._public(job)
+
+        # Evitar recorridos de ruta con ids arbitrarios
+        if not all(c in '0123456789abcdef' for c in job_id):
+            return None
+        try:
+            with open(self._path(job_id), 'r') as f:
+                return self._public(json.load(f))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Resumen de la cola de jobs de este proceso"""
+        with self._lock:
+            statuses = [job['status'] for job in self._jobs.values()]
+        return {
+            'active': statuses.count('queued') + statuses.count('running'),
+            'queued': statuses.count('queued'),
+            'running': statuses.count('running'),
+            'max_pending': self.max_pending
+        }
+
+    def _run(self, job_id: str, fn: Callable[[], Tuple[Dict[str, Any], int]]) -> None:
+        """Ejecuta el job en un hilo del pool y registra su resultado"""
+        self._update(job_id, status='running')
+        try:
+            body, http_status = fn()
+            status = 'done' if http_status < 400 else 'failed'
+            self._update(job_id, status=status, result=body, http_status=http_status)
+        except Exception as e:
+            print(f"❌ Error ejecutando job {job_id}: {e}")
+            self._update(job_id, status='failed', http_status=500, result={
+                'success': False,
+                'error': f'Error interno del servidor: {str(e)}'
+            })
+        finally:
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job and self._active_by_key.get(job['key']) == job_id:
+                    del self._active_by_key[job['key']]
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            job['updated_at'] = time.time()
+            self._save(job)
+
+    def _save(self, job: Dict[str, Any]) -> None:
+        """Escritura atómica del estado del job en disco"""
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix='.job.', suffix='.tmp', dir=self.jobs_dir)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(job, f, default=json_default)
+            os.replace(tmp_path, self._path(job['id']))
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar el estado del job {job['id']}: {e}")
+
+    def _purge_expired(self) -> None:
+        """Elimina jobs terminados más antiguos que el TTL (memoria y disco)"""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job['status'] in ('done', 'failed') and job['updated_at'] < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+        try:
+            for name in os.listdir(self.jobs_dir):
+                path = os.path.join(self.jobs_dir, name)
+                if name.endswith('.json') and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+        except OSError:
+            pass
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    @staticmethod
+    def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+        """Vista del job expuesta por la API"""
+        return {
+            'id': job['id'],
+            'status': job['status'],
+            'created_at': job['created_at'],
+            'updated_at': job['updated_at'],
+            'http_status': job.get('http_status'),
+            'result': job.get('result')
+        }
@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+try:
+    import fcntl  # Disponible en Linux/macOS (gunicorn)
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+class PrefetchScheduler:
+    """
+    Precarga periódica de datos CAMS para las ciudades configuradas.
+
+    CAMS publica los datos con retraso y la aplicación consulta por defecto la
+    fecha de hace `lag_days` días; el planificador descarga en segundo plano esa
+    fecha y las `horizon_days - 1` siguientes (las que serán la fecha por defecto
+    en los próximos días), para que el primer usuario del día encuentre la caché
+    caliente. Solo un worker de gunicorn ejecuta la precarga (bloqueo de archivo);
+    los demás reintentan obtener el bloqueo cada `leader_retry_seconds` y toman el
+    relevo si el líder termina. El estado se guarda en disco para que cualquier
+    worker pueda consultarlo.
+    """
+
+    # Intervalo máximo entre reintentos del bloqueo de líder en los workers en espera
+    LEADER_RETRY_SECONDS = 60
+
+    def __init__(self, co2_service, horizon_days: int = 3, concurrency: int = 2,
+                 interval_seconds: int = 3600, lag_days: int = 7, publication_delay_days: int = 4,
+                 leadtime_hours: Optional[List[str]] = None):
+        self.co2_service = co2_service
+        self.horizon_days = horizon_days
+        self.concurrency = max(1, concurrency)
+        self.interval_seconds = interval_seconds
+        self.lag_days = lag_days
+        self.publication_delay_days = publication_delay_days
+        self.leadtime_hours = leadtime_hours or ["0", "12", "24"]
+        self.status_path = os.path.join(co2_service.data_dir, 'prefetch_status.json')
+        self._lock_path = os.path.join(co2_service.data_dir, 'locks', 'prefetch.lock')
+        self._lock_file = None
+        self.leader_retry_seconds = min(self.LEADER_RETRY_SECONDS, interval_seconds)
+        self._thread = None
+        self._stop = threading.Event()
+        self._status: Dict[str, Any] = {
+            'enabled': False,
+            'role': 'idle',
+            'running': False,
+            'last_run_started': None,
+            'last_run_finished': None,
+            'next_run': None,
+            'dates': []
+        }
+
+    @classmethod
+    def from_env(cls, co2_service) -> 'PrefetchScheduler':
+        """Crea el planificador con la configuración de las variables de entorno"""
+        return cls(
+            co2_service,
+            horizon_days=int(os.getenv('CO2_PREFETCH_HORIZON_DAYS', '3')),
+            concurrency=int(os.getenv('CO2_PREFETCH_CONCURRENCY', '2')),
+            interval_seconds=int(float(os.getenv('CO2_PREFETCH_INTERVAL_MINUTES', '60')) * 60)
+        )
+
+    def target_dates(self, now: Optional[datetime] = None) -> List[datetime]:
+        """Fechas a precargar: la fecha por defecto actual y las próximas ya publicadas"""
+        now = now or datetime.now()
+        latest_published = now - timedelta(days=self.publication_delay_days)
+        dates = []
+        for i in range(self.horizon_days):
+            date = now - timedelta(days=self.lag_days - i)
+            if date.date() <= latest_published.date():
+                dates.append(date)
+        return dates
+
+    def start(self) -> bool:
+        """
+        Inicia el hilo de precarga; si otro proceso es el líder, queda en espera
+
+        Returns:
+            True si este proceso ejecutará la precarga desde el arranque
+        """
+        self._status['enabled'] = True
+        if self._thread is None:
+            self._try_become_leader()
+            self._thread = threading.Thread(target=self._loop, name='co2-prefetch', daemon=True)
+            self._thread.start()
+        return self._status['role'] == 'leader'
+
+    def stop(self) -> None:
+        """Detiene el hilo de precarga"""
+        self._stop.set()
+
+    def run_once(self) -> List[Dict[str, Any]]:
+        """Ejecuta una pasada de precarga con concurrencia acotada"""
+        dates = self.target_dates()
+        self._status['running'] = True
+        self._status['last_run_started'] = datetime.now().isoformat(timespec='seconds')
+        self._save_status()
+
+        results = []
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='co2-prefetch') as pool:
+            futures = [pool.submit(self._prefetch_date, date) for date in dates]
+            for future in futures:
+                results.append(future.result())
+
+        self._status['running'] = False
+        self._status['last_run_finished'] = datetime.now().isoformat(timespec='seconds')
+        self._status['dates'] = results
+        self._save_status()
+        return results
+
+    def status(self) -> Dict[str, Any]:
+        """Estado de la precarga (del líder, leído de disco, si este worker no lo es)"""
+        if self._status['role'] != 'leader':
+            try:
+                with open(self.status_path, 'r') as f:
+                    shared = json.load(f)
+                shared['role'] = self._status['role']
+                shared['enabled'] = self._status['enabled']
+                return shared
+            except (FileNotFoundError, ValueError):
+                pass
+        return dict(self._status, horizon_days=self.horizon_days, concurrency=self.concurrency,
+                    interval_seconds=self.interval_seconds)
+
+    def _prefetch_date(self, date: datetime) -> Dict[str, Any]:
+        started = time.time()
+        try:
+            result = self.co2_service.prefetch(date, self.leadtime_hours)
+        except Exception as e:
+            result = {'date': date.strftime('%Y-%m-%d'), 'files': [], 'error': str(e)}
+        result['seconds'] = round(time.time() - started, 2)
+        print(f"📦 Precarga {result['date']}: {[f['status'] for f in result['files']]} en {result['seconds']} s")
+        return result
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            # En cada ciclo, un worker en espera reintenta el bloqueo por si el líder terminó
+            if not self._try_become_leader():
+                self._stop.wait(self.leader_retry_seconds)
+                continue
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"❌ Error en precarga CAMS: {e}")
+                self._status['running'] = False
+            next_run = datetime.now() + timedelta(seconds=self.interval_seconds)
+            self._status['next_run'] = next_run.isoformat(timespec='seconds')
+            self._save_status()
+            self._stop.wait(self.interval_seconds)
+
+    def _try_become_leader(self) -> bool:
+        """Obtiene el rol de líder si está libre (el bloqueo se conserva una vez obtenido)"""
+        if self._lock_file is not None or self._status['role'] == 'leader':
+            return True
+        if not self._acquire_leader_lock():
+            if self._status['role'] != 'standby':
+                self._status['role'] = 'standby'
+                print("⏸️ Precarga CAMS gestionada por otro worker")
+            return False
+        self._status['role'] = 'leader'
+        print(f"🔄 Precarga CAMS iniciada (horizonte {self.horizon_days} días, cada {self.interval_seconds // 60} min)")
+        return True
+
+    def _acquire_leader_lock(self) -> bool:
+        """Bloqueo no bloqueante para que solo un proceso ejecute la precarga"""
+        if fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(self._lock_path), exist_ok=True)
+        lock_file = open(self._lock_path, 'a')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        # Mantener el archivo abierto mientras viva el proceso
+        self._lock_file = lock_file
+        return True
+
+    def _save_status(self) -> None:
+        status = dict(self._status, horizon_days=self.horizon_days, concurrency=self.concurrency,
+                      interval_seconds=self.interval_seconds)
+        try:
+            os.makedirs(os.path.dirname(self.status_path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix='.prefetch.', suffix='.tmp', dir=os.path.dirname(self.status_path))
+            with os.fdopen(fd, 'w') as f:
+                json.dump(status, f)
+            os.replace(tmp_path, self.status_path)
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar el estado de la precarga: {e}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Punto de entrada CLI: python -m services.prefetch_service [--once]"""
+    parser = argparse.ArgumentParser(description='Precarga de datos CAMS para las ciudades configuradas')
+    parser.add_argument('--once', action='store_true', help='Ejecutar una sola pasada y salir')
+    parser.add_argument('--horizon', type=int, default=None, help='Días a precargar')
+    parser.add_argument('--concurrency', type=int, default=None, help='Descargas simultáneas')
+    args = parser.parse_args(argv)
+
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from services.co2_service import CO2Service
+
+    scheduler = PrefetchScheduler.from_env(CO2Service())
+    if args.horizon is not None:
+        scheduler.horizon_days = args.horizon
+    if args.concurrency is not None:
+        scheduler.concurrency = max(1, args.concurrency)
+
+    if args.once:
+        results = scheduler.run_once()
+        print(json.dumps(results, indent=2))
+        failed = any(f['status'] == 'failed' for r in results for f in r['files']) or any('error' in r for r in results)
+        return 1 if failed else 0
+
+    scheduler.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        scheduler.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
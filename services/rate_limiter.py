@@ -0,0 +1,189 @@
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import fcntl  # Disponible en Linux/macOS (gunicorn)
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+# Prioridades (menor = antes)
+PRIORITY_EXACT = 0
+PRIORITY_AUTOCOMPLETE = 1
+
+
+class _Ticket:
+    """Petición en espera de un token"""
+
+    __slots__ = ('priority', 'seq', 'group', 'deadline', 'enqueued_at', 'cancelled')
+
+    def __init__(self, priority: int, seq: int, group: Optional[str], deadline: float):
+        self.priority = priority
+        self.seq = seq
+        self.group = group
+        self.deadline = deadline
+        self.enqueued_at = time.monotonic()
+        self.cancelled = False
+
+    def __lt__(self, other: '_Ticket') -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class RateLimiter:
+    """
+    Limitador de tasa tipo token bucket con cola de prioridad.
+
+    Las peticiones esperan en una cola ordenada por prioridad y orden de llegada;
+    solo la primera de la cola puede tomar un token. Una petición nueva con el
+    mismo `group` (p. ej. el autocompletado de un mismo cliente) cancela las que
+    ese grupo tenía en cola, que ya no interesan. Las que superan su espera
+    máxima se descartan.
+
+    Con `state_path` el cubo de tokens se guarda en un archivo protegido con
+    fcntl, de modo que todos los workers de gunicorn comparten el mismo límite.
+    """
+
+    def __init__(self, rate_per_second: float = 1.0, burst: int = 1, state_path: Optional[str] = None):
+        self.rate = rate_per_second
+        self.burst = burst
+        self.state_path = state_path if fcntl is not None else None
+        self._tokens = float(burst)
+        self._updated = time.time()
+        self._queue = []
+        self._groups: Dict[str, _Ticket] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._waits = deque(maxlen=500)
+        self.queued = 0
+        self.max_queued = 0
+        self.granted = 0
+        self.cancelled = 0
+        self.timed_out = 0
+        if self.state_path:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+
+    def acquire(self, priority: int = PRIORITY_EXACT, group: Optional[str] = None,
+                max_wait_seconds: float = 10.0) -> bool:
+        """
+        Espera un token respetando la prioridad
+
+        Args:
+            priority: Prioridad de la petición (menor = antes)
+            group: Grupo cuyas peticiones anteriores en cola se cancelan
+            max_wait_seconds: Espera máxima antes de desistir
+
+        Returns:
+            True si se obtuvo el token; False si se canceló o se agotó la espera
+        """
+        with self._cond:
+            ticket = _Ticket(priority, next(self._seq), group, time.monotonic() + max_wait_seconds)
+            if group is not None:
+                previous = self._groups.get(group)
+                if previous is not None:
+                    self._cancel(previous)
+                    self.cancelled += 1
+                    self._cond.notify_all()
+                self._groups[group] = ticket
+            heapq.heappush(self._queue, ticket)
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+
+            while True:
+                if ticket.cancelled:
+                    return False
+                self._drop_cancelled_head()
+                retry_in = None
+                if self._queue[0] is ticket:
+                    retry_in = self._take_token()
+                    if retry_in <= 0:
+                        heapq.heappop(self._queue)
+                        self._finish(ticket)
+                        self.granted += 1
+                        self._waits.append(time.monotonic() - ticket.enqueued_at)
+                        self._cond.notify_all()
+                        return True
+                remaining = ticket.deadline - time.monotonic()
+                if remaining <= 0:
+                    self._cancel(ticket)
+                    self.timed_out += 1
+                    self._cond.notify_all()
+                    return False
+                self._cond.wait(min(retry_in, remaining) if retry_in is not None else remaining)
+
+    def _cancel(self, ticket: _Ticket) -> None:
+        """Marca la petición como cancelada; se retira de la cola al llegar a la cabeza"""
+        if not ticket.cancelled:
+            ticket.cancelled = True
+            self._finish(ticket)
+
+    def _finish(self, ticket: _Ticket) -> None:
+        self.queued -= 1
+        if ticket.group is not None and self._groups.get(ticket.group) is ticket:
+            del self._groups[ticket.group]
+
+    def _drop_cancelled_head(self) -> None:
+        while self._queue and self._queue[0].cancelled:
+            heapq.heappop(self._queue)
+
+    def _take_token(self) -> float:
+        """Toma un token si hay; si no, devuelve los segundos hasta el siguiente"""
+        if self.state_path:
+            return self._take_shared_token()
+        now = time.time()
+        self._tokens, wait = self._refill_and_take(self._tokens, self._updated, now)
+        self._updated = now
+        return wait
+
+    def _refill_and_take(self, tokens: float, updated: float, now: float) -> Tuple[float, float]:
+        tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            return tokens - 1, 0.0
+        return tokens, (1 - tokens) / self.rate
+
+    def _take_shared_token(self) -> float:
+        """Igual que `_take_token`, con el estado del cubo en un archivo compartido"""
+        with open(self.state_path, 'a+') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    state = json.loads(f.read() or '{}')
+                except ValueError:
+                    state = {}
+                now = time.time()
+                tokens, wait = self._refill_and_take(
+                    float(state.get('tokens', self.burst)), float(state.get('updated', now)), now
+                )
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps({'tokens': tokens, 'updated': now}))
+                f.flush()
+                return wait
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas de la cola y tiempos de espera (últimas 500 peticiones atendidas)"""
+        with self._cond:
+            waits = sorted(self._waits)
+        return {
+            'rate_per_second': self.rate,
+            'burst': self.burst,
+            'shared': self.state_path is not None,
+            'queue_depth': self.queued,
+            'max_queue_depth': self.max_queued,
+            'granted': self.granted,
+            'cancelled': self.cancelled,
+            'timed_out': self.timed_out,
+            'wait_ms': {
+                'avg': round(sum(waits) / len(waits) * 1000, 1) if waits else None,
+                'p50': round(waits[len(waits) // 2] * 1000, 1) if waits else None,
+                'p95': round(waits[int(len(waits) * 0.95)] * 1000, 1) if waits else None,
+                'max': round(waits[-1] * 1000, 1) if waits else None
+            }
+        }
@@ -0,0 +1,199 @@
+import gzip
+import json
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import msgpack  # Opcional: respuestas MessagePack
+except ImportError:  # pragma: no cover - dependencia opcional
+    msgpack = None
+
+try:
+    import pyarrow as pa  # Opcional: respuestas Arrow IPC
+except ImportError:  # pragma: no cover - dependencia opcional
+    pa = None
+
+try:
+    import brotli  # Opcional: compresión br
+except ImportError:  # pragma: no cover - dependencia opcional
+    brotli = None
+
+MEDIA_TYPES = {
+    'json': 'application/json',
+    'msgpack': 'application/msgpack',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+# Alias aceptados en la cabecera Accept
+ACCEPT_ALIASES = {
+    'application/json': 'json',
+    'application/msgpack': 'msgpack',
+    'application/x-msgpack': 'msgpack',
+    'application/vnd.apache.arrow.stream': 'arrow'
+}
+
+
+def available_formats() -> Dict[str, bool]:
+    """Formatos de respuesta y compresiones disponibles en este entorno"""
+    return {
+        'json': True,
+        'msgpack': msgpack is not None,
+        'arrow': pa is not None,
+        'gzip': True,
+        'br': brotli is not None
+    }
+
+
+def _datetime_strings(values: np.ndarray) -> list:
+    """Instantes datetime64 como texto ISO en UTC ('...Z')"""
+    return np.char.add(np.datetime_as_string(values.astype('datetime64[s]'), unit='s'), 'Z').tolist()
+
+
+def json_default(obj: Any) -> Any:
+    """Conversión de tipos numpy para json.dumps (arreglos y escalares)"""
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind == 'M':
+            return _datetime_strings(obj)
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class NumpyJSONProvider(DefaultJSONProvider):
+    """Proveedor JSON de Flask que admite los arreglos numpy de las respuestas de CO2"""
+
+    @staticmethod
+    def default(obj: Any) -> Any:
+        try:
+            return json_default(obj)
+        except TypeError:
+            return DefaultJSONProvider.default(obj)
+
+
+def pack_array(values: np.ndarray) -> Dict[str, Any]:
+    """
+    Arreglo numpy como buffer binario autodescrito: {"dtype", "shape", "data"}
+
+    Los reales se empaquetan como float32 little-endian y los instantes como
+    datetime64[s]; el cliente los reconstruye con np.frombuffer(data, dtype).reshape(shape)
+    """
+    if values.dtype.kind == 'f':
+        values = values.astype('<f4', copy=False)
+    elif values.dtype.kind == 'M':
+        values = values.astype('<M8[s]', copy=False)
+    elif values.dtype.kind in 'iub':
+        values = values.astype(values.dtype.newbyteorder('<'), copy=False)
+    else:
+        return {'dtype': 'list', 'shape': list(values.shape), 'data': values.tolist()}
+    return {'dtype': values.dtype.str, 'shape': list(values.shape), 'data': np.ascontiguousarray(values).tobytes()}
+
+
+def _msgpack_default(obj: Any) -> Any:
+    if isinstance(obj, np.ndarray):
+        return pack_array(obj)
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return str(obj)
+
+
+def encode_msgpack(body: Dict[str, Any]) -> bytes:
+    """Cuerpo de respuesta como MessagePack con los arreglos empaquetados en binario"""
+    return msgpack.packb(body, default=_msgpack_default, use_bin_type=True)
+
+
+def _float32_column(values) -> Any:
+    return pa.array(np.asarray(values, dtype=np.float32))
+
+
+def _point_table(rows) -> Any:
+    """Tabla Arrow de resultados por punto; los campos anidados restantes van como JSON por fila"""
+    flat = ('city', 'coordinates', 'co2_data', 'co2_status', 'distance_km')
+    offsets = np.zeros(len(rows) + 1, dtype=np.int32)
+    values = []
+    for i, row in enumerate(rows):
+        row_values = np.asarray(row['co2_data']['values_ppm'], dtype=np.float32).ravel()
+        values.append(row_values)
+        offsets[i + 1] = offsets[i] + row_values.size
+    flat_values = np.concatenate(values) if values else np.empty(0, dtype=np.float32)
+    return pa.table({
+        'city': pa.array([r['city'] for r in rows], type=pa.string()),
+        'target_lat': pa.array([r['coordinates']['target_lat'] for r in rows], type=pa.float64()),
+        'target_lon': pa.array([r['coordinates']['target_lon'] for r in rows], type=pa.float64()),
+        'actual_lat': pa.array([r['coordinates']['actual_lat'] for r in rows], type=pa.float64()),
+        'actual_lon': pa.array([r['coordinates']['actual_lon'] for r in rows], type=pa.float64()),
+        'distance_km': pa.array([r['distance_km'] for r in rows], type=pa.float64()),
+        'average_ppm': _float32_column([r['co2_data']['average_ppm'] for r in rows]),
+        'min_ppm': _float32_column([r['co2_data']['min_ppm'] for r in rows]),
+        'max_ppm': _float32_column([r['co2_data']['max_ppm'] for r in rows]),
+        'values_ppm': pa.ListArray.from_arrays(pa.array(offsets), pa.array(flat_values)),
+        'status_label': pa.array([r['co2_status']['label'] for r in rows], type=pa.string()),
+        'status_color': pa.array([r['co2_status']['color'] for r in rows], type=pa.string()),
+        'buffer_radius': pa.array([r['co2_status']['buffer_radius'] for r in rows], type=pa.int64()),
+        'details': pa.array([json.dumps({k: v for k, v in r.items() if k not in flat}, default=json_default)
+                             for r in rows], type=pa.string())
+    })
+
+
+def encode_arrow(body: Dict[str, Any]) -> bytes:
+    """
+    Cuerpo de respuesta como stream Arrow IPC
+
+    La parte tabular (la serie de `data.series`, o una fila por punto en las
+    respuestas de punto y de lote) va como columnas; el resto del cuerpo se
+    guarda como JSON en los metadatos del esquema (clave 'body').
+    """
+    data = body.get('data')
+    rest = dict(body)
+    if isinstance(data, dict) and isinstance(data.get('series'), dict):
+        series = data['series']
+        timestamps = np.asarray(series['timestamps']).astype('datetime64[s]')
+        table = pa.table({
+            'timestamp': pa.array(timestamps.astype(np.int64), type=pa.timestamp('s', tz='UTC')),
+            'ppm': _float32_column(series['ppm'])
+        })
+        rest['data'] = {k: v for k, v in data.items() if k != 'series'}
+    elif isinstance(data, dict) and 'co2_data' in data:
+        table = _point_table([data])
+        rest.pop('data')
+    elif isinstance(data, list):
+        table = _point_table(data)
+        rest.pop('data')
+    else:
+        table = pa.table({})
+    table = table.replace_schema_metadata({'body': json.dumps(rest, default=json_default)})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def negotiate_format(requested: Optional[str], accept_mimetypes) -> Optional[str]:
+    """
+    Formato de respuesta: ?format= tiene prioridad sobre la cabecera Accept
+
+    Returns:
+        'json', 'msgpack', 'arrow' o None si se pidió un formato desconocido
+    """
+    if requested:
+        requested = requested.strip().lower()
+        return requested if requested in MEDIA_TYPES else None
+    best = accept_mimetypes.best_match(list(ACCEPT_ALIASES), default='application/json')
+    # Un Accept genérico (*/*) no debe preferir un formato binario sobre JSON
+    if accept_mimetypes[best] <= accept_mimetypes['application/json']:
+        return 'json'
+    return ACCEPT_ALIASES[best]
+
+
+def compress(payload: bytes, accept_encodings, min_bytes: int = 1024) -> Tuple[bytes, Optional[str]]:
+    """Comprime con brotli o gzip según Accept-Encoding; las respuestas pequeñas se envían tal cual"""
+    if len(payload) < min_bytes:
+        return payload, None
+    if brotli is not None and accept_encodings['br']:
+        return brotli.compress(payload, quality=5), 'br'
+    if accept_encodings['gzip']:
+        return gzip.compress(payload, compresslevel=6), 'gzip'
+    return payload, None
@@ -0,0 +1,123 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import fcntl  # Disponible en Linux/macOS (gunicorn)
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+class _Call:
+    """Estado de una ejecución en curso compartida por todos sus esperadores"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalescencia de peticiones idénticas en curso ("single-flight").
+
+    Dentro del proceso, la primera llamada con una clave ejecuta la función y las
+    llamadas concurrentes con la misma clave esperan y reciben el mismo resultado.
+    Entre procesos (workers de gunicorn) se usa un bloqueo de archivo por clave en
+    `lock_dir`: el segundo proceso espera a que termine el primero y, al obtener el
+    bloqueo, la función puede comprobar la caché antes de repetir el trabajo.
+    """
+
+    def __init__(self, lock_dir: Optional[str] = None):
+        self.lock_dir = lock_dir
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.coalesced = 0
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key: str, fn: Callable[[], Any], file_lock: bool = False) -> Any:
+        """
+        Ejecuta `fn` una sola vez por clave entre las llamadas concurrentes
+
+        Args:
+            key: Clave que identifica la petición
+            fn: Función sin argumentos que produce el resultado
+            file_lock: Si es True, además serializa la ejecución entre procesos
+
+        Returns:
+            El resultado de `fn` (compartido con todos los esperadores)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if file_lock:
+                with self.file_lock(key):
+                    call.result = fn()
+            else:
+                call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    @contextmanager
+    def file_lock(self, key: str):
+        """
+        Bloqueo exclusivo entre procesos asociado a la clave (no-op sin fcntl)
+
+        El archivo de bloqueo se elimina al terminar mientras aún se mantiene el
+        bloqueo; quien esperaba sobre ese archivo ya desvinculado lo detecta al
+        obtenerlo (el inodo ya no coincide con la ruta) y vuelve a abrir uno nuevo.
+        """
+        if fcntl is None or not self.lock_dir:
+            yield
+            return
+        path = os.path.join(self.lock_dir, f"{key}.lock")
+        while True:
+            f = open(path, 'a')
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    current = os.stat(path)
+                except FileNotFoundError:
+                    current = None
+                if current is not None and os.path.samestat(current, os.fstat(f.fileno())):
+                    break
+            except BaseException:
+                f.close()
+                raise
+            f.close()
+        try:
+            yield
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            f.close()
+
+    def stats(self) -> Dict[str, int]:
+        """Claves en ejecución en este proceso y llamadas coalescidas desde el arranque"""
+        with self._lock:
+            return {'in_flight': len(self._calls), 'coalesced': self.coalesced}
@@ -0,0 +1,87 @@
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from services.geo_utils import chord_to_km, to_unit_vectors
+
+try:
+    from scipy.spatial import cKDTree  # Opcional: acelera índices muy grandes
+except ImportError:  # pragma: no cover - scipy no es dependencia obligatoria
+    cKDTree = None
+
+
+class SpatialIndex:
+    """
+    Índice espacial de ciudades sobre la esfera unitaria.
+
+    Cada ciudad se guarda como vector 3D; la distancia euclídea entre vectores
+    (cuerda) es monótona con la distancia de círculo máximo, así que los k
+    vecinos por cuerda son los k más cercanos sobre la Tierra, sin problemas en
+    el antimeridiano ni cerca de los polos. Con scipy instalado se usa un KD-tree;
+    si no, un producto vectorizado con numpy (submilisegundo hasta ~10^5 lugares).
+    """
+
+    def __init__(self, cities: Iterable[Dict[str, Any]] = ()):
+        self._cities: List[Dict[str, Any]] = []
+        self._vectors = np.empty((0, 3))
+        self._tree = None
+        self._pending: List[Dict[str, Any]] = []
+        self._seen = set()
+        self._lock = threading.Lock()
+        self.add_many(cities)
+
+    def __len__(self) -> int:
+        return len(self._cities) + len(self._pending)
+
+    def add_many(self, cities: Iterable[Dict[str, Any]]) -> None:
+        """Añade ciudades; el índice se reconstruye en la siguiente consulta"""
+        with self._lock:
+            for city in cities:
+                identity = (city.get('name'), round(float(city['lat']), 3), round(float(city['lon']), 3))
+                if identity not in self._seen:
+                    self._seen.add(identity)
+                    self._pending.append(city)
+
+    def _rebuild(self) -> None:
+        self._cities.extend(self._pending)
+        self._pending = []
+        self._vectors = to_unit_vectors([c['lat'] for c in self._cities], [c['lon'] for c in self._cities])
+        self._tree = cKDTree(self._vectors) if cKDTree is not None and len(self._cities) > 1000 else None
+
+    def nearest(self, lat: float, lon: float, k: int = 1, max_km: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Devuelve las k ciudades más cercanas al punto con su distancia
+
+        Args:
+            lat: Latitud
+            lon: Longitud
+            k: Número de ciudades
+            max_km: Distancia máxima (opcional)
+
+        Returns:
+            Lista de ciudades (copias) con `distance_km`, de la más cercana a la más lejana
+        """
+        with self._lock:
+            if self._pending:
+                self._rebuild()
+            count = len(self._cities)
+            if count == 0 or k <= 0:
+                return []
+            k = min(k, count)
+            query = to_unit_vectors(lat, lon)
+            if self._tree is not None:
+                chords, idx = self._tree.query(query, k=k)
+                chords, idx = np.atleast_1d(chords), np.atleast_1d(idx)
+            else:
+                chord_sq = np.sum((self._vectors - query) ** 2, axis=1)
+                idx = np.argpartition(chord_sq, k - 1)[:k] if k < count else np.arange(count)
+                idx = idx[np.argsort(chord_sq[idx])]
+                chords = np.sqrt(chord_sq[idx])
+            distances = chord_to_km(chords)
+            results = []
+            for i, distance in zip(idx, distances):
+                if max_km is not None and distance > max_km:
+                    break
+                results.append(dict(self._cities[int(i)], distance_km=round(float(distance), 2)))
+            return results
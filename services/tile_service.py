@@ -0,0 +1,175 @@
+import struct
+import threading
+import zlib
+from typing import Optional, Tuple
+
+import numpy as np
+
+from config.co2_thresholds import CO2_THRESHOLDS
+from services.data_cache import DataCache
+from services.geo_utils import nearest_axis_indices
+
+TILE_SIZE = 256
+
+# Se incrementa al cambiar el renderizado para invalidar teselas y ETags anteriores
+RENDER_VERSION = 1
+
+
+def threshold_lut(alpha: int = 170) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Tabla de colores RGBA de los umbrales de CO2
+
+    Returns:
+        (límites superiores de cada clase salvo la última, LUT uint8 de forma (clases + 1, 4));
+        la última fila es transparente (sin datos)
+    """
+    classes = [CO2_THRESHOLDS['good'], CO2_THRESHOLDS['acceptable'], CO2_THRESHOLDS['dangerous']]
+    bounds = np.array([c['max'] for c in classes[:-1]], dtype=float)
+    lut = np.zeros((len(classes) + 1, 4), dtype=np.uint8)
+    for i, c in enumerate(classes):
+        hex_color = c['color'].lstrip('#')
+        lut[i] = [int(hex_color[j:j + 2], 16) for j in (0, 2, 4)] + [alpha]
+    return bounds, lut
+
+
+def encode_png(rgba: np.ndarray) -> bytes:
+    """Codifica una imagen RGBA uint8 (alto x ancho x 4) como PNG usando solo zlib"""
+    height, width, _ = rgba.shape
+    # Cada fila va precedida del tipo de filtro (0 = ninguno)
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgba.reshape(height, width * 4)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)) + chunk(b'IEND', b''))
+
+
+def tile_pixel_centers(z: int, x: int, y: int, size: int = TILE_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """Latitudes (filas) y longitudes (columnas) de los centros de píxel de una tesela Web Mercator"""
+    n = 2 ** z
+    offsets = (np.arange(size) + 0.5) / size
+    lons = (x + offsets) / n * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + offsets) / n))))
+    return lats, lons
+
+
+class TileRenderer:
+    """
+    Teselas PNG del campo de CO2 coloreadas con los umbrales de config/co2_thresholds.py.
+
+    Cada píxel toma la celda CAMS más cercana y su clase se traduce a color con
+    una tabla (LUT) en una sola operación de numpy. Las teselas se guardan en
+    disco con una clave derivada del campo, la tesela y la versión del
+    renderizado, que también sirve de ETag: la misma tesela nunca se recalcula y
+    el navegador puede revalidarla con If-None-Match.
+    """
+
+    def __init__(self, grid_cache, cache: DataCache, alpha: int = 170, evict_every: int = 256):
+        self.grid_cache = grid_cache
+        self.cache = cache
+        self.alpha = alpha
+        self.bounds, self.lut = threshold_lut(alpha)
+        # Las teselas fuera de la malla comparten un único PNG transparente (no se guardan)
+        self.empty_png = encode_png(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8))
+        # El desalojo recorre todo el directorio: se hace en segundo plano cada `evict_every` escrituras
+        self.evict_every = max(1, evict_every)
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        self._evicting = threading.Lock()
+
+    def etag(self, grid_key: str, z: int, x: int, y: int, hour: Optional[str]) -> str:
+        """ETag (y clave de caché) de una tesela"""
+        return DataCache.make_key({
+            'grid': grid_key, 'z': z, 'x': x, 'y': y, 'hour': hour,
+            'alpha': self.alpha, 'version': RENDER_VERSION
+        })
+
+    def render(self, grid_key: str, z: int, x: int, y: int, hour: Optional[str] = None) -> Optional[Tuple[bytes, str]]:
+        """
+        Devuelve (PNG, ETag) de la tesela, desde la caché de disco si ya existe
+
+        Returns:
+            None si el campo no está disponible
+        """
+        etag = self.etag(grid_key, z, x, y, hour)
+        path = self.cache.get(etag, '.png')
+        if path is not None:
+            try:
+                with open(path, 'rb') as f:
+                    return f.read(), etag
+            except OSError:
+                pass
+
+        entry = self.grid_cache.get(grid_key)
+        if entry is None:
+            return None
+        rgba = self._render_rgba(entry, self._select_field(entry, hour), z, x, y)
+        if rgba is None:
+            return self.empty_png, etag
+        png = encode_png(rgba)
+        self.cache.write_atomic(etag, '.png', lambda f: f.write(png), evict=False)
+        self._after_write()
+        return png, etag
+
+    def _after_write(self) -> None:
+        """Lanza el desalojo de la caché de teselas cada `evict_every` escrituras"""
+        with self._writes_lock:
+            self._writes += 1
+            due = self._writes % self.evict_every == 0
+        if due and self._evicting.acquire(blocking=False):
+            threading.Thread(target=self._evict, name='tile-evict', daemon=True).start()
+
+    def _evict(self) -> None:
+        try:
+            self.cache.evict()
+        except Exception as e:
+            print(f"⚠️ Error desalojando teselas: {e}")
+        finally:
+            self._evicting.release()
+
+    @staticmethod
+    def _select_field(entry, hour: Optional[str]) -> np.ndarray:
+        """
+        Campo 2D (lat, lon) de la hora de pronóstico pedida, o el promedio de todas
+        las horas si no se indica o no se encuentra
+        """
+        values = np.asarray(entry.values, dtype=float)
+        leading = values.shape[:-2]
+        hours = [str(h) for h in entry.meta.get('leadtime_hours', [])]
+        if hour is not None and hour in hours:
+            dims = entry.meta.get('dims', [])[:-2]
+            # Dimensión de pasos de pronóstico: por nombre o, si no, por tamaño
+            axis = next((i for i, d in enumerate(dims) if d in ('step', 'forecast_period', 'leadtime_hour')), None)
+            if axis is None:
+                axis = next((i for i, size in enumerate(leading) if size == len(hours)), None)
+            if axis is not None and leading[axis] == len(hours):
+                values = np.take(values, hours.index(hour), axis=axis)
+        return values.reshape((-1,) + values.shape[-2:]).mean(axis=0)
+
+    def _render_rgba(self, entry, field: np.ndarray, z: int, x: int, y: int) -> Optional[np.ndarray]:
+        """Imagen RGBA de la tesela, o None si queda entera fuera de la malla"""
+        lats, lons = tile_pixel_centers(z, x, y)
+
+        # Píxeles fuera de la malla (media celda de margen) quedan transparentes
+        half_lat = abs(entry.dlat or 0) / 2
+        half_lon = abs(entry.dlon or 0) / 2
+        inside_lat = (lats >= entry.lat_axis.min() - half_lat) & (lats <= entry.lat_axis.max() + half_lat)
+        inside_lon = (lons >= entry.lon_axis.min() - half_lon) & (lons <= entry.lon_axis.max() + half_lon)
+
+        if not inside_lat.any() or not inside_lon.any():
+            return None
+        rgba = np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8)
+
+        ilat = nearest_axis_indices(entry.lat_axis, lats)
+        ilon = nearest_axis_indices(entry.lon_axis, lons)
+        values = field[ilat[:, np.newaxis], ilon[np.newaxis, :]]
+
+        # Clase por umbral (mismo criterio que get_co2_status: límites inclusivos)
+        classes = np.searchsorted(self.bounds, values, side='left')
+        classes[np.isnan(values)] = len(self.lut) - 1
+        classes[~(inside_lat[:, np.newaxis] & inside_lon[np.newaxis, :])] = len(self.lut) - 1
+        rgba[:] = self.lut[classes]
+        return rgba
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class MemoryBackend:
+    """Almacenamiento en memoria del proceso con límite de entradas (LRU)"""
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._data: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                self._data.move_to_end(key)
+            return item
+
+    def set(self, key: str, stored_at: float, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (stored_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class DiskBackend:
+    """
+    Almacenamiento compartido en disco (un JSON por clave, escrituras atómicas),
+    para que los workers de gunicorn compartan los aciertos
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        try:
+            with open(self._path(key), 'r') as f:
+                item = json.load(f)
+            return item['stored_at'], item['value']
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def set(self, key: str, stored_at: float, value: Any) -> None:
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix='.ttl.', suffix='.tmp', dir=self.directory)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'key': key, 'stored_at': stored_at, 'value': value}, f)
+            os.replace(tmp_path, self._path(key))
+        except Exception as e:
+            print(f"⚠️ No se pudo escribir en la caché compartida: {e}")
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+class TTLCache:
+    """
+    Caché con expiración (TTL) y stale-while-revalidate.
+
+    Una entrada fresca se devuelve directamente. Una entrada vencida pero dentro
+    de la ventana `stale_seconds` también se devuelve de inmediato, y se lanza una
+    sola actualización en segundo plano por clave. Fuera de esa ventana se consulta
+    el origen de forma síncrona. Usa la memoria del proceso y, opcionalmente, un
+    backend en disco compartido entre procesos.
+    """
+
+    def __init__(self, memory: Optional[MemoryBackend] = None, shared: Optional[DiskBackend] = None,
+                 refresh_workers: int = 2):
+        self.memory = memory or MemoryBackend()
+        self.shared = shared
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix='ttl-refresh')
+        self.stats = {'hit': 0, 'stale': 0, 'miss': 0}
+
+    def get_or_fetch(self, key: str, ttl_seconds: float, stale_seconds: float,
+                     fetch: Callable[[], Tuple[Any, Optional[Any]]]) -> Tuple[Any, Optional[Any], str]:
+        """
+        Devuelve el valor de la clave, consultando el origen si hace falta
+
+        Args:
+            key: Clave de la caché
+            ttl_seconds: Tiempo durante el que la entrada es fresca
+            stale_seconds: Ventana adicional en la que se sirve vencida mientras se revalida
+            fetch: Función que devuelve (valor, error); solo se guardan los valores sin error
+
+        Returns:
+            (valor, error, estado) con estado 'hit', 'stale' o 'miss'
+        """
+        item = self._lookup(key)
+        now = time.time()
+        if item is not None:
+            stored_at, value = item
+            age = now - stored_at
+            if age <= ttl_seconds:
+                self._count('hit')
+                return value, None, 'hit'
+            if age <= ttl_seconds + stale_seconds:
+                self._count('stale')
+                self._refresh_in_background(key, fetch)
+                return value, None, 'stale'
+
+        self._count('miss')
+        value, error = fetch()
+        if error is None:
+            self._store(key, value)
+        return value, error, 'miss'
+
+    def _count(self, state: str) -> None:
+        with self._lock:
+            self.stats[state] += 1
+
+    def _lookup(self, key: str) -> Optional[Tuple[float, Any]]:
+        item = self.memory.get(key)
+        if item is None and self.shared is not None:
+            item = self.shared.get(key)
+            if item is not None:
+                self.memory.set(key, *item)
+        elif item is not None and self.shared is not None:
+            # Otro worker pudo haber revalidado la entrada
+            shared_item = self.shared.get(key)
+            if shared_item is not None and shared_item[0] > item[0]:
+                self.memory.set(key, *shared_item)
+                item = shared_item
+        return item
+
+    def _store(self, key: str, value: Any) -> None:
+        stored_at = time.time()
+        self.memory.set(key, stored_at, value)
+        if self.shared is not None:
+            self.shared.set(key, stored_at, value)
+
+    def _refresh_in_background(self, key: str, fetch: Callable[[], Tuple[Any, Optional[Any]]]) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                value, error = fetch()
+                if error is None:
+                    self._store(key, value)
+            except Exception as e:
+                print(f"⚠️ Error revalidando {key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(refresh)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Contadores de la caché"""
+        with self._lock:
+            return dict(self.stats, shared=self.shared is not None)
@@ -0,0 +1,125 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+
+from services.geo_utils import geohash_decode, geohash_encode
+from services.http_client import HttpClient
+from services.ttl_cache import DiskBackend, MemoryBackend, TTLCache
+
+
+class WeatherService:
+    """
+    Proxy de OpenWeatherMap: clima actual, pronóstico y calidad del aire.
+
+    Las tres consultas se lanzan en paralelo sobre la capa HTTP compartida
+    (conexiones keep-alive reutilizadas entre peticiones, reintentos con backoff),
+    cada una con su propio timeout. Si alguna falla, se devuelven las demás y se informa el error de esa
+    parte para que la respuesta pueda marcarse como parcial.
+
+    Las respuestas se guardan en una caché TTL por tipo de consulta y celda
+    geohash: clics cercanos (misma celda) o repetidos no vuelven a consultar
+    OpenWeatherMap. Cada tipo tiene su propio TTL y una ventana de
+    stale-while-revalidate.
+    """
+
+    BASE_URL = 'https://api.openweathermap.org/data/2.5'
+
+    # Nombre de la parte -> (ruta, parámetros extra)
+    UPSTREAMS = {
+        'weather': ('weather', {'units': 'metric', 'lang': 'es'}),
+        'forecast': ('forecast', {'units': 'metric', 'lang': 'es'}),
+        'air_pollution': ('air_pollution', {})
+    }
+
+    # TTL y ventana stale-while-revalidate por defecto (segundos)
+    DEFAULT_TTLS = {
+        'weather': (600, 600),
+        'forecast': (3600, 3600),
+        'air_pollution': (1800, 1800)
+    }
+
+    def __init__(self, max_workers: int = 8, cache_dir: Optional[str] = None, http: Optional[HttpClient] = None):
+        self.http = http or HttpClient.from_env()
+        self.retries = int(os.getenv('OWM_RETRIES', '1'))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='owm')
+        self.timeouts = {
+            name: float(os.getenv(f'OWM_TIMEOUT_{name.upper()}', os.getenv('OWM_TIMEOUT', '10')))
+            for name in self.UPSTREAMS
+        }
+        self.geohash_precision = int(os.getenv('WEATHER_CACHE_GEOHASH_PRECISION', '6'))
+        self.ttls = {
+            name: (
+                float(os.getenv(f'WEATHER_CACHE_TTL_{name.upper()}', ttl)),
+                float(os.getenv(f'WEATHER_CACHE_STALE_{name.upper()}', stale))
+            )
+            for name, (ttl, stale) in self.DEFAULT_TTLS.items()
+        }
+        self.cache = TTLCache(
+            memory=MemoryBackend(int(os.getenv('WEATHER_CACHE_MAX_ENTRIES', '5000'))),
+            shared=DiskBackend(cache_dir) if cache_dir else None
+        )
+
+    def get_weather(self, lat: float, lon: float, api_key: str) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]], Dict[str, str]]:
+        """
+        Consulta en paralelo las tres APIs de OpenWeatherMap (o las sirve desde caché)
+
+        Args:
+            lat: Latitud
+            lon: Longitud
+            api_key: API key de OpenWeatherMap
+
+        Returns:
+            (partes obtenidas por nombre, errores por nombre con 'status' y 'error',
+             estado de caché por nombre: 'hit', 'stale' o 'miss')
+        """
+        # Todas las consultas de una celda usan su centro, así el valor cacheado es el de la celda
+        cell = geohash_encode(lat, lon, self.geohash_precision)
+        cell_lat, cell_lon = geohash_decode(cell)
+        base_params = {'lat': round(cell_lat, 5), 'lon': round(cell_lon, 5), 'appid': api_key}
+        futures = {
+            name: self._executor.submit(self._fetch_cached, name, cell, base_params)
+            for name in self.UPSTREAMS
+        }
+
+        parts = {}
+        errors = {}
+        cache_status = {}
+        for name, future in futures.items():
+            data, error, status = future.result()
+            cache_status[name] = status
+            if error is None:
+                parts[name] = data
+            else:
+                errors[name] = error
+        return parts, errors, cache_status
+
+    def _fetch_cached(self, name: str, cell: str, base_params: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]], str]:
+        """Consulta una de las APIs a través de la caché TTL de la celda"""
+        ttl, stale = self.ttls[name]
+        return self.cache.get_or_fetch(
+            f"{name}:{cell}", ttl, stale,
+            lambda: self._fetch(name, base_params)
+        )
+
+    def _fetch(self, name: str, base_params: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Consulta una de las APIs y devuelve (json, None) o (None, error)"""
+        path, extra = self.UPSTREAMS[name]
+        try:
+            resp = self.http.get(
+                f"{self.BASE_URL}/{path}", params={**base_params, **extra},
+                timeout=self.timeouts[name], retries=self.retries
+            )
+            resp.raise_for_status()
+            return resp.json(), None
+        except requests.HTTPError as e:
+            try:
+                detail = e.response.json()
+            except Exception:
+                detail = str(e)
+            return None, {'status': e.response.status_code, 'error': detail}
+        except requests.Timeout:
+            return None, {'status': 504, 'error': f'Timeout consultando {name}'}
+        except Exception as e:
+            return None, {'status': 502, 'error': str(e)}
@@ -0,0 +1,71 @@
+"""
+Concurrencia de CO2Service contra el ADS simulado (tools/fake_ads_server.py)
+
+Cada fecha tiene un resultado fijo en el servidor (éxito o un tipo de fallo).
+Muchas llamadas simultáneas mezclan fechas, y cada una debe informar su propio
+error_kind; un estado de error compartido entre hilos (_last_error) haría que
+unas llamadas recibieran el error de otras.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import pytest
+
+from tools.fake_ads_server import FakeADS, serve_in_thread, write_cdsapirc
+
+# Tipo de fallo del servidor -> error_kind esperado en la respuesta de CO2Service
+EXPECTED_KINDS = {
+    None: None,
+    'auth': 'auth_error',
+    'terms': 'terms_error',
+    'quota': 'quota_error',
+    'job': 'api_error',
+    'truncate': 'download_incomplete'
+}
+
+DATES = [(date(2025, 9, 1) + timedelta(days=i)).isoformat() for i in range(12)]
+PLAN = {d: kind for d, kind in zip(DATES, [k for k in EXPECTED_KINDS] * 2) if kind is not None}
+
+
+@pytest.fixture
+def fake_ads(tmp_path):
+    fake = FakeADS(str(tmp_path / 'ads'), queue_seconds=0, run_seconds=0.2, max_running=4,
+                   retry_after=0, failure_plan=PLAN)
+    server, url = serve_in_thread(fake)
+    yield fake, url
+    server.shutdown()
+
+
+@pytest.mark.parametrize('client_mode', ['cdsapi', 'async'])
+def test_concurrent_calls_report_their_own_error_kind(fake_ads, tmp_path, monkeypatch, client_mode):
+    fake, url = fake_ads
+    monkeypatch.setenv('CDSAPI_RC', write_cdsapirc(str(tmp_path / 'cdsapirc'), url, fake.key))
+    monkeypatch.setenv('CO2_DATA_DIR', str(tmp_path / 'data'))
+    monkeypatch.setenv('CO2_CDS_CLIENT', client_mode)
+    monkeypatch.setenv('CO2_CDS_POLL_SECONDS', '0.1')
+    monkeypatch.setenv('CO2_DOWNLOAD_MAX_ATTEMPTS', '2')
+    monkeypatch.setenv('CO2_DOWNLOAD_BACKOFF_BASE_SECONDS', '0.05')
+    monkeypatch.setenv('CO2_DOWNLOAD_DEADLINE_SECONDS', '60')
+    from services.co2_service import CO2Service
+
+    service = CO2Service()
+    # Cada fecha se pide varias veces y desde ciudades distintas, intercalando éxitos y fallos
+    calls = [(d, city) for _ in range(3) for city in (('Lima', -12.0464, -77.0428), ('Cusco', -13.5319, -71.9675))
+             for d in DATES]
+
+    def run(call):
+        day, (name, lat, lon) = call
+        return day, service.get_co2_data_for_city(name, lat, lon, day)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(run, calls))
+
+    assert len(results) == len(calls)
+    for day, result in results:
+        expected = EXPECTED_KINDS[PLAN.get(day)]
+        assert result.get('error_kind') == expected, (day, result)
+        if expected is None:
+            assert result['co2_data']['average_ppm'] > 0
+        else:
+            assert result['error']
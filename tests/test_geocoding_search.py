@@ -0,0 +1,58 @@
+"""Autocompletado de GeocodingService: cuándo responde el índice local y cuándo Nominatim"""
+import pytest
+
+from services.geocoding_service import GeocodingService
+
+
+def _nominatim_result(name, state, country, lat, lon, importance=0.6):
+    return {
+        'display_name': f"{name}, {state}, {country}", 'lat': str(lat), 'lon': str(lon),
+        'importance': importance, 'type': 'city',
+        'address': {'city': name, 'state': state, 'country': country}
+    }
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = GeocodingService(data_dir=None)
+    calls = []
+    responses = {
+        'Pune': [_nominatim_result('Pune', 'Maharashtra', 'India', 18.52, 73.85)],
+        'Lima, Ohio': [_nominatim_result('Lima', 'Ohio', 'United States', 40.74, -84.11)]
+    }
+
+    def fake_query(params, context, priority, group=None):
+        calls.append(params['q'])
+        return responses.get(params['q'], [])
+
+    monkeypatch.setattr(service, '_query_nominatim', fake_query)
+    service.nominatim_calls = calls
+    return service
+
+
+def test_prefix_match_is_answered_locally(service):
+    results = service.search_cities('Cusc')
+    assert results[0]['name'] == 'Cusco'
+    assert service.nominatim_calls == []
+
+
+def test_qualifier_filters_local_matches(service):
+    results = service.search_cities('Lima, Peru')
+    assert [r['name'] for r in results] == ['Lima']
+    assert service.nominatim_calls == []
+
+
+def test_qualifier_without_local_match_falls_back_to_nominatim(service):
+    results = service.search_cities('Lima, Ohio')
+    assert service.nominatim_calls == ['Lima, Ohio']
+    assert results[0]['region'] == 'Ohio'
+    assert all(r['region'] != 'Lima' for r in results)
+
+
+def test_fuzzy_hits_do_not_end_the_search(service):
+    results = service.search_cities('Pune')
+    assert service.nominatim_calls == ['Pune']
+    names = [r['name'] for r in results]
+    # Resultado de Nominatim primero; la coincidencia aproximada local se conserva después
+    assert names[0] == 'Pune'
+    assert 'Puno' in names
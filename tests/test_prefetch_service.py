@@ -0,0 +1,46 @@
+"""Relevo del rol de líder de la precarga entre workers"""
+import threading
+import time
+
+import pytest
+
+from services import prefetch_service
+from services.prefetch_service import PrefetchScheduler
+
+
+class _FakeCO2Service:
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.calls = 0
+        self.called = threading.Event()
+
+    def prefetch(self, date, leadtime_hours):
+        self.calls += 1
+        self.called.set()
+        return {'date': date.strftime('%Y-%m-%d'), 'files': []}
+
+
+@pytest.mark.skipif(prefetch_service.fcntl is None, reason='requiere fcntl')
+def test_standby_worker_takes_over_when_leader_exits(tmp_path):
+    first = _FakeCO2Service(str(tmp_path))
+    second = _FakeCO2Service(str(tmp_path))
+    leader = PrefetchScheduler(first, interval_seconds=3600)
+    standby = PrefetchScheduler(second, interval_seconds=3600)
+    standby.leader_retry_seconds = 0.05
+    try:
+        assert leader.start() is True
+        assert first.called.wait(5)
+        assert standby.start() is False
+        assert standby.status()['role'] == 'standby'
+        time.sleep(0.2)
+        assert second.calls == 0
+
+        # El líder termina: su bloqueo se libera al cerrarse el archivo
+        leader.stop()
+        leader._lock_file.close()
+
+        assert second.called.wait(5)
+        assert standby.status()['role'] == 'leader'
+    finally:
+        leader.stop()
+        standby.stop()
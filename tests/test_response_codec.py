@@ -0,0 +1,96 @@
+"""Ida y vuelta de los formatos de respuesta (JSON, MessagePack, Arrow IPC) y de la compresión"""
+import gzip
+import json
+
+import numpy as np
+import pytest
+from werkzeug.datastructures import Accept
+
+from services.response_codec import compress, encode_arrow, encode_msgpack, json_default
+
+
+def _series_body():
+    timestamps = np.array(['2025-09-01T00:00', '2025-09-01T12:00', '2025-09-02T00:00'], dtype='datetime64[s]')
+    return {
+        'success': True,
+        'data': {
+            'city': 'Lima',
+            'series': {'timestamps': timestamps, 'ppm': np.array([412.5, 418.25, 421.0])},
+            'interpolation': 'nearest'
+        }
+    }
+
+
+def _point_body():
+    return {
+        'success': True,
+        'data': {
+            'city': 'Lima',
+            'coordinates': {'target_lat': -12.05, 'target_lon': -77.04, 'actual_lat': -12.0, 'actual_lon': -77.2},
+            'distance_km': 18.1,
+            'co2_data': {'average_ppm': np.float32(415.0), 'min_ppm': 410.0, 'max_ppm': 420.0,
+                         'values_ppm': np.array([410.0, 415.0, 420.0])},
+            'co2_status': {'label': 'Aceptable', 'color': '#fd7e14', 'buffer_radius': 5000},
+            'time_info': {'base_time': '2025-09-01'}
+        }
+    }
+
+
+def _unpack(value):
+    return np.frombuffer(value['data'], value['dtype']).reshape(value['shape'])
+
+
+def test_json_round_trip():
+    decoded = json.loads(json.dumps(_series_body(), default=json_default))
+    series = decoded['data']['series']
+    assert series['timestamps'] == ['2025-09-01T00:00:00Z', '2025-09-01T12:00:00Z', '2025-09-02T00:00:00Z']
+    assert series['ppm'] == [412.5, 418.25, 421.0]
+
+
+def test_msgpack_round_trip():
+    msgpack = pytest.importorskip('msgpack')
+    body = _series_body()
+    decoded = msgpack.unpackb(encode_msgpack(body), raw=False)
+    series = decoded['data']['series']
+    np.testing.assert_array_equal(_unpack(series['timestamps']), body['data']['series']['timestamps'])
+    np.testing.assert_allclose(_unpack(series['ppm']), body['data']['series']['ppm'])
+    assert decoded['data']['city'] == 'Lima'
+
+
+def test_arrow_series_round_trip():
+    pa = pytest.importorskip('pyarrow')
+    body = _series_body()
+    table = pa.ipc.open_stream(encode_arrow(body)).read_all()
+    assert table.column_names == ['timestamp', 'ppm']
+    np.testing.assert_allclose(table.column('ppm').to_numpy(), body['data']['series']['ppm'])
+    timestamps = table.column('timestamp').cast(pa.int64()).to_numpy()
+    np.testing.assert_array_equal(timestamps, body['data']['series']['timestamps'].astype(np.int64))
+    rest = json.loads(table.schema.metadata[b'body'])
+    assert rest['data'] == {'city': 'Lima', 'interpolation': 'nearest'}
+
+
+def test_arrow_point_round_trip():
+    pa = pytest.importorskip('pyarrow')
+    table = pa.ipc.open_stream(encode_arrow(_point_body())).read_all()
+    row = table.to_pylist()[0]
+    assert row['city'] == 'Lima'
+    assert row['values_ppm'] == [410.0, 415.0, 420.0]
+    assert row['status_label'] == 'Aceptable'
+    assert json.loads(row['details']) == {'time_info': {'base_time': '2025-09-01'}}
+    assert json.loads(table.schema.metadata[b'body']) == {'success': True}
+
+
+def test_brotli_round_trip():
+    brotli = pytest.importorskip('brotli')
+    payload = json.dumps(_series_body(), default=json_default).encode('utf-8') * 20
+    compressed, encoding = compress(payload, Accept([('br', 1), ('gzip', 1)]), min_bytes=100)
+    assert encoding == 'br'
+    assert brotli.decompress(compressed) == payload
+
+
+def test_gzip_round_trip_and_small_payloads():
+    payload = b'x' * 2048
+    compressed, encoding = compress(payload, Accept([('gzip', 1)]), min_bytes=1024)
+    assert encoding == 'gzip'
+    assert gzip.decompress(compressed) == payload
+    assert compress(b'{}', Accept([('gzip', 1)]), min_bytes=1024) == (b'{}', None)
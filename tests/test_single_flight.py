@@ -0,0 +1,60 @@
+"""Coalescencia de SingleFlight y limpieza de los archivos de bloqueo por clave"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution(tmp_path):
+    flight = SingleFlight(str(tmp_path / 'locks'))
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'ok'
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(flight.do, 'k', work, True)]
+        started.wait(5)
+        futures += [pool.submit(flight.do, 'k', work, True) for _ in range(3)]
+        while flight.stats()['coalesced'] < 3:
+            time.sleep(0.01)
+        assert flight.stats() == {'in_flight': 1, 'coalesced': 3}
+        release.set()
+        assert [f.result() for f in futures] == ['ok'] * 4
+
+    assert len(calls) == 1
+    assert flight.stats()['in_flight'] == 0
+    assert os.listdir(tmp_path / 'locks') == []
+
+
+def test_file_lock_stays_exclusive_while_removing_lock_files(tmp_path):
+    lock_dir = str(tmp_path / 'locks')
+    # Instancias separadas abren su propio descriptor, como workers distintos
+    flights = [SingleFlight(lock_dir) for _ in range(8)]
+    holders = []
+    overlaps = []
+
+    def worker(flight):
+        for _ in range(20):
+            with flight.file_lock('grid'):
+                holders.append(1)
+                if len(holders) > 1:
+                    overlaps.append(1)
+                time.sleep(0.001)
+                holders.pop()
+
+    threads = [threading.Thread(target=worker, args=(f,)) for f in flights]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert overlaps == []
+    assert os.listdir(lock_dir) == []
@@ -0,0 +1,51 @@
+"""Teselas vacías compartidas y desalojo periódico de la caché de teselas"""
+import os
+import time
+
+import numpy as np
+
+from services.data_cache import DataCache
+from services.tile_service import TileRenderer
+
+
+class _Entry:
+    def __init__(self):
+        self.lat_axis = np.round(np.arange(0.0, -18.01, -0.4), 4)
+        self.lon_axis = np.round(np.arange(-82.0, -68.0, 0.4), 4)
+        self.dlat, self.dlon = -0.4, 0.4
+        rng = np.random.default_rng(0)
+        self.values = rng.uniform(400, 480, (self.lat_axis.size, self.lon_axis.size)).astype(np.float32)
+        self.meta = {'leadtime_hours': [], 'dims': ['latitude', 'longitude']}
+
+
+class _GridCache:
+    def get(self, key):
+        return _Entry()
+
+
+def test_tiles_outside_the_grid_share_one_png_and_are_not_stored(tmp_path):
+    renderer = TileRenderer(_GridCache(), DataCache(str(tmp_path)))
+    first, _ = renderer.render('g', 6, 0, 0)
+    second, _ = renderer.render('g', 6, 63, 63)
+    assert first is renderer.empty_png and second is renderer.empty_png
+    assert os.listdir(tmp_path) == []
+
+    png, _ = renderer.render('g', 0, 0, 0)
+    assert png is not renderer.empty_png
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_tile_cache_is_evicted_every_n_writes(tmp_path):
+    cache = DataCache(str(tmp_path), max_bytes=1, max_age_seconds=0)
+    renderer = TileRenderer(_GridCache(), cache, evict_every=4)
+    # Teselas z=5 que cubren el sur de Perú (todas dentro de la malla)
+    for x in (8, 9):
+        for y in (16, 17):
+            renderer.render('g', 5, x, y)
+    deadline = time.time() + 5
+    while os.listdir(tmp_path) and time.time() < deadline:
+        time.sleep(0.01)
+    assert os.listdir(tmp_path) == []
+
+    renderer.render('g', 5, 9, 16)
+    assert len(os.listdir(tmp_path)) == 1
@@ -0,0 +1,242 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import xarray as xr
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.cities import CITIES_COORDINATES
+
+try:
+    import eccodes  # Opcional: escritura de GRIB
+except ImportError:  # pragma: no cover - dependencia opcional
+    eccodes = None
+
+# Resolución de la malla global de CAMS (grados)
+CAMS_RESOLUTION = 0.4
+
+# Fondo de CO2 (ppm) y penacho urbano máximo sobre cada ciudad predefinida
+BACKGROUND_PPM = 412.0
+PLUME_MAX_PPM = 60.0
+PLUME_SIGMA_DEG = 0.35
+
+
+def grib_available() -> bool:
+    """True si ecCodes (módulo y librería nativa) permite escribir GRIB"""
+    if eccodes is None:
+        return False
+    try:
+        eccodes.codes_get_api_version()
+        return True
+    except Exception:
+        return False
+
+
+def request_seed(request: Dict[str, Any]) -> int:
+    """Semilla estable derivada de la petición: la misma petición genera siempre los mismos datos"""
+    canonical = json.dumps(request, sort_keys=True, separators=(',', ':'), default=str)
+    return int(hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:8], 16)
+
+
+def request_format(request: Dict[str, Any]) -> str:
+    """'grib' o 'netcdf' según la petición ('format' o 'data_format')"""
+    fmt = str(request.get('data_format') or request.get('format') or 'grib').lower()
+    return 'netcdf' if fmt.startswith('netcdf') else 'grib'
+
+
+def request_dates(request: Dict[str, Any]) -> List[datetime]:
+    """Fechas de análisis de la petición ('AAAA-MM-DD' o rangos 'inicio/fin')"""
+    values = request.get('date', [])
+    if isinstance(values, str):
+        values = [values]
+    dates = []
+    for value in values:
+        start, _, end = str(value).partition('/')
+        day = datetime.strptime(start, '%Y-%m-%d')
+        last = datetime.strptime(end, '%Y-%m-%d') if end else day
+        while day <= last:
+            dates.append(day)
+            day += timedelta(days=1)
+    if not dates:
+        raise ValueError("La petición no incluye fechas")
+    return sorted(set(dates))
+
+
+def grid_axes(area: List[float], resolution: float = CAMS_RESOLUTION) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Ejes de la malla CAMS dentro de un área [norte, oeste, sur, este]
+
+    Returns:
+        (latitudes de norte a sur, longitudes de oeste a este) sobre la retícula global
+    """
+    north, west, south, east = (float(v) for v in area)
+    lats = np.arange(np.floor(north / resolution), np.ceil(south / resolution) - 1, -1) * resolution
+    lons = np.arange(np.ceil(west / resolution), np.floor(east / resolution) + 1) * resolution
+    lats = lats[(lats <= north + 1e-9) & (lats >= south - 1e-9)]
+    lons = lons[(lons >= west - 1e-9) & (lons <= east + 1e-9)]
+    if lats.size == 0 or lons.size == 0:
+        # Área menor que una celda: el punto de malla más cercano al centro
+        lats = np.array([np.round((north + south) / 2 / resolution) * resolution])
+        lons = np.array([np.round((west + east) / 2 / resolution) * resolution])
+    return np.round(lats, 4), np.round(lons, 4)
+
+
+def synthetic_co2_ppm(lats: np.ndarray, lons: np.ndarray, valid_times: np.ndarray, seed: int) -> np.ndarray:
+    """
+    Campo sintético de CO2 en ppm con forma (instantes..., lat, lon)
+
+    Fondo con gradiente latitudinal, ciclo diurno según la hora solar local,
+    penachos gaussianos sobre las ciudades predefinidas (algunos superan los
+    umbrales de config/co2_thresholds.py) y un ruido pequeño reproducible.
+    """
+    rng = np.random.default_rng(seed)
+    lat2d = lats[:, np.newaxis]
+    lon2d = lons[np.newaxis, :]
+    field = BACKGROUND_PPM + 0.05 * (lat2d + 90.0) + np.zeros_like(lon2d)
+
+    plumes = np.zeros_like(field)
+    for i, city in enumerate(CITIES_COORDINATES.values()):
+        # Intensidad fija por ciudad (no depende de la petición) para resultados comparables
+        strength = PLUME_MAX_PPM * (0.25 + 0.75 * ((i * 0.618) % 1.0))
+        d2 = (lat2d - city['lat']) ** 2 + (lon2d - city['lon']) ** 2
+        plumes += strength * np.exp(-d2 / (2 * PLUME_SIGMA_DEG ** 2))
+
+    epoch_hours = valid_times.astype('datetime64[s]').astype(np.int64) / 3600.0
+    solar_hour = (epoch_hours[..., np.newaxis, np.newaxis] + lon2d / 15.0) % 24
+    # Máximo nocturno (capa límite estable) y mínimo por la tarde
+    diurnal = 1.0 + 0.3 * np.cos(2 * np.pi * (solar_hour - 4) / 24)
+    noise = rng.normal(0.0, 0.5, size=valid_times.shape + field.shape)
+    return (field + plumes * diurnal + noise).astype(np.float32)
+
+
+def make_dataset(request: Dict[str, Any], resolution: float = CAMS_RESOLUTION) -> xr.Dataset:
+    """
+    Dataset con la estructura de la descarga NetCDF de ADS para la petición de CO2
+
+    Dimensiones (forecast_period, forecast_reference_time, latitude, longitude),
+    coordenada valid_time y la variable 'co2' en kg/kg.
+    """
+    lats, lons = grid_axes(request.get('area') or [90, -180, -90, 180], resolution)
+    steps = np.array([int(h) for h in request.get('leadtime_hour', ['0'])], dtype='timedelta64[h]')
+    refs = np.array(request_dates(request), dtype='datetime64[ns]')
+    valid = refs[np.newaxis, :] + steps.astype('timedelta64[ns]')[:, np.newaxis]
+    ppm = synthetic_co2_ppm(lats, lons, valid, request_seed(request))
+    return xr.Dataset(
+        {'co2': (('forecast_period', 'forecast_reference_time', 'latitude', 'longitude'),
+                 ppm * np.float32(1e-6),
+                 {'units': 'kg kg**-1', 'long_name': 'Carbon dioxide mass mixing ratio'})},
+        coords={
+            'forecast_period': ('forecast_period', steps.astype('timedelta64[ns]')),
+            'forecast_reference_time': ('forecast_reference_time', refs),
+            'valid_time': (('forecast_period', 'forecast_reference_time'), valid),
+            'latitude': ('latitude', lats, {'units': 'degrees_north'}),
+            'longitude': ('longitude', lons, {'units': 'degrees_east'}),
+            'model_level': 137
+        },
+        attrs={'Conventions': 'CF-1.7', 'source': 'Datos sintéticos (tools/cams_fixtures.py)'}
+    )
+
+
+def write_netcdf(request: Dict[str, Any], path: str) -> str:
+    """Escribe el campo sintético de la petición como NetCDF4"""
+    make_dataset(request).to_netcdf(path)
+    return path
+
+
+def write_grib(request: Dict[str, Any], path: str) -> str:
+    """
+    Escribe el campo sintético como GRIB1 (un mensaje por fecha y paso), legible con cfgrib
+
+    Raises:
+        RuntimeError: si ecCodes no está disponible
+    """
+    if not grib_available():
+        raise RuntimeError("Escribir GRIB requiere ecCodes (pip install eccodes y la librería nativa)")
+    ds = make_dataset(request)
+    lats = ds['latitude'].values
+    lons = ds['longitude'].values
+    values = ds['co2'].values
+    with open(path, 'wb') as f:
+        for i, step in enumerate(ds['forecast_period'].values.astype('timedelta64[h]').astype(int)):
+            for j, ref in enumerate(ds['forecast_reference_time'].values.astype('datetime64[s]').tolist()):
+                gid = eccodes.codes_grib_new_from_samples('regular_ll_sfc_grib1')
+                try:
+                    eccodes.codes_set(gid, 'centre', 'ecmf')
+                    eccodes.codes_set(gid, 'table2Version', 210)
+                    eccodes.codes_set(gid, 'indicatorOfParameter', 61)  # co2 (kg/kg)
+                    eccodes.codes_set(gid, 'typeOfLevel', 'hybrid')
+                    eccodes.codes_set(gid, 'level', 137)
+                    eccodes.codes_set(gid, 'dataDate', int(ref.strftime('%Y%m%d')))
+                    eccodes.codes_set(gid, 'dataTime', int(ref.strftime('%H%M')))
+                    eccodes.codes_set(gid, 'stepUnits', 'h')
+                    eccodes.codes_set(gid, 'step', int(step))
+                    eccodes.codes_set(gid, 'Ni', lons.size)
+                    eccodes.codes_set(gid, 'Nj', lats.size)
+                    eccodes.codes_set(gid, 'latitudeOfFirstGridPointInDegrees', float(lats[0]))
+                    eccodes.codes_set(gid, 'longitudeOfFirstGridPointInDegrees', float(lons[0]))
+                    eccodes.codes_set(gid, 'latitudeOfLastGridPointInDegrees', float(lats[-1]))
+                    eccodes.codes_set(gid, 'longitudeOfLastGridPointInDegrees', float(lons[-1]))
+                    eccodes.codes_set(gid, 'iDirectionIncrementInDegrees', CAMS_RESOLUTION)
+                    eccodes.codes_set(gid, 'jDirectionIncrementInDegrees', CAMS_RESOLUTION)
+                    eccodes.codes_set(gid, 'jScansPositively', 0)
+                    eccodes.codes_set(gid, 'bitsPerValue', 24)
+                    eccodes.codes_set_values(gid, values[i, j].astype(np.float64).ravel())
+                    eccodes.codes_write(gid, f)
+                finally:
+                    eccodes.codes_release(gid)
+    return path
+
+
+def write_fixture(request: Dict[str, Any], path: str) -> str:
+    """Escribe el archivo en el formato pedido (GRIB o NetCDF) de forma atómica"""
+    writer = write_grib if request_format(request) == 'grib' else write_netcdf
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+    os.close(fd)
+    try:
+        writer(request, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Punto de entrada CLI: python -m tools.cams_fixtures --date 2025-01-01 -o co2.nc"""
+    parser = argparse.ArgumentParser(description='Genera archivos CAMS sintéticos de CO2 (NetCDF o GRIB)')
+    parser.add_argument('--date', required=True, help="Fecha 'AAAA-MM-DD' o rango 'inicio/fin'")
+    parser.add_argument('--leadtime', default='0,12,24', help='Horas de pronóstico separadas por comas')
+    parser.add_argument('--area', default=None, help='Área norte,oeste,sur,este (por defecto, Perú)')
+    parser.add_argument('--format', choices=['netcdf', 'grib'], default='netcdf')
+    parser.add_argument('-o', '--output', required=True, help='Archivo de salida')
+    args = parser.parse_args(argv)
+
+    from config.cities import PERU_BBOX
+
+    request = {
+        'variable': ['carbon_dioxide'],
+        'model_level': ['137'],
+        'date': [args.date],
+        'leadtime_hour': [h.strip() for h in args.leadtime.split(',') if h.strip()],
+        'area': [float(v) for v in args.area.split(',')] if args.area else list(PERU_BBOX),
+        'format': args.format
+    }
+    try:
+        write_fixture(request, args.output)
+    except (RuntimeError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"✅ {args.output} ({os.path.getsize(args.output)} bytes)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,421 @@
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from flask import Blueprint, Flask, Response, jsonify, request, send_file, url_for
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.data_cache import DataCache
+from tools.cams_fixtures import grib_available, request_format, write_fixture
+
+# Fallos inyectables: tipo -> descripción
+FAILURE_KINDS = {
+    'auth': '401 al enviar la petición (clave inválida)',
+    'terms': '403 al enviar la petición (licencia no aceptada)',
+    'quota': '429 con Retry-After al enviar la petición',
+    'job': 'el job termina en estado failed',
+    'truncate': 'la descarga entrega solo una parte del archivo'
+}
+
+
+def _now_iso(ts: Optional[float] = None) -> str:
+    return datetime.fromtimestamp(ts if ts is not None else time.time(), tz=timezone.utc).isoformat()
+
+
+def _problem(status: int, title: str, detail: str, headers: Optional[Dict[str, str]] = None):
+    """Respuesta de error en formato problem+json, como la API de procesos de ADS"""
+    response = jsonify({'type': 'about:blank', 'title': title, 'status': status, 'detail': detail})
+    response.status_code = status
+    response.mimetype = 'application/problem+json'
+    for name, value in (headers or {}).items():
+        response.headers[name] = value
+    return response
+
+
+class FakeADS:
+    """
+    Estado de un servidor ADS simulado (API de procesos /retrieve/v1).
+
+    Los jobs pasan por accepted -> running -> successful/failed según el reloj:
+    esperan `queue_seconds` en cola y un hueco libre entre `max_running`, y
+    tardan `run_seconds` en ejecutarse. El avance se calcula de forma perezosa
+    en cada consulta, sin hilos de fondo. Los archivos se generan con
+    tools/cams_fixtures.py a partir de la petición (mismo contenido para la
+    misma petición) y se guardan en disco para las peticiones repetidas.
+    """
+
+    def __init__(self, data_dir: str, key: str = 'fake-ads-key',
+                 latency: float = 0.0, queue_seconds: float = 1.0, run_seconds: float = 1.0,
+                 max_running: int = 4, max_queued: int = 0, bandwidth: int = 0,
+                 failures: Optional[Dict[str, float]] = None, retry_after: int = 5,
+                 seed: Optional[int] = None, failure_plan: Optional[Dict[str, str]] = None):
+        self.data_dir = data_dir
+        self.key = key
+        self.latency = latency
+        self.queue_seconds = queue_seconds
+        self.run_seconds = run_seconds
+        self.max_running = max(1, max_running)
+        self.max_queued = max_queued
+        self.bandwidth = bandwidth
+        self.failures = {kind: float(rate) for kind, rate in (failures or {}).items()}
+        self.retry_after = retry_after
+        # Fallos fijos por fecha de la petición ('AAAA-MM-DD' -> tipo), para pruebas deterministas
+        self.failure_plan = dict(failure_plan or {})
+        os.makedirs(self.data_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # HDF5/netCDF no es seguro entre hilos: la generación de archivos se serializa
+        self._fixture_lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._queue = deque()
+        self._running = 0
+        self._stats = {
+            'submitted': 0, 'successful': 0, 'failed': 0, 'deleted': 0,
+            'rejected_auth': 0, 'rejected_terms': 0, 'rejected_quota': 0,
+            'downloads': 0, 'truncated_downloads': 0, 'bytes_sent': 0,
+            'fixtures_generated': 0, 'fixture_cache_hits': 0
+        }
+
+    def planned_failure(self, inputs: Any) -> Optional[str]:
+        """Fallo fijado para la primera fecha de la petición, si lo hay"""
+        if not self.failure_plan or not isinstance(inputs, dict):
+            return None
+        dates = inputs.get('date') or ['']
+        first = dates if isinstance(dates, str) else dates[0]
+        return self.failure_plan.get(str(first).split('/')[0])
+
+    def should_fail(self, kind: str, inputs: Any = None) -> bool:
+        """Decide si se inyecta un fallo: el plan por fecha tiene prioridad sobre la tasa aleatoria"""
+        if self.planned_failure(inputs) == kind:
+            return True
+        rate = self.failures.get(kind, 0.0)
+        if rate <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < rate
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += amount
+
+    def check_token(self, token: Optional[str]) -> bool:
+        return token == self.key
+
+    def submit(self, process_id: str, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Registra un job en cola; la decisión de fallo se toma al enviarlo para que sea reproducible"""
+        now = time.time()
+        job = {
+            'jobID': uuid.uuid4().hex, 'processID': process_id, 'inputs': inputs,
+            'status': 'accepted', 'created': now, 'started': None, 'finished': None,
+            'will_fail': self.should_fail('job', inputs)
+        }
+        with self._lock:
+            self._jobs[job['jobID']] = job
+            self._queue.append(job['jobID'])
+            self._stats['submitted'] += 1
+        return job
+
+    def active_jobs(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job['status'] in ('accepted', 'running'))
+
+    def _advance(self, now: float) -> None:
+        """Avanza la máquina de estados de todos los jobs (se llama con el lock tomado)"""
+        for job in self._jobs.values():
+            if job['status'] == 'running' and now - job['started'] >= self.run_seconds:
+                job['status'] = 'failed' if job['will_fail'] else 'successful'
+                job['finished'] = job['started'] + self.run_seconds
+                self._running -= 1
+                self._stats['failed' if job['will_fail'] else 'successful'] += 1
+        while self._queue and self._running < self.max_running:
+            job = self._jobs.get(self._queue[0])
+            if job is None or job['status'] != 'accepted':
+                self._queue.popleft()
+                continue
+            if now - job['created'] < self.queue_seconds:
+                break
+            self._queue.popleft()
+            job['status'] = 'running'
+            job['started'] = max(now, job['created'] + self.queue_seconds)
+            self._running += 1
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._advance(time.time())
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def delete_job(self, job_id: str) -> bool:
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+            if job is None:
+                return False
+            if job['status'] == 'running':
+                self._running -= 1
+            self._stats['deleted'] += 1
+            return True
+
+    def fixture_path(self, job: Dict[str, Any]) -> str:
+        """Archivo de resultados del job, generado una sola vez por petición"""
+        ext = '.grib' if request_format(job['inputs']) == 'grib' else '.nc'
+        path = os.path.join(self.data_dir, DataCache.make_key(job['inputs']) + ext)
+        with self._fixture_lock:
+            if os.path.exists(path):
+                self.count('fixture_cache_hits')
+            else:
+                write_fixture(job['inputs'], path)
+                self.count('fixtures_generated')
+        return path
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._advance(time.time())
+            states: Dict[str, int] = {}
+            for job in self._jobs.values():
+                states[job['status']] = states.get(job['status'], 0) + 1
+            return dict(self._stats, jobs=states)
+
+
+def _job_document(job: Dict[str, Any]) -> Dict[str, Any]:
+    self_url = url_for('ads.job_status', job_id=job['jobID'], _external=True)
+    doc = {
+        'processID': job['processID'], 'type': 'process', 'jobID': job['jobID'],
+        'status': job['status'], 'created': _now_iso(job['created']),
+        'started': _now_iso(job['started']) if job['started'] else None,
+        'finished': _now_iso(job['finished']) if job['finished'] else None,
+        'updated': _now_iso(),
+        'metadata': {'log': [], 'request': {'ids': job['inputs']}},
+        'links': [
+            {'href': self_url, 'rel': 'self', 'type': 'application/json'},
+            {'href': self_url, 'rel': 'monitor', 'type': 'application/json'}
+        ]
+    }
+    if job['status'] in ('successful', 'failed'):
+        doc['links'].append({'href': url_for('ads.job_results', job_id=job['jobID'], _external=True),
+                             'rel': 'results'})
+    return doc
+
+
+def create_app(fake: FakeADS) -> Flask:
+    """Aplicación Flask que emula la parte de la API de ADS que usan cdsapi y AsyncCDSClient"""
+    app = Flask(__name__)
+    api = Blueprint('ads', __name__, url_prefix='/api')
+
+    @app.before_request
+    def _simulated_latency():
+        if fake.latency > 0:
+            time.sleep(fake.latency)
+
+    @api.route('/catalogue/v1/messages')
+    def catalogue_messages():
+        return jsonify({'messages': []})
+
+    @api.route('/retrieve/v1/processes/<process_id>')
+    def process_description(process_id):
+        return jsonify({'id': process_id, 'title': process_id, 'version': '1.0.0', 'links': []})
+
+    @api.route('/retrieve/v1/processes/<process_id>/execution', methods=['POST'])
+    def execute(process_id):
+        body = request.get_json(silent=True) or {}
+        inputs = body.get('inputs')
+        if not fake.check_token(request.headers.get('PRIVATE-TOKEN')) or fake.should_fail('auth', inputs):
+            fake.count('rejected_auth')
+            return _problem(401, 'Authentication failed', 'Invalid API key')
+        if fake.should_fail('terms', inputs):
+            fake.count('rejected_terms')
+            return _problem(403, 'Forbidden', 'Required licences not accepted; see the Terms of use of the dataset')
+        if fake.should_fail('quota', inputs) or (fake.max_queued and fake.active_jobs() >= fake.max_queued):
+            fake.count('rejected_quota')
+            return _problem(429, 'Too Many Requests', 'Your request exceeds the queued requests quota',
+                            headers={'Retry-After': str(fake.retry_after)})
+        if not isinstance(inputs, dict):
+            return _problem(400, 'Invalid request', "El cuerpo debe incluir 'inputs'")
+        if request_format(inputs) == 'grib' and not grib_available():
+            return _problem(400, 'Invalid request', 'Este servidor simulado no puede generar GRIB sin ecCodes; pide netcdf')
+        job = fake.submit(process_id, inputs)
+        response = jsonify(_job_document(job))
+        response.status_code = 201
+        response.headers['Location'] = url_for('ads.job_status', job_id=job['jobID'], _external=True)
+        return response
+
+    @api.route('/retrieve/v1/jobs/<job_id>', methods=['GET'])
+    def job_status(job_id):
+        if not fake.check_token(request.headers.get('PRIVATE-TOKEN')):
+            return _problem(401, 'Authentication failed', 'Invalid API key')
+        job = fake.get_job(job_id)
+        if job is None:
+            return _problem(404, 'Job not found', f'Job {job_id} no existe')
+        return jsonify(_job_document(job))
+
+    @api.route('/retrieve/v1/jobs/<job_id>', methods=['DELETE'])
+    def job_delete(job_id):
+        if not fake.delete_job(job_id):
+            return _problem(404, 'Job not found', f'Job {job_id} no existe')
+        return jsonify({'jobID': job_id, 'status': 'dismissed'})
+
+    @api.route('/retrieve/v1/jobs/<job_id>/results')
+    def job_results(job_id):
+        job = fake.get_job(job_id)
+        if job is None:
+            return _problem(404, 'Job not found', f'Job {job_id} no existe')
+        if job['status'] == 'failed':
+            return _problem(400, 'The job has failed', 'Error simulado en el procesamiento de la petición')
+        if job['status'] != 'successful':
+            return _problem(404, 'Results not ready', f"El job está en estado {job['status']}")
+        try:
+            path = fake.fixture_path(job)
+        except Exception as e:
+            return _problem(500, 'Internal error', f'No se pudo generar el archivo: {e}')
+        filename = os.path.basename(path)
+        return jsonify({'asset': {'value': {
+            'type': 'application/x-grib' if filename.endswith('.grib') else 'application/netcdf',
+            'href': url_for('download', filename=filename, job=job['jobID'], _external=True),
+            'file:size': os.path.getsize(path),
+            'file:local_path': filename
+        }}})
+
+    @app.route('/download/<filename>')
+    def download(filename):
+        path = os.path.join(fake.data_dir, os.path.basename(filename))
+        if not os.path.exists(path):
+            return _problem(404, 'Not found', filename)
+        size = os.path.getsize(path)
+        if request.method == 'HEAD':
+            # multiurl consulta el tamaño con HEAD antes de descargar
+            return send_file(path, conditional=True)
+        fake.count('downloads')
+        job = fake.get_job(request.args.get('job', ''))
+        if fake.should_fail('truncate', job['inputs'] if job else None):
+            # Archivo cortado en origen: Content-Length coherente pero menor que file:size
+            fake.count('truncated_downloads')
+            size = max(1, size // 2)
+        elif fake.bandwidth <= 0:
+            fake.count('bytes_sent', size)
+            return send_file(path, conditional=True)
+
+        def stream():
+            chunk = 64 * 1024
+            remaining = size
+            with open(path, 'rb') as f:
+                while remaining > 0:
+                    data = f.read(min(chunk, remaining))
+                    if not data:
+                        break
+                    remaining -= len(data)
+                    fake.count('bytes_sent', len(data))
+                    if fake.bandwidth > 0:
+                        time.sleep(len(data) / fake.bandwidth)
+                    yield data
+
+        return Response(stream(), mimetype='application/octet-stream',
+                        headers={'Content-Length': str(size)})
+
+    @app.route('/stats')
+    def stats():
+        return jsonify(fake.stats())
+
+    app.register_blueprint(api)
+    return app
+
+
+def serve_in_thread(fake: FakeADS, host: str = '127.0.0.1', port: int = 0):
+    """
+    Arranca el servidor en un hilo daemon (útil para benchmarks desde Python)
+
+    Returns:
+        (servidor werkzeug, URL base para CDSAPI_URL); detener con server.shutdown()
+    """
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server(host, port, create_app(fake), threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}/api"
+
+
+def write_cdsapirc(path: str, url: str, key: str) -> str:
+    """Escribe un .cdsapirc que apunta al servidor simulado (usar con CDSAPI_RC=ruta)"""
+    with open(path, 'w') as f:
+        f.write(f"url: {url}\nkey: {key}\n")
+    return path
+
+
+def _parse_failures(values: List[str]) -> Dict[str, float]:
+    failures = {}
+    for value in values:
+        kind, _, rate = value.partition('=')
+        if kind not in FAILURE_KINDS:
+            raise argparse.ArgumentTypeError(f"Tipo de fallo desconocido: {kind} (usa {', '.join(FAILURE_KINDS)})")
+        failures[kind] = float(rate) if rate else 1.0
+    return failures
+
+
+def _parse_failure_plan(values: List[str]) -> Dict[str, str]:
+    plan = {}
+    for value in values:
+        date, _, kind = value.partition('=')
+        if kind not in FAILURE_KINDS:
+            raise argparse.ArgumentTypeError(f"Tipo de fallo desconocido: {kind} (usa {', '.join(FAILURE_KINDS)})")
+        plan[date.strip()] = kind
+    return plan
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Punto de entrada CLI: python -m tools.fake_ads_server [--port 8765] [--fail quota=0.2]"""
+    parser = argparse.ArgumentParser(description='Servidor ADS simulado para pruebas y benchmarks sin credenciales')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--key', default='fake-ads-key', help='Clave aceptada (PRIVATE-TOKEN)')
+    parser.add_argument('--data-dir', default=None, help='Directorio de archivos generados')
+    parser.add_argument('--latency', type=float, default=0.0, help='Segundos añadidos a cada respuesta')
+    parser.add_argument('--queue-seconds', type=float, default=1.0, help='Tiempo mínimo de cada job en cola')
+    parser.add_argument('--run-seconds', type=float, default=1.0, help='Duración de cada job en ejecución')
+    parser.add_argument('--max-running', type=int, default=4, help='Jobs ejecutándose a la vez')
+    parser.add_argument('--max-queued', type=int, default=0, help='Jobs activos antes de responder 429 (0 = sin límite)')
+    parser.add_argument('--bandwidth', type=int, default=0, help='Bytes/s por descarga (0 = sin límite)')
+    parser.add_argument('--retry-after', type=int, default=5, help='Retry-After de las respuestas 429')
+    parser.add_argument('--fail', action='append', default=[], metavar='TIPO[=TASA]',
+                        help='Inyecta fallos: ' + '; '.join(f'{k}: {v}' for k, v in FAILURE_KINDS.items()))
+    parser.add_argument('--fail-on', action='append', default=[], metavar='FECHA=TIPO',
+                        help='Fallo fijo para las peticiones de una fecha (p. ej. 2025-01-03=quota)')
+    parser.add_argument('--seed', type=int, default=None, help='Semilla de la inyección de fallos')
+    parser.add_argument('--write-rc', default=None, help='Escribe un .cdsapirc para este servidor en la ruta indicada')
+    args = parser.parse_args(argv)
+
+    try:
+        failures = _parse_failures(args.fail)
+        failure_plan = _parse_failure_plan(args.fail_on)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    fake = FakeADS(
+        args.data_dir or os.path.join(project_dir, 'data', 'fake_ads'), key=args.key,
+        latency=args.latency, queue_seconds=args.queue_seconds, run_seconds=args.run_seconds,
+        max_running=args.max_running, max_queued=args.max_queued, bandwidth=args.bandwidth,
+        failures=failures, retry_after=args.retry_after, seed=args.seed, failure_plan=failure_plan
+    )
+    url = f"http://{args.host}:{args.port}/api"
+    if args.write_rc:
+        write_cdsapirc(args.write_rc, url, args.key)
+        print(f"🔐 Credenciales escritas en {args.write_rc} (export CDSAPI_RC={args.write_rc})")
+    print(f"🛰️ ADS simulado en {url} (GRIB {'disponible' if grib_available() else 'no disponible: usa NetCDF'})")
+
+    from werkzeug.serving import run_simple
+    run_simple(args.host, args.port, create_app(fake), threaded=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())